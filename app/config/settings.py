@@ -30,6 +30,57 @@ class Settings(BaseSettings):
     DEFAULT_IDENTIFIER: str
     DEFAULT_USER: str
     DEFAULT_PASSWORD: str
+
+    # Cache de orçamentos gerados (0 desativa)
+    ORCAMENTO_CACHE_MAX_ENTRADAS: int = 128
+    ORCAMENTO_CACHE_TTL_SEGUNDOS: int = 600
+
+    # Cache da cascata de pedidos por escola e tipo de formulário (0 desativa)
+    CASCATA_CACHE_MAX_ENTRADAS: int = 256
+    CASCATA_CACHE_TTL_SEGUNDOS: int = 600
+
+    # Geração em lote: escolas processadas em paralelo (limitado pelo pool do banco)
+    ORCAMENTO_LOTE_MAX_PARALELO: int = 4
+
+    # Jobs assíncronos de orçamento: workers, limite de jobs em andamento e retenção do status
+    ORCAMENTO_JOBS_MAX_PARALELO: int = 2
+    ORCAMENTO_JOBS_MAX_FILA: int = 20
+    ORCAMENTO_JOBS_RETENCAO_SEGUNDOS: int = 3600
+
+    # Threads dedicadas ao I/O dos arquivos de orçamento (rotas async)
+    ARQUIVOS_ORCAMENTO_MAX_THREADS: int = 4
+
+    # Retenção dos arquivos de orçamento: dias sem uso (download ou arquivo base), cota
+    # total em disco (0 desativa cada limite; por padrão só a cota) e intervalo da
+    # varredura em segundo plano (0 desativa a varredura)
+    ARQUIVOS_ORCAMENTO_RETENCAO_DIAS: float = 0
+    ARQUIVOS_ORCAMENTO_QUOTA_MB: int = 1024
+    ARQUIVOS_ORCAMENTO_RETENCAO_INTERVALO_SEGUNDOS: int = 300
+
+    # Intervalo da reconciliação do resumo de pedidos por escola com as distribuições
+    # (o resumo é mantido por triggers; 0 desativa a reconciliação periódica)
+    RESUMO_PEDIDOS_RECONCILIACAO_INTERVALO_SEGUNDOS: int = 3600
+
+    # Eventos do dashboard por SSE: intervalo do heartbeat e eventos pendentes por
+    # cliente (acima disso o cliente recebe "sincronizar" no lugar dos pendentes)
+    DASHBOARD_EVENTOS_HEARTBEAT_SEGUNDOS: int = 15
+    DASHBOARD_EVENTOS_MAX_FILA: int = 256
+    # Duração máxima de cada fluxo SSE: o cliente reconecta sozinho (retry) e recebe
+    # "sincronizar"; limita também a espera do shutdown por clientes conectados
+    DASHBOARD_EVENTOS_DURACAO_MAXIMA_SEGUNDOS: int = 300
+
+    # Versão da query de orçamento usada quando a requisição não informa ("v1" ou "v2")
+    ORCAMENTO_QUERY_VERSAO: str = "v1"
+
+    # Montagem do JSON do orçamento: "sql" (json_agg no banco) ou "python" (linhas planas)
+    ORCAMENTO_ENGINE: str = "sql"
+
+    # Respostas montadas em JSON pelo PostgreSQL (orçamento, cascata) são repassadas
+    # como texto; True valida e serializa pelos schemas Pydantic (depuração/testes)
+    VALIDAR_RESPOSTAS_JSON: bool = False
+
+    # Catálogo Bremen em memória: recarregado após este intervalo
+    CATALOGO_BREMEN_TTL_SEGUNDOS: int = 3600
     
     class Config:
         env_file = ".env"
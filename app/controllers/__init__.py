@@ -3,5 +3,7 @@ from . import auth_controller
 from . import dashboard_controller
 from . import cascata_controller
 from . import orcamento_controller
+from . import distribuicao_controller
+from . import arquivo_orcamento_controller
 
-__all__ = ['auth_controller', 'dashboard_controller', 'cascata_controller', 'orcamento_controller']
+__all__ = ['auth_controller', 'dashboard_controller', 'cascata_controller', 'orcamento_controller', 'distribuicao_controller', 'arquivo_orcamento_controller']
@@ -0,0 +1,255 @@
+from fastapi import HTTPException, status
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from typing import Optional, Iterator, Tuple
+from pathlib import Path
+import os
+import gzip
+from ..config.logging_config import get_logger
+from ..services.arquivo_orcamento_service import ArquivoOrcamentoService
+
+logger = get_logger(__name__)
+
+TAMANHO_BLOCO = 64 * 1024
+
+
+class ArquivoOrcamentoController:
+    """Controller para os arquivos de orçamento salvos"""
+    
+    @staticmethod
+    def _validar_nome(nome_arquivo: str) -> None:
+        """
+        Valida o nome do arquivo (segurança)
+        
+        Raises:
+            HTTPException 400 se o nome não for de um arquivo de orçamento
+        """
+        if (
+            not nome_arquivo.startswith("orcamento_")
+            or not nome_arquivo.endswith(".json")
+            or "/" in nome_arquivo
+            or "\\" in nome_arquivo
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Nome de arquivo inválido"
+            )
+    
+    @staticmethod
+    def _aceita_gzip(accept_encoding: Optional[str]) -> bool:
+        """
+        Indica se o cliente aceita gzip (header Accept-Encoding)
+        
+        Args:
+            accept_encoding: Valor do header (ex.: "gzip, deflate, br")
+            
+        Returns:
+            True se gzip (ou *) estiver presente sem q=0
+        """
+        for codificacao in (accept_encoding or "").lower().split(","):
+            nome, _, parametros = codificacao.strip().partition(";")
+            if nome.strip() not in ("gzip", "*"):
+                continue
+            qualidade = parametros.replace(" ", "")
+            if qualidade.startswith("q="):
+                try:
+                    return float(qualidade[2:]) > 0
+                except ValueError:
+                    return False
+            return True
+        return False
+    
+    @staticmethod
+    def _descomprimir(caminho: Path, inicio: int = 0, tamanho: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Lê o arquivo gzip em blocos, já descomprimidos
+        
+        Args:
+            caminho: Arquivo gzip
+            inicio: Posição inicial no JSON descomprimido
+            tamanho: Bytes a entregar a partir de inicio (None: até o fim)
+        """
+        with gzip.open(caminho, 'rb') as f:
+            if inicio:
+                f.seek(inicio)
+            restante = tamanho
+            while restante is None or restante > 0:
+                bloco = f.read(TAMANHO_BLOCO if restante is None else min(TAMANHO_BLOCO, restante))
+                if not bloco:
+                    break
+                if restante is not None:
+                    restante -= len(bloco)
+                yield bloco
+    
+    @staticmethod
+    def _etag(estado: os.stat_result, codificacao: Optional[str] = None) -> str:
+        """
+        ETag forte do arquivo (os arquivos não mudam depois de gravados)
+        
+        Cada representação tem seu ETag: o arquivo comprimido enviado com
+        Content-Encoding: gzip recebe o sufixo da codificação.
+        """
+        etag = f"{estado.st_mtime_ns:x}-{estado.st_size:x}"
+        if codificacao:
+            etag += f"-{codificacao}"
+        return f'"{etag}"'
+    
+    @staticmethod
+    def _etag_confere(if_none_match: Optional[str], etag: str) -> bool:
+        """Indica se o ETag está no header If-None-Match (comparação fraca)"""
+        for candidato in (if_none_match or "").split(","):
+            candidato = candidato.strip()
+            if candidato == "*" or candidato.removeprefix("W/") == etag:
+                return True
+        return False
+    
+    @staticmethod
+    def _intervalo(intervalo: Optional[str], tamanho: int) -> Optional[Tuple[int, int]]:
+        """
+        Interpreta o header Range (um único intervalo de bytes)
+        
+        Args:
+            intervalo: Valor do header (ex.: "bytes=1000-", "bytes=-500")
+            tamanho: Tamanho total da representação
+            
+        Returns:
+            (início, fim) inclusivos, ou None para enviar o arquivo inteiro
+            (sem Range, inválido ou com vários intervalos)
+            
+        Raises:
+            HTTPException 416 se o intervalo estiver fora do arquivo
+        """
+        unidade, _, faixas = (intervalo or "").partition("=")
+        if unidade.strip().lower() != "bytes" or "," in faixas:
+            return None
+        inicio, separador, fim = faixas.strip().partition("-")
+        if not separador:
+            return None
+        try:
+            if inicio:
+                inicio, fim = int(inicio), int(fim) if fim else None
+            elif fim:
+                inicio, fim = max(0, tamanho - int(fim)), None
+            else:
+                return None
+        except ValueError:
+            return None
+        if fim is not None and inicio > fim:
+            return None
+        if inicio >= tamanho:
+            raise HTTPException(
+                status_code=status.HTTP_416_RANGE_NOT_SATISFIABLE,
+                detail="Intervalo fora do arquivo",
+                headers={"Content-Range": f"bytes */{tamanho}"}
+            )
+        return inicio, tamanho - 1 if fim is None else min(fim, tamanho - 1)
+    
+    @staticmethod
+    async def download(
+        nome_arquivo: str,
+        accept_encoding: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        intervalo: Optional[str] = None,
+        if_range: Optional[str] = None
+    ) -> Response:
+        """
+        Entrega um arquivo de orçamento
+        
+        O arquivo comprimido é enviado como está, com Content-Encoding: gzip,
+        quando o cliente aceita gzip; caso contrário é descomprimido durante
+        o envio. Arquivos antigos, sem compressão, são enviados diretamente.
+        
+        Todas as respostas têm ETag: com If-None-Match igual, a resposta é
+        304 sem corpo; com Range (e If-Range igual, se informado), apenas o
+        intervalo pedido é enviado (206).
+        
+        Args:
+            nome_arquivo: Nome do arquivo (orcamento_*.json)
+            accept_encoding: Header Accept-Encoding da requisição
+            if_none_match: Header If-None-Match da requisição
+            intervalo: Header Range da requisição
+            if_range: Header If-Range da requisição
+            
+        Returns:
+            Response com o JSON do orçamento (200, 206 ou 304)
+        """
+        logger.info(f"Download solicitado: {nome_arquivo}")
+        
+        ArquivoOrcamentoController._validar_nome(nome_arquivo)
+        
+        arquivo = await ArquivoOrcamentoService.obter_informacoes_arquivo_async(nome_arquivo)
+        if arquivo is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Arquivo não encontrado"
+            )
+        await ArquivoOrcamentoService.registrar_acesso_async(nome_arquivo)
+        
+        caminho, estado = arquivo["caminho"], arquivo["estado"]
+        enviar_gzip = arquivo["comprimido"] and ArquivoOrcamentoController._aceita_gzip(accept_encoding)
+        etag = ArquivoOrcamentoController._etag(estado, "gzip" if enviar_gzip else None)
+        cabecalhos = {"ETag": etag}
+        if arquivo["comprimido"]:
+            cabecalhos["Vary"] = "Accept-Encoding"
+        
+        if ArquivoOrcamentoController._etag_confere(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cabecalhos)
+        
+        # Arquivo enviado como está no disco: FileResponse trata Range e If-Range
+        if enviar_gzip:
+            cabecalhos["Content-Encoding"] = "gzip"
+        if enviar_gzip or not arquivo["comprimido"]:
+            return FileResponse(
+                path=caminho,
+                filename=nome_arquivo,
+                media_type="application/json",
+                headers=cabecalhos,
+                stat_result=estado
+            )
+        
+        # Descomprimido durante o envio; o intervalo se refere ao JSON descomprimido
+        tamanho = arquivo["tamanho_original"]
+        faixa = None
+        if intervalo and (if_range is None or if_range.strip() == etag):
+            faixa = ArquivoOrcamentoController._intervalo(intervalo, tamanho)
+        
+        cabecalhos.update({
+            "Content-Disposition": f'attachment; filename="{nome_arquivo}"',
+            "Accept-Ranges": "bytes",
+        })
+        if faixa is None:
+            cabecalhos["Content-Length"] = str(tamanho)
+            return StreamingResponse(
+                ArquivoOrcamentoController._descomprimir(caminho),
+                media_type="application/json",
+                headers=cabecalhos
+            )
+        
+        inicio, fim = faixa
+        cabecalhos.update({
+            "Content-Range": f"bytes {inicio}-{fim}/{tamanho}",
+            "Content-Length": str(fim - inicio + 1),
+        })
+        return StreamingResponse(
+            ArquivoOrcamentoController._descomprimir(caminho, inicio, fim - inicio + 1),
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type="application/json",
+            headers=cabecalhos
+        )
+    
+    @staticmethod
+    async def deletar(nome_arquivo: str) -> None:
+        """
+        Deleta um arquivo de orçamento
+        
+        Args:
+            nome_arquivo: Nome do arquivo (orcamento_*.json)
+        """
+        logger.info(f"Deletando arquivo: {nome_arquivo}")
+        
+        ArquivoOrcamentoController._validar_nome(nome_arquivo)
+        
+        if not await ArquivoOrcamentoService.deletar_arquivo_async(nome_arquivo):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Arquivo não encontrado"
+            )
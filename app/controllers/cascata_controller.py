@@ -1,9 +1,20 @@
 from fastapi import HTTPException, status
+from fastapi.responses import Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, Union, Callable
 from ..config.logging_config import get_logger
-from ..schemas.pedido_cascata import PedidoCascataResponse, DivisaoLogisticaInfo
+from ..config.settings import get_settings
+from ..schemas.pedido_cascata import (
+    PedidoCascataResponse,
+    DivisaoLogisticaInfo,
+    DivisaoListResponse,
+    ProdutoListResponse,
+    DataListResponse,
+    ArquivoListResponse
+)
 from ..services.cascata_service import CascataService
+from ..services.cascata_cache_service import CascataCacheService
 
 logger = get_logger(__name__)
 
@@ -12,17 +23,25 @@ class CascataController:
     """Controller para operações de pedidos em cascata"""
     
     @staticmethod
-    async def get_pedidos_escola(db: Session, escola_id: int, tipo_formulario: str = 'MEMOREX') -> PedidoCascataResponse:
+    async def get_pedidos_escola(db: Session, escola_id: int, tipo_formulario: str = 'MEMOREX') -> Union[PedidoCascataResponse, Response]:
         """
         Obtém pedidos da escola em estrutura hierárquica
         
+        O JSON montado pelo PostgreSQL é repassado sem passar por dicts nem
+        pelo schema; com VALIDAR_RESPOSTAS_JSON a resposta é validada por
+        PedidoCascataResponse.
+        
+        O resultado vem do cache por (escola, tipo_formulario) enquanto os
+        dados da escola não mudarem; a consulta roda fora do event loop, e
+        requisições simultâneas da mesma escola aguardam uma única consulta.
+        
         Args:
             db: Sessão do banco de dados
             escola_id: ID da escola
             tipo_formulario: Tipo de formulário a filtrar (padrão: 'MEMOREX')
             
         Returns:
-            PedidoCascataResponse com dados em cascata
+            PedidoCascataResponse (ou o JSON equivalente) com dados em cascata
         """
         logger.info(f"Requisição para obter pedidos em cascata da escola {escola_id}, tipo_formulario={tipo_formulario}")
         
@@ -34,14 +53,27 @@ class CascataController:
             )
         
         try:
-            dashboard_data = CascataService.get_pedidos_escola_cascata(db, escola_id, tipo_formulario)
-            
-            response = PedidoCascataResponse(
-                dashboard_completo=dashboard_data
+            validar = get_settings().VALIDAR_RESPOSTAS_JSON
+            gerar = CascataService.get_pedidos_escola_cascata if validar else CascataService.get_pedidos_escola_cascata_json
+            dashboard, do_cache = await run_in_threadpool(
+                CascataCacheService.obter_ou_gerar,
+                db,
+                escola_id,
+                tipo_formulario,
+                lambda: gerar(db, escola_id, tipo_formulario),
+                "dict" if validar else "json"
             )
+            logger.info(f"Pedidos em cascata obtidos para escola {escola_id} (cache={do_cache})")
             
-            logger.info(f"Pedidos em cascata obtidos para escola {escola_id}")
-            return response
+            if not validar:
+                return Response(
+                    content='{"dashboard_completo":' + dashboard + '}',
+                    media_type="application/json"
+                )
+            
+            return PedidoCascataResponse(
+                dashboard_completo=dashboard
+            )
             
         except HTTPException:
             raise
@@ -51,3 +83,68 @@ class CascataController:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Erro ao buscar pedidos da escola: {str(e)}"
             )
+    
+    @staticmethod
+    async def _listar_nivel(nivel: str, listar: Callable[..., Dict[str, Any]], db: Session, escola_id: int, **filtros) -> Dict[str, Any]:
+        """
+        Executa a consulta de um nível da cascata fora do event loop
+        
+        Args:
+            nivel: Nome do nível (para log)
+            listar: Método de CascataService do nível
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            **filtros: Caminho até o nível, tipo_formulario e paginação
+            
+        Returns:
+            Dicionário com total e a página do nível
+        """
+        logger.info(f"Requisição de {nivel} da cascata da escola {escola_id}: {filtros}")
+        
+        if escola_id <= 0:
+            logger.warning(f"ID de escola inválido: {escola_id}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ID da escola deve ser maior que zero"
+            )
+        
+        try:
+            return await run_in_threadpool(listar, db, escola_id, **filtros)
+        except Exception as e:
+            logger.error(f"Erro ao buscar {nivel} da cascata: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Erro ao buscar {nivel} da escola: {str(e)}"
+            )
+    
+    @staticmethod
+    async def listar_divisoes(db: Session, escola_id: int, **filtros) -> DivisaoListResponse:
+        """Divisões logísticas da escola, com totais (primeiro nível)"""
+        resultado = await CascataController._listar_nivel(
+            "divisões", CascataService.listar_divisoes, db, escola_id, **filtros
+        )
+        return DivisaoListResponse(**resultado)
+    
+    @staticmethod
+    async def listar_produtos(db: Session, escola_id: int, **filtros) -> ProdutoListResponse:
+        """Produtos de uma divisão (segundo nível)"""
+        resultado = await CascataController._listar_nivel(
+            "produtos", CascataService.listar_produtos, db, escola_id, **filtros
+        )
+        return ProdutoListResponse(**resultado)
+    
+    @staticmethod
+    async def listar_datas(db: Session, escola_id: int, **filtros) -> DataListResponse:
+        """Datas de saída de um produto (terceiro nível)"""
+        resultado = await CascataController._listar_nivel(
+            "datas", CascataService.listar_datas, db, escola_id, **filtros
+        )
+        return DataListResponse(**resultado)
+    
+    @staticmethod
+    async def listar_arquivos(db: Session, escola_id: int, **filtros) -> ArquivoListResponse:
+        """Arquivos de uma data de saída (quarto nível)"""
+        resultado = await CascataController._listar_nivel(
+            "arquivos", CascataService.listar_arquivos, db, escola_id, **filtros
+        )
+        return ArquivoListResponse(**resultado)
@@ -1,10 +1,18 @@
-from fastapi import HTTPException, status
+import json
+import time
+import asyncio
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+from ..config.settings import get_settings
 from ..config.logging_config import get_logger
-from ..schemas.dashboard import DashboardResponse, EscolaListItem
+from ..schemas.dashboard import DashboardResponse, EscolaListItem, DashboardDetalhadoResponse, EscolaDetalhadaItem
 from ..services.dashboard_service import DashboardService
+from ..services.dashboard_eventos_service import DashboardEventosService
 
+settings = get_settings()
 logger = get_logger(__name__)
 
 
@@ -12,29 +20,47 @@ class DashboardController:
     """Controller para operações do dashboard"""
     
     @staticmethod
-    async def get_escolas(db: Session) -> DashboardResponse:
+    async def get_escolas(
+        db: Session,
+        detalhado: bool = False,
+        tipo_formulario: Optional[str] = None
+    ) -> Union[DashboardResponse, DashboardDetalhadoResponse]:
         """
         Obtém lista de escolas com contagem de pedidos
         
         Args:
             db: Sessão do banco de dados
+            detalhado: Inclui status, cópias, páginas e próxima data de saída
+            tipo_formulario: Considera apenas pedidos deste tipo (None = todos)
             
         Returns:
-            DashboardResponse com lista de escolas
+            DashboardResponse com lista de escolas (DashboardDetalhadoResponse se detalhado)
         """
-        logger.info("Requisição para obter escolas do dashboard")
+        logger.info(f"Requisição para obter escolas do dashboard (detalhado={detalhado}, tipo_formulario={tipo_formulario})")
         
         try:
-            escolas_data = DashboardService.get_escolas_com_pedidos(db)
-            
-            escolas_list = [
-                EscolaListItem(**escola) for escola in escolas_data
-            ]
-            
-            response = DashboardResponse(
-                escolas=escolas_list,
-                total_escolas=len(escolas_list)
-            )
+            if detalhado:
+                escolas_data = await run_in_threadpool(
+                    DashboardService.get_escolas_com_pedidos_detalhado, db, tipo_formulario
+                )
+                escolas_list = [
+                    EscolaDetalhadaItem(**escola) for escola in escolas_data
+                ]
+                response = DashboardDetalhadoResponse(
+                    escolas=escolas_list,
+                    total_escolas=len(escolas_list)
+                )
+            else:
+                escolas_data = await run_in_threadpool(
+                    DashboardService.get_escolas_com_pedidos, db, tipo_formulario
+                )
+                escolas_list = [
+                    EscolaListItem(**escola) for escola in escolas_data
+                ]
+                response = DashboardResponse(
+                    escolas=escolas_list,
+                    total_escolas=len(escolas_list)
+                )
             
             logger.info(f"Dashboard retornou {len(escolas_list)} escolas")
             return response
@@ -45,3 +71,55 @@ class DashboardController:
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Erro ao buscar dados do dashboard: {str(e)}"
             )
+
+    @staticmethod
+    async def eventos(request: Request, escola_ids: Optional[List[int]] = None) -> StreamingResponse:
+        """
+        Abre o fluxo SSE de mudanças no resumo de pedidos por escola
+        
+        Eventos: "sincronizar" (ao conectar e quando eventos podem ter sido
+        perdidos: o cliente deve recarregar /api/dashboard/escolas), "escola"
+        (totais novos de uma escola) e "escola_removida" (escola sem pedidos).
+        Comentários ": ping" mantêm a conexão aberta em proxies. O fluxo é
+        encerrado após DASHBOARD_EVENTOS_DURACAO_MAXIMA_SEGUNDOS e o cliente
+        reconecta.
+        
+        Args:
+            request: Requisição (para detectar a desconexão do cliente)
+            escola_ids: Escolas de interesse (None = todas)
+            
+        Returns:
+            StreamingResponse text/event-stream
+        """
+        heartbeat = settings.DASHBOARD_EVENTOS_HEARTBEAT_SEGUNDOS
+
+        async def gerar():
+            assinatura = DashboardEventosService.assinar(escola_ids)
+            logger.info(f"Cliente conectado aos eventos do dashboard (escola_ids={escola_ids})")
+            limite = time.monotonic() + settings.DASHBOARD_EVENTOS_DURACAO_MAXIMA_SEGUNDOS
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    try:
+                        evento = await asyncio.wait_for(assinatura.fila.get(), timeout=min(heartbeat, restante))
+                    except asyncio.TimeoutError:
+                        if await request.is_disconnected():
+                            break
+                        yield ": ping\n\n"
+                        continue
+                    if evento is None:
+                        break
+                    dados = {chave: valor for chave, valor in evento.items() if chave != "tipo"}
+                    yield f"event: {evento['tipo']}\ndata: {json.dumps(dados, ensure_ascii=False, default=str)}\n\n"
+            finally:
+                DashboardEventosService.cancelar(assinatura)
+                logger.info("Cliente desconectado dos eventos do dashboard")
+
+        return StreamingResponse(
+            gerar(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
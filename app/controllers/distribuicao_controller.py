@@ -0,0 +1,54 @@
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from ..config.logging_config import get_logger
+from ..schemas.distribuicao import TransicaoStatusRequest, TransicaoStatusResponse
+from ..services.distribuicao_status_service import DistribuicaoStatusService
+
+logger = get_logger(__name__)
+
+
+class DistribuicaoController:
+    """Controller para operações de distribuição de materiais"""
+
+    @staticmethod
+    async def transicionar_status(db: Session, request: TransicaoStatusRequest) -> TransicaoStatusResponse:
+        """
+        Move distribuições para um novo status em lote, com histórico
+
+        Args:
+            db: Sessão do banco de dados
+            request: IDs das distribuições e status de destino
+
+        Returns:
+            TransicaoStatusResponse com contagens e tempo
+        """
+        logger.info(
+            f"Requisição de transição de status: {len(request.distribuicao_material_ids)} "
+            f"distribuição(ões) -> {request.status_codigo}"
+        )
+
+        try:
+            # SELECT ... FOR UPDATE pode esperar por locks: fora do event loop
+            resultado = await run_in_threadpool(
+                DistribuicaoStatusService.transicionar,
+                db,
+                request.distribuicao_material_ids,
+                request.status_codigo,
+                status_distribuicao=request.status_distribuicao,
+                status_origem=request.status_origem,
+                mensagem=request.mensagem
+            )
+            return TransicaoStatusResponse(**resultado)
+        except ValueError as e:
+            logger.warning(str(e))
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=str(e)
+            )
+        except Exception as e:
+            logger.error(f"Erro na transição de status: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Erro na transição de status: {str(e)}"
+            )
@@ -1,32 +1,46 @@
 from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+from datetime import date
+import json
+from ..config.database import SessionLocal
 from ..config.logging_config import get_logger
-from ..schemas.orcamento import OrcamentoRequest, OrcamentoListResponse
+from ..config.settings import get_settings
+from ..schemas.orcamento import (
+    OrcamentoRequest,
+    OrcamentoListResponse,
+    OrcamentoLoteRequest,
+    OrcamentoLoteResponse,
+    OrcamentoJobResponse,
+    OrcamentoPersistidoListResponse
+)
 from ..services.orcamento_service import OrcamentoService
+from ..services.orcamento_cache_service import OrcamentoCacheService
+from ..services.orcamento_lote_service import OrcamentoLoteService
+from ..services.orcamento_job_service import OrcamentoJobService
+from ..services.orcamento_incremental_service import OrcamentoIncrementalService
+from ..services.orcamento_persistencia_service import OrcamentoPersistenciaService
 from ..services.arquivo_orcamento_service import ArquivoOrcamentoService
 
 logger = get_logger(__name__)
 
+MEDIA_TYPE_NDJSON = "application/x-ndjson"
+
 
 class OrcamentoController:
     """Controller para operações de orçamento"""
     
     @staticmethod
-    async def gerar_orcamento(db: Session, request: OrcamentoRequest) -> OrcamentoListResponse:
+    def _validar_request(request: OrcamentoRequest) -> None:
         """
-        Gera orçamento com base nos filtros fornecidos
+        Valida os filtros da requisição de orçamento
         
-        Args:
-            db: Sessão do banco de dados
-            request: Dados para geração do orçamento
-            
-        Returns:
-            OrcamentoListResponse com orçamentos gerados
+        Raises:
+            HTTPException 400 se algum filtro obrigatório for inválido
         """
-        logger.info(f"Requisição para gerar orçamento: escola={request.escola_id}, produtos={request.ids_produtos}")
-        
-        # Validações
         if request.escola_id <= 0:
             logger.warning(f"ID de escola inválido: {request.escola_id}")
             raise HTTPException(
@@ -48,43 +62,410 @@ class OrcamentoController:
                 detail="Deve ser fornecida ao menos uma data de saída"
             )
         
-        try:
-            orcamentos = OrcamentoService.gerar_orcamento(
-                db=db,
-                escola_id=request.escola_id,
-                ids_produtos=request.ids_produtos,
-                datas_saida=request.datas_saida,
-                divisoes_logistica=request.divisoes_logistica,
-                dias_uteis_filtro=request.dias_uteis_filtro
+        if request.arquivo_base is not None and (
+            not request.arquivo_base.startswith("orcamento_")
+            or not request.arquivo_base.endswith(".json")
+            or "/" in request.arquivo_base
+            or "\\" in request.arquivo_base
+        ):
+            logger.warning(f"Arquivo base inválido: {request.arquivo_base}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Nome de arquivo base inválido"
             )
+    
+    @staticmethod
+    def _gerar_e_persistir(db: Session, request: OrcamentoRequest, validar: bool) -> Dict[str, Any]:
+        """
+        Etapa bloqueante de gerar_orcamento (executada em thread)
+        
+        Lê a marca dos dados, gera os orçamentos (incremental, cache ou
+        consulta; pode aguardar uma geração da mesma chave em outra thread)
+        e os persiste em orcamento_api se pedido.
+        
+        Args:
+            db: Sessão do banco de dados
+            request: Dados para geração do orçamento
+            validar: True para orçamentos em dict, False para textos JSON
+            
+        Returns:
+            Dicionário com orcamentos, do_cache, incremental, marca_dados,
+            orcamentos_json (array JSON no modo JSON) e persistencia
+        """
+        marca_dados = OrcamentoIncrementalService.marca_dados(db)
+        incremental = None
+        if request.arquivo_base:
+            incremental = OrcamentoIncrementalService.gerar_orcamento_incremental(db, request, request.arquivo_base)
+            orcamentos, do_cache = incremental["orcamentos"], False
+            marca_dados = incremental["marca_dados"]
+            if not validar:
+                orcamentos = [json.dumps(orcamento, ensure_ascii=False) for orcamento in orcamentos]
+        else:
+            gerar = OrcamentoService.gerar_orcamento if validar else OrcamentoService.gerar_orcamento_json
+            orcamentos, do_cache = OrcamentoCacheService.obter_ou_gerar(
+                db,
+                request,
+                lambda: gerar(
+                    db=db,
+                    escola_id=request.escola_id,
+                    ids_produtos=request.ids_produtos,
+                    datas_saida=request.datas_saida,
+                    divisoes_logistica=request.divisoes_logistica,
+                    dias_uteis_filtro=request.dias_uteis_filtro,
+                    versao_query=request.versao_query
+                ),
+                formato="dict" if validar else "json"
+            )
+        
+        # Modo JSON: orcamentos são textos JSON, concatenados em um array
+        orcamentos_json = None if validar else '[' + ','.join(orcamentos) + ']'
+        
+        persistencia = None
+        if request.persistir:
+            if orcamentos_json is None:
+                persistencia = OrcamentoPersistenciaService.persistir(db, orcamentos)
+            else:
+                persistencia = OrcamentoPersistenciaService.persistir_json(db, orcamentos_json)
+        
+        return {
+            "orcamentos": orcamentos,
+            "do_cache": do_cache,
+            "incremental": incremental,
+            "marca_dados": marca_dados,
+            "orcamentos_json": orcamentos_json,
+            "persistencia": persistencia,
+        }
+    
+    @staticmethod
+    async def gerar_orcamento(db: Session, request: OrcamentoRequest) -> Union[OrcamentoListResponse, Response]:
+        """
+        Gera orçamento com base nos filtros fornecidos
+        
+        Os orçamentos chegam do PostgreSQL como texto JSON e são repassados
+        (cache, arquivo, persistência e resposta) sem virar dict; com
+        VALIDAR_RESPOSTAS_JSON a resposta é validada por OrcamentoListResponse.
+        
+        Args:
+            db: Sessão do banco de dados
+            request: Dados para geração do orçamento
+            
+        Returns:
+            OrcamentoListResponse (ou o JSON equivalente) com orçamentos gerados
+        """
+        logger.info(f"Requisição para gerar orçamento: escola={request.escola_id}, produtos={request.ids_produtos}")
+        
+        OrcamentoController._validar_request(request)
+        
+        validar = get_settings().VALIDAR_RESPOSTAS_JSON
+        
+        try:
+            # Marca dos dados, cache, geração e persistência: fora do event loop
+            resultado = await run_in_threadpool(OrcamentoController._gerar_e_persistir, db, request, validar)
+            orcamentos = resultado["orcamentos"]
+            do_cache = resultado["do_cache"]
+            incremental = resultado["incremental"]
+            marca_dados = resultado["marca_dados"]
+            orcamentos_json = resultado["orcamentos_json"]
+            persistencia = resultado["persistencia"]
             
             # Salvar orçamento em arquivo
             nome_arquivo = None
             try:
-                nome_arquivo = ArquivoOrcamentoService.salvar_orcamento(
+                nome_arquivo = await ArquivoOrcamentoService.salvar_orcamento_async(
                     orcamentos=orcamentos,
                     escola_id=request.escola_id,
-                    ids_produtos=request.ids_produtos
+                    ids_produtos=request.ids_produtos,
+                    datas_saida=request.datas_saida,
+                    divisoes_logistica=request.divisoes_logistica,
+                    dias_uteis_filtro=request.dias_uteis_filtro,
+                    marca_dados=marca_dados,
+                    json_bruto=orcamentos_json is not None
                 )
                 logger.info(f"Orçamento salvo em arquivo: {nome_arquivo}")
             except Exception as e:
                 logger.warning(f"Erro ao salvar arquivo de orçamento: {str(e)}")
             
-            response = OrcamentoListResponse(
-                orcamentos=orcamentos,
-                total_unidades=len(orcamentos),
-                arquivo=nome_arquivo,
-                mensagem=f"Orçamento gerado com sucesso para {len(orcamentos)} unidade(s)"
-            )
+            dados = {
+                "total_unidades": len(orcamentos),
+                "arquivo": nome_arquivo,
+                "mensagem": f"Orçamento gerado com sucesso para {len(orcamentos)} unidade(s)",
+                "unidades_reaproveitadas": incremental["unidades_reaproveitadas"] if incremental else None,
+                "unidades_recalculadas": incremental["unidades_recalculadas"] if incremental else None,
+                "unidades_removidas": incremental["unidades_removidas"] if incremental else None,
+                "persistencia": persistencia
+            }
             
-            logger.info(f"Orçamento gerado com sucesso: {len(orcamentos)} unidades")
-            return response
+            logger.info(f"Orçamento gerado com sucesso: {len(orcamentos)} unidades (cache={do_cache}, incremental={incremental is not None})")
+            if orcamentos_json is None:
+                return OrcamentoListResponse(orcamentos=orcamentos, **dados)
+            
+            # Mesmo formato de OrcamentoListResponse, montado sem decodificar os orçamentos
+            return Response(
+                content='{"orcamentos":' + orcamentos_json + ',' + json.dumps(dados, ensure_ascii=False)[1:],
+                media_type="application/json"
+            )
             
         except HTTPException:
             raise
+        except FileNotFoundError:
+            logger.warning(f"Arquivo base não encontrado: {request.arquivo_base}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Arquivo base não encontrado"
+            )
+        except ValueError as e:
+            logger.warning(f"Arquivo base incompatível com a requisição: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
         except Exception as e:
             logger.error(f"Erro no controller de orçamento: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Erro ao gerar orçamento: {str(e)}"
             )
+    
+    @staticmethod
+    def gerar_orcamento_job(request: OrcamentoRequest) -> JSONResponse:
+        """
+        Enfileira a geração do orçamento e retorna imediatamente o ID do job
+        
+        O job gera o orçamento e salva o arquivo em temp_orcamentos/; o
+        andamento é consultado em GET /api/orcamento/jobs/{job_id}.
+        
+        Args:
+            request: Dados para geração do orçamento
+            
+        Returns:
+            JSONResponse 202 com o estado inicial do job
+        """
+        logger.info(f"Requisição para gerar orçamento (assíncrono): escola={request.escola_id}, produtos={request.ids_produtos}")
+        
+        OrcamentoController._validar_request(request)
+        
+        job = OrcamentoJobService.submeter(request)
+        if job is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Fila de geração de orçamentos cheia. Tente novamente em instantes.",
+                headers={"Retry-After": "30"}
+            )
+        
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(OrcamentoJobResponse(**job)),
+            headers={"Location": f"/api/orcamento/jobs/{job['job_id']}"}
+        )
+    
+    @staticmethod
+    def obter_job(job_id: str) -> OrcamentoJobResponse:
+        """
+        Retorna o estado de um job de orçamento
+        
+        Args:
+            job_id: ID do job
+            
+        Returns:
+            OrcamentoJobResponse com status, tempos e arquivo gerado
+        """
+        job = OrcamentoJobService.obter(job_id)
+        if job is None:
+            logger.warning(f"Job de orçamento não encontrado: {job_id}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job não encontrado ou expirado"
+            )
+        return OrcamentoJobResponse(**job)
+    
+    @staticmethod
+    def gerar_orcamento_stream(request: OrcamentoRequest) -> StreamingResponse:
+        """
+        Gera orçamento em modo streaming (NDJSON): um orçamento por linha
+        
+        A consulta usa cursor no servidor e cada orçamento é enviado assim que
+        o PostgreSQL o produz. Neste modo o arquivo em temp_orcamentos/ não é
+        gerado, pois exigiria manter todos os orçamentos em memória.
+        
+        Args:
+            request: Dados para geração do orçamento
+            
+        Returns:
+            StreamingResponse com media type application/x-ndjson
+        """
+        logger.info(f"Requisição para gerar orçamento (NDJSON): escola={request.escola_id}, produtos={request.ids_produtos}")
+        
+        OrcamentoController._validar_request(request)
+        if request.arquivo_base:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Geração incremental (arquivo_base) não está disponível em streaming"
+            )
+        if request.persistir:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Persistência (persistir) não está disponível em streaming"
+            )
+        
+        def gerar_linhas():
+            # Sessão própria: precisa permanecer aberta enquanto a resposta é enviada
+            db = SessionLocal()
+            try:
+                for orcamento in OrcamentoService.iterar_orcamentos(
+                    db=db,
+                    escola_id=request.escola_id,
+                    ids_produtos=request.ids_produtos,
+                    datas_saida=request.datas_saida,
+                    divisoes_logistica=request.divisoes_logistica,
+                    dias_uteis_filtro=request.dias_uteis_filtro,
+                    versao_query=request.versao_query,
+                    como_texto=True
+                ):
+                    yield orcamento + "\n"
+            finally:
+                db.close()
+        
+        return StreamingResponse(gerar_linhas(), media_type=MEDIA_TYPE_NDJSON)
+    
+    @staticmethod
+    def _resolver_lote(request: OrcamentoLoteRequest) -> List[OrcamentoRequest]:
+        """
+        Resolve os filtros de cada escola do lote (próprios ou compartilhados)
+        
+        Args:
+            request: Requisição do lote
+            
+        Returns:
+            Uma OrcamentoRequest validada por escola
+        """
+        requests = []
+        for escola in request.escolas:
+            ids_produtos = escola.ids_produtos or request.ids_produtos
+            datas_saida = escola.datas_saida or request.datas_saida
+            
+            if not ids_produtos or not datas_saida:
+                logger.warning(f"Lote sem produtos ou datas para escola_id={escola.escola_id}")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Escola {escola.escola_id}: informe produtos e datas de saída (na escola ou no lote)"
+                )
+            
+            requests.append(OrcamentoRequest(
+                escola_id=escola.escola_id,
+                ids_produtos=ids_produtos,
+                datas_saida=datas_saida,
+                divisoes_logistica=escola.divisoes_logistica or request.divisoes_logistica,
+                dias_uteis_filtro=escola.dias_uteis_filtro or request.dias_uteis_filtro,
+                versao_query=request.versao_query,
+                persistir=request.persistir
+            ))
+        return requests
+    
+    @staticmethod
+    async def gerar_orcamento_lote(request: OrcamentoLoteRequest) -> OrcamentoLoteResponse:
+        """
+        Gera orçamentos para várias escolas, agrupados por escola
+        
+        As escolas são processadas em paralelo (limite de
+        ORCAMENTO_LOTE_MAX_PARALELO), fora do event loop.
+        
+        Args:
+            request: Requisição do lote
+            
+        Returns:
+            OrcamentoLoteResponse com um resultado por escola
+        """
+        logger.info(f"Requisição para gerar orçamento em lote: {len(request.escolas)} escola(s)")
+        
+        requests = OrcamentoController._resolver_lote(request)
+        
+        try:
+            resultado = await run_in_threadpool(OrcamentoLoteService.gerar_lote, requests)
+            return OrcamentoLoteResponse(**resultado)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Erro no controller de orçamento em lote: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Erro ao gerar orçamentos em lote: {str(e)}"
+            )
+    
+    @staticmethod
+    def gerar_orcamento_lote_stream(request: OrcamentoLoteRequest) -> StreamingResponse:
+        """
+        Gera orçamentos em lote em modo streaming (NDJSON)
+        
+        Cada linha é o resultado de uma escola (formato de OrcamentoLoteItem),
+        enviada assim que a escola termina.
+        
+        Args:
+            request: Requisição do lote
+            
+        Returns:
+            StreamingResponse com media type application/x-ndjson
+        """
+        logger.info(f"Requisição para gerar orçamento em lote (NDJSON): {len(request.escolas)} escola(s)")
+        
+        requests = OrcamentoController._resolver_lote(request)
+        
+        def gerar_linhas():
+            for resultado in OrcamentoLoteService.iterar_lote(requests):
+                yield json.dumps(resultado, ensure_ascii=False) + "\n"
+        
+        return StreamingResponse(gerar_linhas(), media_type=MEDIA_TYPE_NDJSON)
+    
+    @staticmethod
+    async def consultar_persistidos(
+        db: Session,
+        escola_id: int,
+        datas_saida: Optional[List[date]] = None,
+        unidade_escolar_id: Optional[int] = None,
+        limite: int = 500,
+        offset: int = 0
+    ) -> OrcamentoPersistidoListResponse:
+        """
+        Consulta os orçamentos gravados em orcamento_api por escola e data
+        
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            datas_saida: Datas de saída (opcional)
+            unidade_escolar_id: ID da unidade escolar (opcional)
+            limite: Quantidade máxima de registros
+            offset: Registros a pular (paginação)
+            
+        Returns:
+            OrcamentoPersistidoListResponse com a página de registros e o
+            total de registros com os mesmos filtros
+        """
+        if escola_id <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="ID da escola deve ser maior que zero"
+            )
+        
+        try:
+            registros = await run_in_threadpool(
+                OrcamentoPersistenciaService.consultar,
+                db,
+                escola_id,
+                datas_saida=datas_saida,
+                unidade_escolar_id=unidade_escolar_id,
+                limite=limite,
+                offset=offset
+            )
+            total = await run_in_threadpool(
+                OrcamentoPersistenciaService.contar,
+                db,
+                escola_id,
+                datas_saida=datas_saida,
+                unidade_escolar_id=unidade_escolar_id
+            )
+            return OrcamentoPersistidoListResponse(registros=registros, total=total)
+        except Exception as e:
+            logger.error(f"Erro ao consultar orçamentos persistidos: {str(e)}", exc_info=True)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Erro ao consultar orçamentos persistidos: {str(e)}"
+            )
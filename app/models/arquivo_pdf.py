@@ -1,10 +1,23 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.config.database import Base
 
 class ArquivoPdf(Base):
     __tablename__ = "arquivo_pdfs"
+    __table_args__ = (
+        # migrations/001_arquivo_pdfs_paginas.sql
+        Index('idx_arquivo_pdfs_componente_par', 'id_componente', 'pares', 'formulario_id', text('criado_em DESC')),
+        Index('idx_arquivo_pdfs_componente_item', 'id_componente', 'item_pedido_id', text('criado_em DESC')),
+        # migrations/002_indices_orcamento_cascata.sql
+        Index('idx_arquivo_pdfs_item_pedido_id', 'item_pedido_id'),
+        Index(
+            'idx_arquivo_pdfs_pares_formulario',
+            'pares',
+            'formulario_id',
+            postgresql_where=text('pares IS NOT NULL')
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, nullable=False, comment="Nome do arquivo PDF")
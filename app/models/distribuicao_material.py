@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Date, DECIMAL
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Date, DECIMAL, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.config.database import Base
@@ -9,6 +9,27 @@ class DistribuicaoMaterial(Base):
     Representa a distribuição de materiais para unidades escolares em um formulário
     """
     __tablename__ = "distribuicao_materiais"
+    __table_args__ = (
+        # migrations/002_indices_orcamento_cascata.sql
+        Index(
+            'idx_distribuicao_materiais_pendente_unidade',
+            'unidade_escolar_id',
+            'especificacao_form_id',
+            postgresql_include=['quantidade', 'data_saida'],
+            postgresql_where=text("status_distribuicao = 'pendente'")
+        ),
+        Index(
+            'idx_distribuicao_materiais_unidade_arquivo',
+            'unidade_escolar_id',
+            'arquivo_pdf_id',
+            postgresql_include=['quantidade']
+        ),
+        Index('idx_distribuicao_materiais_arquivo_pdf_id', 'arquivo_pdf_id'),
+        Index('idx_distribuicao_materiais_especificacao_status', 'especificacao_form_id', 'status_distribuicao'),
+        Index('idx_distribuicao_materiais_formulario_status', 'formulario_id', 'status_distribuicao'),
+        # migrations/003_data_saida_date_dimensoes_numericas.sql
+        Index('idx_distribuicao_materiais_unidade_data_saida', 'unidade_escolar_id', 'data_saida'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     grupo_id = Column(Integer, nullable=True, comment="ID do grupo relacionado à distribuição - pode ser nulo para distribuições por turma")
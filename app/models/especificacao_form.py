@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Numeric
 from sqlalchemy.orm import relationship, foreign
 from sqlalchemy.sql import func
 from app.config.database import Base
@@ -44,6 +44,10 @@ class EspecificacaoForm(Base):
     altura = Column(String(50), nullable=True, comment="Altura do item em milímetros")
     largura = Column(String(50), nullable=True, comment="Largura do item em milímetros")
     gramatura_miolo = Column(String(50), nullable=True, comment="Gramatura do miolo informada no formulário")
+    # Mantidos por trigger a partir dos campos acima (migrations/003_data_saida_date_dimensoes_numericas.sql)
+    altura_num = Column(Numeric, nullable=True, comment="Altura em milímetros convertida para número (NULL se inválida)")
+    largura_num = Column(Numeric, nullable=True, comment="Largura em milímetros convertida para número (NULL se inválida)")
+    gramatura_miolo_num = Column(Numeric, nullable=True, comment="Gramatura do miolo convertida para número (ex.: '90,5 g' -> 90.5)")
     
     # Campos específicos do modelo comercial
     origem_dados = Column(String(100), nullable=True, comment="Origem dos dados (manual, importado, etc.)")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.config.database import Base
@@ -17,6 +17,8 @@ class Formulario(Base):
     # data_saida está na tabela distribuicao_materiais, não em formularios
     path_destino_de_arquivos = Column(String, nullable=True, comment="Caminho de destino dos arquivos relacionados ao formulário")
     tipo_formulario = Column(String, nullable=False, default="desconhecido", comment="Tipo do formulário (zerohum, comercial, etc.)")
+    # Mantido por trigger a partir de tipo_formulario (migrations/005_formularios_tipo_formulario_norm.sql)
+    tipo_formulario_norm = Column(String, nullable=True, comment="tipo_formulario sem espaços nas pontas e em maiúsculas (filtro indexado)")
     modelo = Column(String(255), nullable=True, comment="Modelo/tipo do formulário selecionado no Bremen (ex: Prova Digital A4, Apostila 75g 1x1)")
     cliente_id = Column(Integer, nullable=True)  # Removido FK para flexibilidade
     status_formulario_id = Column(Integer, nullable=True)  # Removido FK para flexibilidade
@@ -24,6 +26,11 @@ class Formulario(Base):
     criado_em = Column(DateTime, server_default=func.now(), nullable=False)
     atualizado_em = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
     
+    __table_args__ = (
+        # migrations/005_formularios_tipo_formulario_norm.sql
+        Index('idx_formularios_tipo_formulario_norm', 'tipo_formulario_norm', 'id'),
+    )
+    
     # Relacionamentos
     # usuario = relationship("Usuario", back_populates="formularios")
     arquivo_pdfs = relationship("ArquivoPdf", back_populates="formulario")
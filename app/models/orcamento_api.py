@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, Text, Index
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -11,6 +11,10 @@ class OrcamentoAPI(Base):
     Armazena o retorno da API de criação de orçamento (FASE 02 do DeskFlow)
     """
     __tablename__ = "orcamento_api"
+    __table_args__ = (
+        # migrations/004_orcamento_api_persistencia.sql
+        Index('idx_orcamento_api_escola_data_saida', 'escola_id', 'data_saida'),
+    )
     
     id = Column(
         Integer,
@@ -47,6 +51,24 @@ class OrcamentoAPI(Base):
         comment="Resposta completa da API de criação de orçamento"
     )
     
+    escola_id = Column(
+        Integer,
+        nullable=True,
+        comment="ID da escola da distribuição (copiado na gravação do orçamento)"
+    )
+    
+    unidade_escolar_id = Column(
+        Integer,
+        nullable=True,
+        comment="ID da unidade escolar da distribuição (copiado na gravação do orçamento)"
+    )
+    
+    data_saida = Column(
+        Date,
+        nullable=True,
+        comment="Data de saída da distribuição (copiada na gravação do orçamento)"
+    )
+    
     criado_em = Column(
         DateTime,
         nullable=False,
@@ -55,6 +77,12 @@ class OrcamentoAPI(Base):
         comment="Data e hora de criação do registro"
     )
     
+    atualizado_em = Column(
+        DateTime,
+        nullable=True,
+        comment="Data e hora da última gravação dos itens"
+    )
+    
     # Relacionamentos
     distribuicao_material = relationship(
         "DistribuicaoMaterial",
@@ -3,5 +3,7 @@ from . import auth
 from . import dashboard
 from . import pedido_cascata
 from . import orcamento
+from . import catalogo_bremen
+from . import distribuicao
 
-__all__ = ['auth', 'dashboard', 'pedido_cascata', 'orcamento']
+__all__ = ['auth', 'dashboard', 'pedido_cascata', 'orcamento', 'catalogo_bremen', 'distribuicao']
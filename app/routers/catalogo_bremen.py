@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from ..services.auth_service import verify_token
+from ..services.catalogo_bremen_service import CatalogoBremenService
+from ..config.logging_config import get_logger
+
+logger = get_logger(__name__)
+security = HTTPBearer()
+router = APIRouter(prefix="/api/catalogo-bremen", tags=["catalogo_bremen"])
+
+
+def verify_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Dependency para verificar se o usuário é admin
+    """
+    token_data = verify_token(credentials.credentials)
+    
+    if not token_data:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Verificar se é admin
+    roles = token_data.get("roles", "")
+    if not roles or "admin" not in [role.strip().lower() for role in roles.split(',')]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem acessar este recurso.",
+        )
+    
+    return token_data
+
+
+@router.get("/status")
+async def status_catalogo(user_data: dict = Depends(verify_admin)):
+    """
+    Retorna a versão, a data de carga e os totais do catálogo Bremen em memória
+    Apenas administradores podem acessar
+    """
+    return JSONResponse(CatalogoBremenService.status())
+
+
+@router.post("/recarregar")
+async def recarregar_catalogo(user_data: dict = Depends(verify_admin)):
+    """
+    Recarrega o catálogo Bremen do banco (usar após alterar tabelas bremen_*)
+    Apenas administradores podem acessar
+    """
+    try:
+        catalogo = await run_in_threadpool(CatalogoBremenService.recarregar)
+    except Exception as e:
+        logger.error(f"Erro ao recarregar catálogo Bremen: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao recarregar catálogo Bremen: {str(e)}"
+        )
+    return JSONResponse({
+        "mensagem": f"Catálogo Bremen recarregado (versão {catalogo.versao})",
+        **CatalogoBremenService.status()
+    })
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from ..config.database import get_db
-from ..schemas.dashboard import DashboardResponse
+from ..schemas.dashboard import DashboardResponse, DashboardDetalhadoResponse
 from ..controllers.dashboard_controller import DashboardController
+from ..services.resumo_pedidos_service import ResumoPedidosService
+from ..services.dashboard_eventos_service import DashboardEventosService
 from ..services.auth_service import verify_token, check_pcp_permission
 from fastapi import HTTPException, status
 
@@ -35,13 +40,56 @@ def verify_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
     return token_data
 
 
-@router.get("/escolas", response_model=DashboardResponse)
+@router.get("/escolas", response_model=Union[DashboardDetalhadoResponse, DashboardResponse])
 async def get_escolas(
+    detalhado: bool = Query(
+        default=False,
+        description="Inclui distribuições por status, cópias, páginas e próxima data de saída pendente"
+    ),
+    tipo_formulario: Optional[str] = Query(
+        default=None,
+        description="Considera apenas pedidos deste tipo de formulário (qualquer grafia); padrão: todos"
+    ),
     db: Session = Depends(get_db),
     user_data: dict = Depends(verify_admin)
 ):
     """
     Endpoint para obter lista de escolas com contagem de pedidos
+    Com detalhado=true, inclui os agregados usados pelo painel em uma única consulta
+    Com tipo_formulario, conta apenas pedidos desse tipo (como a cascata)
     Apenas administradores podem acessar
     """
-    return await DashboardController.get_escolas(db)
+    return await DashboardController.get_escolas(db, detalhado=detalhado, tipo_formulario=tipo_formulario)
+
+
+@router.post("/resumo/reconciliar")
+async def reconciliar_resumo(user_data: dict = Depends(verify_admin)):
+    """
+    Compara o resumo de pedidos por escola com as distribuições e corrige
+    as escolas divergentes (também executado periodicamente)
+    Apenas administradores podem acessar
+    """
+    return JSONResponse(await run_in_threadpool(ResumoPedidosService.reconciliar))
+
+
+@router.get("/eventos")
+async def eventos_dashboard(
+    request: Request,
+    escola_id: Optional[List[int]] = Query(default=None, description="Escolas de interesse (padrão: todas)"),
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Fluxo Server-Sent Events com as mudanças nos totais de pedidos por escola
+    (o token vai no header Authorization; use um cliente SSE baseado em fetch)
+    Apenas administradores podem acessar
+    """
+    return await DashboardController.eventos(request, escola_id)
+
+
+@router.get("/eventos/estatisticas")
+async def estatisticas_eventos(user_data: dict = Depends(verify_admin)):
+    """
+    Clientes conectados e estado da escuta de notificações neste processo
+    Apenas administradores podem acessar
+    """
+    return JSONResponse(DashboardEventosService.estatisticas())
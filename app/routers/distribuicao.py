@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from ..config.database import get_db
+from ..schemas.distribuicao import TransicaoStatusRequest, TransicaoStatusResponse
+from ..controllers.distribuicao_controller import DistribuicaoController
+from ..services.auth_service import verify_token
+from ..config.logging_config import get_logger
+
+logger = get_logger(__name__)
+security = HTTPBearer()
+router = APIRouter(prefix="/api/distribuicoes", tags=["distribuicoes"])
+
+
+def verify_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """
+    Dependency para verificar se o usuário é admin
+    """
+    token_data = verify_token(credentials.credentials)
+    
+    if not token_data:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Verificar se é admin
+    roles = token_data.get("roles", "")
+    if not roles or "admin" not in [role.strip().lower() for role in roles.split(',')]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso negado. Apenas administradores podem acessar este recurso.",
+        )
+    
+    return token_data
+
+
+@router.post("/status/transicao", response_model=TransicaoStatusResponse)
+async def transicionar_status(
+    request: TransicaoStatusRequest,
+    db: Session = Depends(get_db),
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Move distribuições para um novo status (status_deskflow_pedido) em lote
+    e registra cada transição em historico_processamento
+    Apenas administradores podem acessar
+    
+    Por padrão apenas distribuições pendentes são movidas; as demais
+    voltam em `ids_ignorados`.
+    """
+    return await DistribuicaoController.transicionar_status(db, request)
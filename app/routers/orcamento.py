@@ -1,12 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
+from typing import Optional, List
+from datetime import date
 from ..config.database import get_db
-from ..schemas.orcamento import OrcamentoRequest, OrcamentoListResponse
-from ..controllers.orcamento_controller import OrcamentoController
+from ..schemas.orcamento import (
+    OrcamentoRequest,
+    OrcamentoListResponse,
+    OrcamentoLoteRequest,
+    OrcamentoLoteResponse,
+    OrcamentoJobResponse,
+    OrcamentoPersistidoListResponse
+)
+from ..controllers.orcamento_controller import OrcamentoController, MEDIA_TYPE_NDJSON
+from ..controllers.arquivo_orcamento_controller import ArquivoOrcamentoController
 from ..services.auth_service import verify_token
 from ..services.arquivo_orcamento_service import ArquivoOrcamentoService
+from ..services.orcamento_cache_service import OrcamentoCacheService
 from ..config.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -41,60 +52,175 @@ def verify_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
 @router.post("/gerar", response_model=OrcamentoListResponse)
 async def gerar_orcamento(
     request: OrcamentoRequest,
+    assincrono: bool = Query(default=False, description="Enfileira a geração e retorna o ID do job (202)"),
+    accept: Optional[str] = Header(default=None),
     db: Session = Depends(get_db),
     user_data: dict = Depends(verify_admin)
 ):
     """
     Endpoint para gerar orçamento baseado nos filtros fornecidos
     Apenas administradores podem acessar
+    
+    Com o header `Accept: application/x-ndjson` a resposta é transmitida
+    em streaming, um orçamento (JSON) por linha.
+    
+    Com `?assincrono=true` a resposta é 202 com o ID do job; acompanhe em
+    GET /api/orcamento/jobs/{job_id} e baixe o arquivo gerado ao concluir.
+    
+    Com `arquivo_base` (arquivo salvo com os mesmos filtros) apenas as
+    unidades alteradas desde aquele arquivo são recalculadas.
+    
+    Com `persistir: true` os orçamentos também são gravados em
+    orcamento_api (consulta em GET /api/orcamento/persistidos).
     """
+    if assincrono:
+        return OrcamentoController.gerar_orcamento_job(request)
+    if accept and MEDIA_TYPE_NDJSON in accept.lower():
+        return OrcamentoController.gerar_orcamento_stream(request)
     return await OrcamentoController.gerar_orcamento(db, request)
 
 
+@router.get("/jobs/{job_id}", response_model=OrcamentoJobResponse)
+async def obter_job_orcamento(
+    job_id: str,
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Retorna o status, os tempos e o arquivo gerado de um job de orçamento
+    Apenas administradores podem acessar
+    """
+    return OrcamentoController.obter_job(job_id)
+
+
+@router.post("/gerar-lote", response_model=OrcamentoLoteResponse)
+async def gerar_orcamento_lote(
+    request: OrcamentoLoteRequest,
+    accept: Optional[str] = Header(default=None),
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Endpoint para gerar orçamentos de várias escolas em uma única chamada
+    Apenas administradores podem acessar
+    
+    Filtros informados em cada escola substituem os filtros compartilhados.
+    Com o header `Accept: application/x-ndjson` cada escola é enviada em uma
+    linha assim que termina.
+    """
+    if accept and MEDIA_TYPE_NDJSON in accept.lower():
+        return OrcamentoController.gerar_orcamento_lote_stream(request)
+    return await OrcamentoController.gerar_orcamento_lote(request)
+
+
+@router.get("/persistidos", response_model=OrcamentoPersistidoListResponse)
+async def consultar_orcamentos_persistidos(
+    escola_id: int = Query(..., gt=0, description="ID da escola"),
+    data_saida: Optional[List[date]] = Query(default=None, description="Datas de saída (repita o parâmetro)"),
+    unidade_escolar_id: Optional[int] = Query(default=None, gt=0, description="ID da unidade escolar"),
+    limite: int = Query(default=500, ge=1, le=5000),
+    offset: int = Query(default=0, ge=0),
+    db: Session = Depends(get_db),
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Consulta os orçamentos gravados em orcamento_api (gerados com `persistir`)
+    por escola e data de saída, uma linha por distribuição
+    Apenas administradores podem acessar
+    """
+    return await OrcamentoController.consultar_persistidos(
+        db,
+        escola_id,
+        datas_saida=data_saida,
+        unidade_escolar_id=unidade_escolar_id,
+        limite=limite,
+        offset=offset
+    )
+
+
+@router.get("/cache/estatisticas")
+async def estatisticas_cache(user_data: dict = Depends(verify_admin)):
+    """
+    Retorna os contadores do cache de orçamentos (acertos, falhas, expulsões)
+    Apenas administradores podem acessar
+    """
+    return JSONResponse(OrcamentoCacheService.estatisticas())
+
+
+@router.delete("/cache")
+async def limpar_cache(user_data: dict = Depends(verify_admin)):
+    """
+    Remove todas as entradas do cache de orçamentos
+    Apenas administradores podem acessar
+    """
+    removidas = OrcamentoCacheService.limpar()
+    return JSONResponse({
+        "mensagem": f"{removidas} entrada(s) removida(s) do cache"
+    })
+
+
 @router.get("/arquivos/listar")
-async def listar_orcamentos(user_data: dict = Depends(verify_admin)):
+async def listar_orcamentos(
+    escola_id: Optional[int] = Query(default=None, gt=0, description="Apenas arquivos desta escola"),
+    limite: Optional[int] = Query(default=None, ge=1, description="Quantidade máxima de arquivos"),
+    offset: int = Query(default=0, ge=0, description="Arquivos a pular (paginação)"),
+    user_data: dict = Depends(verify_admin)
+):
     """
-    Lista todos os arquivos de orçamento disponíveis
+    Lista os arquivos de orçamento disponíveis, mais recentes primeiro
     Apenas administradores podem acessar
+    
+    `total` é a quantidade de arquivos que atendem ao filtro (sem paginação).
     """
-    logger.info("Listando arquivos de orçamento")
-    orcamentos = ArquivoOrcamentoService.listar_orcamentos()
+    logger.info(f"Listando arquivos de orçamento (escola_id={escola_id}, limite={limite}, offset={offset})")
+    orcamentos = await ArquivoOrcamentoService.listar_orcamentos_async(escola_id=escola_id, limite=limite, offset=offset)
     return JSONResponse({
-        "total": len(orcamentos),
+        "total": await ArquivoOrcamentoService.contar_orcamentos_async(escola_id),
         "orcamentos": orcamentos
     })
 
 
+@router.get("/arquivos/retencao")
+async def obter_retencao(user_data: dict = Depends(verify_admin)):
+    """
+    Ocupação atual de temp_orcamentos/ (pelo índice), limites de retenção
+    e arquivos removidos pela retenção desde o início do processo
+    Apenas administradores podem acessar
+    """
+    return JSONResponse(await ArquivoOrcamentoService.obter_retencao_async())
+
+
+@router.post("/arquivos/reindexar")
+async def reindexar_orcamentos(user_data: dict = Depends(verify_admin)):
+    """
+    Reconstrói o índice de arquivos lendo todos os arquivos salvos
+    (necessário apenas se arquivos forem copiados ou removidos manualmente)
+    Apenas administradores podem acessar
+    """
+    total = await ArquivoOrcamentoService.reindexar_async()
+    return JSONResponse({
+        "mensagem": f"{total} arquivo(s) indexado(s)"
+    })
+
+
 @router.get("/arquivos/download/{nome_arquivo}")
 async def download_orcamento(
     nome_arquivo: str,
+    accept_encoding: Optional[str] = Header(default=None),
+    if_none_match: Optional[str] = Header(default=None),
+    intervalo: Optional[str] = Header(default=None, alias="Range"),
+    if_range: Optional[str] = Header(default=None),
     user_data: dict = Depends(verify_admin)
 ):
     """
     Faz download de um arquivo de orçamento
     Apenas administradores podem acessar
-    """
-    logger.info(f"Download solicitado: {nome_arquivo}")
-    
-    # Validar nome do arquivo (segurança)
-    if not nome_arquivo.startswith("orcamento_") or not nome_arquivo.endswith(".json"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Nome de arquivo inválido"
-        )
-    
-    # Verificar se arquivo existe
-    if not ArquivoOrcamentoService.arquivo_existe(nome_arquivo):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Arquivo não encontrado"
-        )
     
-    caminho = ArquivoOrcamentoService.obter_caminho_completo(nome_arquivo)
-    return FileResponse(
-        path=caminho,
-        filename=nome_arquivo,
-        media_type="application/json"
+    Com `Accept-Encoding: gzip` o arquivo é enviado comprimido
+    (`Content-Encoding: gzip`); sem ele, é descomprimido durante o envio.
+    A resposta tem `ETag`: `If-None-Match` retorna 304 se o arquivo for o
+    mesmo, e `Range` (com `If-Range` opcional) retoma downloads (206).
+    """
+    return await ArquivoOrcamentoController.download(
+        nome_arquivo, accept_encoding, if_none_match, intervalo, if_range
     )
 
 
@@ -107,21 +233,7 @@ async def deletar_orcamento(
     Deleta um arquivo de orçamento
     Apenas administradores podem acessar
     """
-    logger.info(f"Deletando arquivo: {nome_arquivo}")
-    
-    # Validar nome do arquivo (segurança)
-    if not nome_arquivo.startswith("orcamento_") or not nome_arquivo.endswith(".json"):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Nome de arquivo inválido"
-        )
-    
-    if not ArquivoOrcamentoService.deletar_arquivo(nome_arquivo):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Arquivo não encontrado"
-        )
-    
+    await ArquivoOrcamentoController.deletar(nome_arquivo)
     return JSONResponse({
         "mensagem": f"Arquivo {nome_arquivo} deletado com sucesso"
     })
@@ -138,7 +250,7 @@ async def limpar_arquivos_antigos(
     """
     logger.info(f"Limpando arquivos mais antigos que {dias} dia(s)")
     
-    deletados = ArquivoOrcamentoService.limpar_arquivos_antigos(dias=dias)
+    deletados = await ArquivoOrcamentoService.limpar_arquivos_antigos_async(dias=dias)
     return JSONResponse({
         "mensagem": f"{deletados} arquivo(s) antigo(s) deletado(s)"
     })
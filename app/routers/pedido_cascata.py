@@ -1,9 +1,17 @@
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from ..config.database import get_db
-from ..schemas.pedido_cascata import PedidoCascataResponse
+from ..schemas.pedido_cascata import (
+    PedidoCascataResponse,
+    DivisaoListResponse,
+    ProdutoListResponse,
+    DataListResponse,
+    ArquivoListResponse
+)
 from ..controllers.cascata_controller import CascataController
+from ..services.cascata_cache_service import CascataCacheService
 from ..services.auth_service import verify_token
 from fastapi import HTTPException, status
 
@@ -51,3 +59,108 @@ async def get_pedidos_escola_cascata(
         tipo_formulario: Tipo de formulário (padrão: 'MEMOREX')
     """
     return await CascataController.get_pedidos_escola(db, escola_id, tipo_formulario)
+
+
+@router.get("/escola/{escola_id}/cascata/divisoes", response_model=DivisaoListResponse)
+async def listar_divisoes_cascata(
+    escola_id: int,
+    tipo_formulario: str = Query(default='MEMOREX', description="Tipo de formulário a filtrar"),
+    limite: int = Query(default=100, ge=1, le=1000, description="Quantidade máxima de divisões"),
+    offset: int = Query(default=0, ge=0, description="Divisões a pular (paginação)"),
+    db: Session = Depends(get_db),
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Primeiro nível da cascata: divisões logísticas com totais, sem os produtos
+    Apenas administradores podem acessar
+    """
+    return await CascataController.listar_divisoes(
+        db, escola_id, tipo_formulario=tipo_formulario, limite=limite, offset=offset
+    )
+
+
+@router.get("/escola/{escola_id}/cascata/produtos", response_model=ProdutoListResponse)
+async def listar_produtos_cascata(
+    escola_id: int,
+    divisao_logistica: str = Query(..., description="Divisão (como retornada em /divisoes)"),
+    dias_uteis: str = Query(..., description="Dias úteis (como retornados em /divisoes)"),
+    tipo_formulario: str = Query(default='MEMOREX', description="Tipo de formulário a filtrar"),
+    limite: int = Query(default=100, ge=1, le=1000, description="Quantidade máxima de produtos"),
+    offset: int = Query(default=0, ge=0, description="Produtos a pular (paginação)"),
+    db: Session = Depends(get_db),
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Segundo nível da cascata: produtos de uma divisão, sem as datas
+    Apenas administradores podem acessar
+    """
+    return await CascataController.listar_produtos(
+        db, escola_id, divisao_logistica=divisao_logistica, dias_uteis=dias_uteis,
+        tipo_formulario=tipo_formulario, limite=limite, offset=offset
+    )
+
+
+@router.get("/escola/{escola_id}/cascata/datas", response_model=DataListResponse)
+async def listar_datas_cascata(
+    escola_id: int,
+    divisao_logistica: str = Query(..., description="Divisão (como retornada em /divisoes)"),
+    dias_uteis: str = Query(..., description="Dias úteis (como retornados em /divisoes)"),
+    id_produto: int = Query(..., description="ID do produto"),
+    tipo_formulario: str = Query(default='MEMOREX', description="Tipo de formulário a filtrar"),
+    limite: int = Query(default=100, ge=1, le=1000, description="Quantidade máxima de datas"),
+    offset: int = Query(default=0, ge=0, description="Datas a pular (paginação)"),
+    db: Session = Depends(get_db),
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Terceiro nível da cascata: datas de saída de um produto, sem os arquivos
+    Apenas administradores podem acessar
+    """
+    return await CascataController.listar_datas(
+        db, escola_id, divisao_logistica=divisao_logistica, dias_uteis=dias_uteis, id_produto=id_produto,
+        tipo_formulario=tipo_formulario, limite=limite, offset=offset
+    )
+
+
+@router.get("/escola/{escola_id}/cascata/arquivos", response_model=ArquivoListResponse)
+async def listar_arquivos_cascata(
+    escola_id: int,
+    divisao_logistica: str = Query(..., description="Divisão (como retornada em /divisoes)"),
+    dias_uteis: str = Query(..., description="Dias úteis (como retornados em /divisoes)"),
+    id_produto: int = Query(..., description="ID do produto"),
+    data_saida: str = Query(..., description="Data de saída (como retornada em /datas)"),
+    tipo_formulario: str = Query(default='MEMOREX', description="Tipo de formulário a filtrar"),
+    limite: int = Query(default=100, ge=1, le=1000, description="Quantidade máxima de arquivos"),
+    offset: int = Query(default=0, ge=0, description="Arquivos a pular (paginação)"),
+    db: Session = Depends(get_db),
+    user_data: dict = Depends(verify_admin)
+):
+    """
+    Quarto nível da cascata: arquivos de uma data de saída
+    Apenas administradores podem acessar
+    """
+    return await CascataController.listar_arquivos(
+        db, escola_id, divisao_logistica=divisao_logistica, dias_uteis=dias_uteis, id_produto=id_produto,
+        data_saida=data_saida, tipo_formulario=tipo_formulario, limite=limite, offset=offset
+    )
+
+
+@router.get("/cache/estatisticas")
+async def estatisticas_cache(user_data: dict = Depends(verify_admin)):
+    """
+    Retorna os contadores do cache da cascata (acertos, falhas, gerações aguardadas)
+    Apenas administradores podem acessar
+    """
+    return JSONResponse(CascataCacheService.estatisticas())
+
+
+@router.delete("/cache")
+async def limpar_cache(user_data: dict = Depends(verify_admin)):
+    """
+    Remove todas as entradas do cache da cascata
+    Apenas administradores podem acessar
+    """
+    removidas = CascataCacheService.limpar()
+    return JSONResponse({
+        "mensagem": f"{removidas} entrada(s) removida(s) do cache"
+    })
@@ -3,5 +3,6 @@ from . import auth
 from . import dashboard
 from . import pedido_cascata
 from . import orcamento
+from . import distribuicao
 
-__all__ = ['auth', 'dashboard', 'pedido_cascata', 'orcamento']
+__all__ = ['auth', 'dashboard', 'pedido_cascata', 'orcamento', 'distribuicao']
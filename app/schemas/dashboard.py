@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict
+from datetime import date
 
 
 class EscolaListItem(BaseModel):
@@ -17,3 +18,19 @@ class DashboardResponse(BaseModel):
     """Schema para resposta do dashboard"""
     escolas: list[EscolaListItem]
     total_escolas: int
+
+
+class EscolaDetalhadaItem(EscolaListItem):
+    """Schema para item da lista de escolas com os agregados detalhados"""
+    pedidos_pendentes: int
+    pedidos_concluidos: int
+    distribuicoes_por_status: Dict[str, int]
+    total_copias: int
+    total_paginas: int
+    proxima_data_saida: Optional[date] = None
+
+
+class DashboardDetalhadoResponse(BaseModel):
+    """Schema para resposta do dashboard com agregados detalhados"""
+    escolas: list[EscolaDetalhadaItem]
+    total_escolas: int
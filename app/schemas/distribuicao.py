@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class TransicaoStatusRequest(BaseModel):
+    """Request para mover distribuições de status em lote"""
+    distribuicao_material_ids: List[int] = Field(
+        ...,
+        min_length=1,
+        max_length=50000,
+        description="IDs das distribuições (distribuicao_material_ids do orçamento)"
+    )
+    status_codigo: str = Field(..., min_length=1, max_length=50, description="Código do novo status (status_deskflow_pedido)")
+    status_distribuicao: Optional[str] = Field(None, max_length=50, description="Novo status_distribuicao (opcional)")
+    status_origem: Optional[str] = Field(
+        "pendente",
+        max_length=50,
+        description="Move apenas distribuições com este status_distribuicao (null aceita qualquer)"
+    )
+    mensagem: Optional[str] = Field(None, description="Mensagem gravada no histórico (opcional)")
+
+
+class TransicaoStatusResponse(BaseModel):
+    """Resultado da transição de status em lote"""
+    status_codigo: str
+    total_solicitadas: int
+    total_atualizadas: int
+    total_historicos: int
+    ids_ignorados: List[int] = Field([], description="Distribuições inexistentes ou fora do status de origem")
+    tempo_segundos: float
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Any
-from datetime import date
+from typing import Dict, List, Optional, Any, Literal
+from datetime import date, datetime
 
 
 class OrcamentoRequest(BaseModel):
@@ -10,6 +10,12 @@ class OrcamentoRequest(BaseModel):
     datas_saida: List[date] = Field(..., min_length=1, description="Lista de datas de saída")
     divisoes_logistica: Optional[List[str]] = Field(None, description="Lista de divisões logísticas (opcional)")
     dias_uteis_filtro: Optional[List[int]] = Field(None, description="Lista de dias úteis (opcional)")
+    versao_query: Optional[Literal["v1", "v2"]] = Field(None, description="Versão da query de orçamento (opcional, padrão da configuração)")
+    arquivo_base: Optional[str] = Field(
+        None,
+        description="Arquivo de orçamento salvo a reaproveitar: recalcula apenas as unidades alteradas (opcional)"
+    )
+    persistir: bool = Field(False, description="Grava os orçamentos gerados em orcamento_api (opcional)")
 
 
 class ComponenteInfo(BaseModel):
@@ -64,3 +70,84 @@ class OrcamentoListResponse(BaseModel):
     total_unidades: int
     arquivo: Optional[str] = None
     mensagem: str = "Orçamento gerado com sucesso"
+    unidades_reaproveitadas: Optional[List[int]] = Field(None, description="Unidades copiadas do arquivo base (modo incremental)")
+    unidades_recalculadas: Optional[List[int]] = Field(None, description="Unidades geradas novamente (modo incremental)")
+    unidades_removidas: Optional[List[int]] = Field(None, description="Unidades do arquivo base sem orçamento agora (modo incremental)")
+    persistencia: Optional[Dict[str, Any]] = Field(
+        None,
+        description="Linhas de orcamento_api inseridas, atualizadas e preservadas (já enviadas ao DeskFlow); "
+                    "nao_encontrados lista os ids de distribuições removidas ou sem unidade escolar"
+    )
+
+
+class OrcamentoLoteEscola(BaseModel):
+    """Escola de um lote; filtros informados aqui substituem os compartilhados"""
+    escola_id: int = Field(..., gt=0, description="ID da escola")
+    ids_produtos: Optional[List[int]] = Field(None, description="Produtos desta escola (opcional)")
+    datas_saida: Optional[List[date]] = Field(None, description="Datas de saída desta escola (opcional)")
+    divisoes_logistica: Optional[List[str]] = Field(None, description="Divisões logísticas desta escola (opcional)")
+    dias_uteis_filtro: Optional[List[int]] = Field(None, description="Dias úteis desta escola (opcional)")
+
+
+class OrcamentoLoteRequest(BaseModel):
+    """Request para gerar orçamentos de várias escolas"""
+    escolas: List[OrcamentoLoteEscola] = Field(..., min_length=1, description="Escolas do lote")
+    ids_produtos: Optional[List[int]] = Field(None, description="Produtos compartilhados por todas as escolas")
+    datas_saida: Optional[List[date]] = Field(None, description="Datas de saída compartilhadas")
+    divisoes_logistica: Optional[List[str]] = Field(None, description="Divisões logísticas compartilhadas (opcional)")
+    dias_uteis_filtro: Optional[List[int]] = Field(None, description="Dias úteis compartilhados (opcional)")
+    versao_query: Optional[Literal["v1", "v2"]] = Field(None, description="Versão da query de orçamento (opcional)")
+    persistir: bool = Field(False, description="Grava os orçamentos gerados em orcamento_api (opcional)")
+
+
+class OrcamentoLoteItem(BaseModel):
+    """Resultado de uma escola dentro do lote"""
+    escola_id: int
+    orcamentos: List[OrcamentoResponse] = []
+    total_unidades: int = 0
+    arquivo: Optional[str] = None
+    persistencia: Optional[Dict[str, Any]] = None
+    erro: Optional[str] = None
+
+
+class OrcamentoLoteResponse(BaseModel):
+    """Response com orçamentos agrupados por escola"""
+    resultados: List[OrcamentoLoteItem]
+    total_escolas: int
+    total_unidades: int
+    tempo_segundos: float
+    mensagem: str = "Orçamentos gerados com sucesso"
+
+
+class OrcamentoJobResponse(BaseModel):
+    """Estado de um job assíncrono de geração de orçamento"""
+    job_id: str
+    escola_id: int
+    status: str = Field(..., description="pendente, executando, concluido ou erro")
+    criado_em: datetime
+    iniciado_em: Optional[datetime] = None
+    finalizado_em: Optional[datetime] = None
+    tempo_fila_segundos: float
+    tempo_execucao_segundos: Optional[float] = None
+    arquivo: Optional[str] = None
+    total_unidades: int = 0
+    erro: Optional[str] = None
+
+
+class OrcamentoPersistido(BaseModel):
+    """Linha de orcamento_api (orçamento gravado de uma distribuição)"""
+    id: int
+    distribuicao_material_id: int
+    escola_id: Optional[int] = None
+    unidade_escolar_id: Optional[int] = None
+    data_saida: Optional[date] = None
+    id_orcamento: Optional[int] = None
+    itens: Optional[List[dict]] = None
+    criado_em: datetime
+    atualizado_em: Optional[datetime] = None
+
+
+class OrcamentoPersistidoListResponse(BaseModel):
+    """Orçamentos gravados de uma escola"""
+    registros: List[OrcamentoPersistido]
+    total: int
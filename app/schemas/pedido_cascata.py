@@ -40,3 +40,54 @@ class PedidoCascataRequest(BaseModel):
 class PedidoCascataResponse(BaseModel):
     """Response com dados em cascata da escola"""
     dashboard_completo: list[DivisaoLogisticaInfo]
+
+
+class DivisaoResumo(BaseModel):
+    """Divisão logística com totais (primeiro nível da cascata)"""
+    divisao_logistica: str
+    dias_uteis: str
+    quantidade_total: int
+    total_produtos: int
+
+
+class DivisaoListResponse(BaseModel):
+    """Página de divisões logísticas da escola"""
+    total: int
+    divisoes: list[DivisaoResumo]
+
+
+class ProdutoResumo(BaseModel):
+    """Produto de uma divisão, sem as datas"""
+    id_produto: int
+    produto: str
+    quantidade: int
+    total_datas: int
+
+
+class ProdutoListResponse(BaseModel):
+    """Página de produtos de uma divisão"""
+    total: int
+    produtos: list[ProdutoResumo]
+
+
+class DataResumo(BaseModel):
+    """Data de saída de um produto, sem os arquivos"""
+    data_saida: str
+    quantidade: int
+
+
+class DataListResponse(BaseModel):
+    """Página de datas de saída de um produto"""
+    total: int
+    datas: list[DataResumo]
+
+
+class ArquivoResumo(ArquivoInfo):
+    """Arquivo de uma distribuição (quarto nível da cascata)"""
+    distribuicao_id: int
+
+
+class ArquivoListResponse(BaseModel):
+    """Página de arquivos de uma data de saída"""
+    total: int
+    arquivos: list[ArquivoResumo]
@@ -1,84 +1,540 @@
 import os
+import gzip
 import json
-from datetime import datetime
+import re
+import uuid
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+from functools import partial
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Iterable, IO, Callable, TypeVar
+from ..config.settings import get_settings
 from ..config.logging_config import get_logger
 
 logger = get_logger(__name__)
+settings = get_settings()
+
+T = TypeVar("T")
+
+# Início do arquivo lido para reconstruir o índice (os metadados vêm antes dos orçamentos)
+TAMANHO_CABECALHO = 64 * 1024
+_CHAVE_ORCAMENTOS = re.compile(r'"orcamentos"\s*:')
+
+
+class _IndiceArquivos:
+    """
+    Índice SQLite dos arquivos de orçamento (metadados do cabeçalho)
+    
+    Mantido a cada gravação, download e exclusão de arquivo; a listagem e a
+    retenção consultam apenas o índice, sem abrir os arquivos nem percorrer
+    o diretório. Cada operação usa sua própria conexão, o que permite o uso
+    a partir de várias threads e processos.
+    """
+    NOME = "indice_orcamentos.sqlite3"
+    
+    def __init__(self, diretorio: Path):
+        self.caminho = diretorio / self.NOME
+    
+    def existe(self) -> bool:
+        return self.caminho.exists()
+    
+    def _conectar(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.caminho, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def criar(self) -> None:
+        """Cria o arquivo do índice e a tabela (ou atualiza um índice de versão anterior)"""
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS arquivos (
+                    nome_arquivo TEXT PRIMARY KEY,
+                    gerado_em TEXT,
+                    escola_id INTEGER,
+                    total_unidades INTEGER,
+                    tamanho_bytes INTEGER NOT NULL,
+                    ultimo_acesso TEXT
+                )
+            """)
+            colunas = {linha["name"] for linha in conn.execute("PRAGMA table_info(arquivos)")}
+            if "ultimo_acesso" not in colunas:
+                conn.execute("ALTER TABLE arquivos ADD COLUMN ultimo_acesso TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_arquivos_gerado_em ON arquivos (gerado_em DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_arquivos_escola ON arquivos (escola_id, gerado_em DESC)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_arquivos_uso ON arquivos (COALESCE(ultimo_acesso, gerado_em))")
+        conn.close()
+    
+    def registrar(self, nome_arquivo: str, gerado_em: Optional[str], escola_id: Optional[int],
+                  total_unidades: Optional[int], tamanho_bytes: int) -> None:
+        """Inclui (ou substitui) a entrada de um arquivo"""
+        with self._conectar() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO arquivos (nome_arquivo, gerado_em, escola_id, total_unidades, tamanho_bytes)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (nome_arquivo, gerado_em, escola_id, total_unidades, tamanho_bytes)
+            )
+        conn.close()
+    
+    def registrar_acesso(self, nome_arquivo: str, quando: str) -> None:
+        """Marca o último uso (download ou base incremental) de um arquivo"""
+        with self._conectar() as conn:
+            conn.execute("UPDATE arquivos SET ultimo_acesso = ? WHERE nome_arquivo = ?", (quando, nome_arquivo))
+        conn.close()
+    
+    def remover(self, nomes_arquivos: Iterable[str]) -> None:
+        """Remove as entradas dos arquivos informados"""
+        with self._conectar() as conn:
+            conn.executemany("DELETE FROM arquivos WHERE nome_arquivo = ?", [(nome,) for nome in nomes_arquivos])
+        conn.close()
+    
+    def reconstruir(self, entradas: Iterable[Dict[str, Any]]) -> int:
+        """
+        Substitui todo o conteúdo do índice (preservando o último acesso)
+        
+        Args:
+            entradas: Metadados de cada arquivo (colunas da tabela)
+            
+        Returns:
+            Quantidade de arquivos indexados
+        """
+        linhas = [
+            (e["nome_arquivo"], e["gerado_em"], e["escola_id"], e["total_unidades"], e["tamanho_bytes"])
+            for e in entradas
+        ]
+        with self._conectar() as conn:
+            conn.execute("CREATE TEMP TABLE encontrados (nome_arquivo TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO encontrados VALUES (?)", [(linha[0],) for linha in linhas])
+            conn.execute("DELETE FROM arquivos WHERE nome_arquivo NOT IN (SELECT nome_arquivo FROM encontrados)")
+            conn.executemany(
+                """
+                INSERT INTO arquivos (nome_arquivo, gerado_em, escola_id, total_unidades, tamanho_bytes)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (nome_arquivo) DO UPDATE
+                SET gerado_em = excluded.gerado_em,
+                    escola_id = excluded.escola_id,
+                    total_unidades = excluded.total_unidades,
+                    tamanho_bytes = excluded.tamanho_bytes
+                """,
+                linhas
+            )
+        conn.close()
+        return len(linhas)
+    
+    def listar(self, escola_id: Optional[int], limite: Optional[int], offset: int) -> List[Dict[str, Any]]:
+        """Entradas mais recentes primeiro, opcionalmente de uma escola"""
+        with self._conectar() as conn:
+            linhas = conn.execute(
+                """
+                SELECT nome_arquivo, gerado_em, escola_id, total_unidades, tamanho_bytes
+                FROM arquivos
+                WHERE ? IS NULL OR escola_id = ?
+                ORDER BY gerado_em DESC, nome_arquivo DESC
+                LIMIT ? OFFSET ?
+                """,
+                (escola_id, escola_id, -1 if limite is None else limite, offset)
+            ).fetchall()
+        conn.close()
+        return [dict(linha) for linha in linhas]
+    
+    def contar(self, escola_id: Optional[int]) -> int:
+        """Quantidade de entradas, opcionalmente de uma escola"""
+        with self._conectar() as conn:
+            total = conn.execute(
+                "SELECT COUNT(*) FROM arquivos WHERE ? IS NULL OR escola_id = ?",
+                (escola_id, escola_id)
+            ).fetchone()[0]
+        conn.close()
+        return total
+    
+    def totais(self) -> Dict[str, int]:
+        """Quantidade de arquivos e soma dos tamanhos"""
+        with self._conectar() as conn:
+            linha = conn.execute("SELECT COUNT(*), COALESCE(SUM(tamanho_bytes), 0) FROM arquivos").fetchone()
+        conn.close()
+        return {"total_arquivos": linha[0], "total_bytes": linha[1]}
+    
+    def gerados_antes(self, limite: str) -> List[Dict[str, Any]]:
+        """Arquivos gerados antes do instante informado (ISO), mais antigos primeiro"""
+        with self._conectar() as conn:
+            linhas = conn.execute(
+                """
+                SELECT nome_arquivo, tamanho_bytes
+                FROM arquivos
+                WHERE gerado_em < ?
+                ORDER BY gerado_em
+                """,
+                (limite,)
+            ).fetchall()
+        conn.close()
+        return [dict(linha) for linha in linhas]
+    
+    def sem_uso_desde(self, limite: str) -> List[Dict[str, Any]]:
+        """
+        Arquivos cujo último uso (download ou geração) é anterior ao instante
+        informado (ISO), usados há mais tempo primeiro
+        """
+        with self._conectar() as conn:
+            linhas = conn.execute(
+                """
+                SELECT nome_arquivo, tamanho_bytes
+                FROM arquivos
+                WHERE COALESCE(ultimo_acesso, gerado_em) < ?
+                ORDER BY COALESCE(ultimo_acesso, gerado_em), nome_arquivo
+                """,
+                (limite,)
+            ).fetchall()
+        conn.close()
+        return [dict(linha) for linha in linhas]
+    
+    def menos_usados(self, bytes_liberar: int, preservar: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Arquivos usados há mais tempo (último download ou geração) cuja
+        remoção libera pelo menos `bytes_liberar`, exceto `preservar`
+        """
+        selecionados = []
+        with self._conectar() as conn:
+            cursor = conn.execute(
+                """
+                SELECT nome_arquivo, tamanho_bytes
+                FROM arquivos
+                WHERE nome_arquivo IS NOT ?
+                ORDER BY COALESCE(ultimo_acesso, gerado_em), nome_arquivo
+                """,
+                (preservar,)
+            )
+            for linha in cursor:
+                if bytes_liberar <= 0:
+                    break
+                selecionados.append(dict(linha))
+                bytes_liberar -= linha["tamanho_bytes"]
+        conn.close()
+        return selecionados
 
 
 class ArquivoOrcamentoService:
-    """Service para gerenciar arquivos de orçamento"""
+    """
+    Service para gerenciar arquivos de orçamento
+    
+    Os arquivos são gravados como JSON compacto comprimido com gzip. O nome
+    do arquivo na API continua sendo orcamento_*.json; no disco ele tem o
+    sufixo .gz. Arquivos antigos, sem compressão, continuam legíveis.
+    
+    Os métodos síncronos fazem I/O bloqueante e são usados por threads
+    (lote, jobs). Rotas async usam as variantes *_async, executadas em um
+    pool próprio de ARQUIVOS_ORCAMENTO_MAX_THREADS threads, para não travar
+    o event loop durante gravações e listagens grandes.
+    """
     
     # Diretório para armazenar arquivos temporários
     TEMP_DIR = Path(__file__).parent.parent.parent / "temp_orcamentos"
     
+    SUFIXO_GZIP = ".gz"
+    NIVEL_COMPRESSAO = 6
+    
+    _indices: Dict[Path, _IndiceArquivos] = {}
+    _lock_indice = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+    _lock_executor = threading.Lock()
+    
+    # Retenção: uma execução por vez; contadores desde o início do processo
+    _lock_retencao = threading.Lock()
+    _remocoes = {"removidos_idade": 0, "removidos_quota": 0, "bytes_removidos": 0}
+    _ultima_retencao: Optional[str] = None
+    
+    @classmethod
+    def _obter_executor(cls) -> ThreadPoolExecutor:
+        """Cria o pool de threads de I/O no primeiro uso"""
+        with cls._lock_executor:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max(1, settings.ARQUIVOS_ORCAMENTO_MAX_THREADS),
+                    thread_name_prefix="arquivo-orcamento"
+                )
+            return cls._executor
+    
+    @classmethod
+    async def _em_thread(cls, funcao: Callable[..., T], *args, **kwargs) -> T:
+        """Executa uma operação bloqueante no pool de I/O, sem travar o event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls._obter_executor(), partial(funcao, *args, **kwargs))
+    
     @classmethod
     def criar_diretorio(cls):
         """Cria o diretório de arquivos temporários se não existir"""
         cls.TEMP_DIR.mkdir(parents=True, exist_ok=True)
         logger.info(f"Diretório de orçamentos verificado: {cls.TEMP_DIR}")
     
+    @classmethod
+    def _obter_indice(cls) -> _IndiceArquivos:
+        """
+        Retorna o índice do diretório, criando-o a partir dos arquivos se não existir
+        
+        No primeiro uso pelo processo a tabela é (re)criada, o que atualiza
+        índices gravados por versões anteriores.
+        
+        Returns:
+            Índice dos arquivos de orçamento
+        """
+        with cls._lock_indice:
+            indice = cls._indices.get(cls.TEMP_DIR)
+            if indice is None or not indice.existe():
+                indice = cls._indices[cls.TEMP_DIR] = _IndiceArquivos(cls.TEMP_DIR)
+                novo = not indice.existe()
+                cls.criar_diretorio()
+                indice.criar()
+                if novo:
+                    total = indice.reconstruir(cls._ler_metadados())
+                    logger.info(f"Índice de arquivos de orçamento criado com {total} arquivo(s)")
+            return indice
+    
+    @classmethod
+    def _ler_metadados(cls) -> Iterable[Dict[str, Any]]:
+        """
+        Lê o cabeçalho de todos os arquivos (usado apenas para reconstruir o índice)
+        
+        Yields:
+            Metadados de cada arquivo legível
+        """
+        for arquivo in cls._arquivos_no_disco():
+            nome_arquivo = cls._nome_do_arquivo(arquivo)
+            try:
+                dados = cls._ler_cabecalho(arquivo)
+                yield {
+                    "nome_arquivo": nome_arquivo,
+                    "gerado_em": dados.get("gerado_em"),
+                    "escola_id": dados.get("escola_id"),
+                    "total_unidades": dados.get("total_unidades"),
+                    "tamanho_bytes": arquivo.stat().st_size
+                }
+            except Exception as e:
+                logger.warning(f"Erro ao ler arquivo {arquivo.name}: {str(e)}")
+    
+    @classmethod
+    def _ler_cabecalho(cls, caminho: Path) -> Dict[str, Any]:
+        """
+        Lê os campos gravados antes de "orcamentos", sem decodificar os orçamentos
+        
+        Decodificar um arquivo grande inteiro prende o GIL (e, com ele, o event
+        loop) mesmo fora da thread principal. Se o início do arquivo não tiver
+        o formato esperado, o arquivo é lido por completo.
+        """
+        with cls._abrir_leitura(caminho) as f:
+            inicio = f.read(TAMANHO_CABECALHO)
+            encontrado = _CHAVE_ORCAMENTOS.search(inicio)
+            if encontrado:
+                try:
+                    return json.loads(inicio[:encontrado.start()] + '"orcamentos":[]}')
+                except ValueError:
+                    pass
+            return json.loads(inicio + f.read())
+    
+    @classmethod
+    def reindexar(cls) -> int:
+        """
+        Reconstrói o índice lendo todos os arquivos do diretório
+        
+        Útil se arquivos forem copiados ou removidos fora da aplicação.
+        
+        Returns:
+            Quantidade de arquivos indexados
+        """
+        indice = cls._obter_indice()
+        with cls._lock_indice:
+            total = indice.reconstruir(cls._ler_metadados())
+        logger.info(f"Índice de arquivos de orçamento reconstruído: {total} arquivo(s)")
+        return total
+    
     @classmethod
     def salvar_orcamento(
         cls, 
-        orcamentos: List[Dict[str, Any]], 
+        orcamentos: List[Any], 
         escola_id: int,
-        ids_produtos: List[int]
+        ids_produtos: List[int],
+        datas_saida: Optional[List[date]] = None,
+        divisoes_logistica: Optional[List[str]] = None,
+        dias_uteis_filtro: Optional[List[int]] = None,
+        marca_dados: Optional[datetime] = None,
+        json_bruto: bool = False
     ) -> str:
         """
-        Salva os orçamentos em um arquivo JSON temporário
+        Salva os orçamentos em um arquivo JSON temporário (comprimido)
+        
+        Os filtros ficam registrados no arquivo para que ele possa servir de
+        base para uma geração incremental.
         
         Args:
             orcamentos: Lista de orçamentos gerados
             escola_id: ID da escola
             ids_produtos: Lista de IDs de produtos
+            datas_saida: Lista de datas de saída (opcional)
+            divisoes_logistica: Lista de divisões logísticas (opcional)
+            dias_uteis_filtro: Lista de dias úteis (opcional)
+            marca_dados: Horário do banco no início da leitura dos dados (opcional)
+            json_bruto: Os orçamentos já são texto JSON e são gravados como estão
             
         Returns:
-            Caminho relativo do arquivo salvo
+            Nome do arquivo salvo (orcamento_*.json)
         """
         cls.criar_diretorio()
         
         # Gerar nome único do arquivo
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
         produtos_str = "_".join(map(str, ids_produtos[:3]))  # Primeiros 3 produtos
         nome_arquivo = f"orcamento_escola_{escola_id}_prods_{produtos_str}_{timestamp}.json"
-        caminho_completo = cls.TEMP_DIR / nome_arquivo
+        caminho_completo = cls.TEMP_DIR / (nome_arquivo + cls.SUFIXO_GZIP)
         
         # Preparar dados para salvar
         dados = {
             "gerado_em": datetime.now().isoformat(),
+            "marca_dados": marca_dados.isoformat() if marca_dados else None,
             "escola_id": escola_id,
             "ids_produtos": ids_produtos,
+            "filtros": {
+                "datas_saida": [d.isoformat() for d in datas_saida] if datas_saida is not None else None,
+                "divisoes_logistica": divisoes_logistica,
+                "dias_uteis_filtro": dias_uteis_filtro
+            },
             "total_unidades": len(orcamentos),
-            "orcamentos": orcamentos
+            "orcamentos": [] if json_bruto else orcamentos
         }
         
-        # Salvar arquivo
+        # Salvar arquivo (JSON compacto, comprimido à medida que é escrito).
+        # A gravação vai para um arquivo temporário no mesmo diretório, renomeado
+        # ao final: leitores nunca veem um arquivo pela metade.
+        caminho_temporario = cls.TEMP_DIR / f".{nome_arquivo}.{uuid.uuid4().hex}.tmp"
         try:
-            with open(caminho_completo, 'w', encoding='utf-8') as f:
-                json.dump(dados, f, indent=2, ensure_ascii=False)
+            with gzip.open(caminho_temporario, 'wt', encoding='utf-8', compresslevel=cls.NIVEL_COMPRESSAO) as f:
+                if json_bruto:
+                    # Os orçamentos entram como vieram do banco, um a um
+                    cabecalho = json.dumps(dados, ensure_ascii=False, separators=(',', ':'))
+                    f.write(cabecalho[:cabecalho.rindex('[]')] + '[')
+                    for indice, orcamento in enumerate(orcamentos):
+                        if indice:
+                            f.write(',')
+                        f.write(orcamento)
+                    f.write(']}')
+                else:
+                    json.dump(dados, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(caminho_temporario, caminho_completo)
             
             logger.info(f"Orçamento salvo em: {caminho_completo}")
-            return nome_arquivo
-            
         except Exception as e:
             logger.error(f"Erro ao salvar orçamento em arquivo: {str(e)}", exc_info=True)
+            caminho_temporario.unlink(missing_ok=True)
             raise
+        
+        try:
+            cls._obter_indice().registrar(
+                nome_arquivo,
+                dados["gerado_em"],
+                escola_id,
+                len(orcamentos),
+                caminho_completo.stat().st_size
+            )
+        except Exception as e:
+            # O arquivo foi salvo; reindexar() o inclui na listagem
+            logger.warning(f"Erro ao registrar {nome_arquivo} no índice: {str(e)}")
+        
+        # A cota é verificada a cada gravação, sem esperar a próxima varredura
+        if settings.ARQUIVOS_ORCAMENTO_QUOTA_MB > 0:
+            try:
+                if cls._obter_indice().totais()["total_bytes"] > cls._quota_bytes():
+                    cls.aplicar_retencao(dias=0, preservar=nome_arquivo)
+            except Exception as e:
+                logger.warning(f"Erro ao aplicar a cota de arquivos de orçamento: {str(e)}")
+        return nome_arquivo
+    
+    @classmethod
+    async def salvar_orcamento_async(cls, orcamentos: List[Any], escola_id: int, ids_produtos: List[int], **kwargs) -> str:
+        """Versão de salvar_orcamento para rotas async (mesmos argumentos)"""
+        return await cls._em_thread(cls.salvar_orcamento, orcamentos, escola_id, ids_produtos, **kwargs)
+    
+    @classmethod
+    def _remover_do_indice(cls, nomes_arquivos: List[str]) -> None:
+        """Remove arquivos excluídos do índice (falhas apenas registradas em log)"""
+        try:
+            cls._obter_indice().remover(nomes_arquivos)
+        except Exception as e:
+            logger.warning(f"Erro ao remover {len(nomes_arquivos)} arquivo(s) do índice: {str(e)}")
+    
+    @classmethod
+    def _arquivos_no_disco(cls) -> Iterable[Path]:
+        """Arquivos de orçamento do diretório (comprimidos e legados)"""
+        yield from cls.TEMP_DIR.glob("orcamento_*.json" + cls.SUFIXO_GZIP)
+        yield from cls.TEMP_DIR.glob("orcamento_*.json")
+    
+    @classmethod
+    def _nome_do_arquivo(cls, caminho: Path) -> str:
+        """Nome do arquivo na API (sem o sufixo .gz)"""
+        return caminho.name[:-len(cls.SUFIXO_GZIP)] if caminho.name.endswith(cls.SUFIXO_GZIP) else caminho.name
+    
+    @classmethod
+    def _abrir_leitura(cls, caminho: Path) -> IO[str]:
+        """Abre um arquivo para leitura como texto, descomprimindo se necessário"""
+        if caminho.name.endswith(cls.SUFIXO_GZIP):
+            return gzip.open(caminho, 'rt', encoding='utf-8')
+        return open(caminho, 'r', encoding='utf-8')
     
     @classmethod
     def obter_caminho_completo(cls, nome_arquivo: str) -> Path:
         """
-        Obtém o caminho completo de um arquivo de orçamento
+        Obtém o caminho no disco de um arquivo de orçamento
         
         Args:
-            nome_arquivo: Nome do arquivo
+            nome_arquivo: Nome do arquivo (orcamento_*.json)
             
         Returns:
-            Caminho completo do arquivo
+            Caminho do arquivo comprimido ou, se só existir ele, do arquivo
+            legado sem compressão
         """
-        return cls.TEMP_DIR / nome_arquivo
+        caminho_gzip = cls.TEMP_DIR / (nome_arquivo + cls.SUFIXO_GZIP)
+        caminho_legado = cls.TEMP_DIR / nome_arquivo
+        if not caminho_gzip.exists() and caminho_legado.exists():
+            return caminho_legado
+        return caminho_gzip
+    
+    @classmethod
+    def arquivo_comprimido(cls, caminho: Path) -> bool:
+        """Indica se o caminho (de obter_caminho_completo) é um arquivo gzip"""
+        return caminho.name.endswith(cls.SUFIXO_GZIP)
+    
+    @classmethod
+    def obter_informacoes_arquivo(cls, nome_arquivo: str) -> Optional[Dict[str, Any]]:
+        """
+        Caminho e estado no disco de um arquivo de orçamento (para download)
+        
+        Args:
+            nome_arquivo: Nome do arquivo (orcamento_*.json)
+            
+        Returns:
+            Dicionário com caminho, comprimido, estado (os.stat) e
+            tamanho_original (JSON descomprimido), ou None se não existir
+        """
+        caminho = cls.obter_caminho_completo(nome_arquivo)
+        try:
+            estado = caminho.stat()
+            tamanho_original = estado.st_size
+            comprimido = cls.arquivo_comprimido(caminho)
+            if comprimido:
+                # Trailer do gzip (ISIZE): tamanho descomprimido, módulo 2^32
+                with open(caminho, 'rb') as f:
+                    f.seek(-4, os.SEEK_END)
+                    tamanho_original = int.from_bytes(f.read(4), "little")
+        except FileNotFoundError:
+            return None
+        return {
+            "caminho": caminho,
+            "comprimido": comprimido,
+            "estado": estado,
+            "tamanho_original": tamanho_original,
+        }
     
     @classmethod
     def arquivo_existe(cls, nome_arquivo: str) -> bool:
@@ -111,47 +567,78 @@ class ArquivoOrcamentoService:
             raise FileNotFoundError(f"Arquivo não encontrado: {nome_arquivo}")
         
         try:
-            with open(caminho, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with cls._abrir_leitura(caminho) as f:
+                dados = json.load(f)
         except Exception as e:
             logger.error(f"Erro ao ler orçamento: {str(e)}", exc_info=True)
             raise
+        cls.registrar_acesso(nome_arquivo)
+        return dados
+    
+    @classmethod
+    def registrar_acesso(cls, nome_arquivo: str) -> None:
+        """
+        Registra o uso de um arquivo (download ou base incremental)
+        
+        A retenção por cota remove primeiro os arquivos usados há mais tempo.
+        """
+        try:
+            cls._obter_indice().registrar_acesso(nome_arquivo, datetime.now().isoformat())
+        except Exception as e:
+            logger.warning(f"Erro ao registrar acesso a {nome_arquivo}: {str(e)}")
     
     @classmethod
-    def listar_orcamentos(cls) -> List[Dict[str, Any]]:
+    def listar_orcamentos(
+        cls,
+        escola_id: Optional[int] = None,
+        limite: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
         """
-        Lista todos os arquivos de orçamento disponíveis
+        Lista os arquivos de orçamento disponíveis (mais recentes primeiro)
+        
+        Consulta apenas o índice; os arquivos não são abertos.
+        
+        Args:
+            escola_id: Apenas arquivos desta escola (opcional)
+            limite: Quantidade máxima de arquivos (opcional)
+            offset: Arquivos a pular (paginação)
         
         Returns:
             Lista com informações dos arquivos
         """
-        cls.criar_diretorio()
-        orcamentos = []
-        
         try:
-            for arquivo in cls.TEMP_DIR.glob("orcamento_*.json"):
-                try:
-                    with open(arquivo, 'r', encoding='utf-8') as f:
-                        dados = json.load(f)
-                    
-                    orcamentos.append({
-                        "nome_arquivo": arquivo.name,
-                        "gerado_em": dados.get("gerado_em"),
-                        "escola_id": dados.get("escola_id"),
-                        "total_unidades": dados.get("total_unidades"),
-                        "tamanho_kb": arquivo.stat().st_size / 1024
-                    })
-                except Exception as e:
-                    logger.warning(f"Erro ao ler arquivo {arquivo.name}: {str(e)}")
-            
-            # Ordenar por data decrescente
-            orcamentos.sort(key=lambda x: x["gerado_em"], reverse=True)
-            return orcamentos
-            
+            return [
+                {
+                    "nome_arquivo": entrada["nome_arquivo"],
+                    "gerado_em": entrada["gerado_em"],
+                    "escola_id": entrada["escola_id"],
+                    "total_unidades": entrada["total_unidades"],
+                    "tamanho_kb": entrada["tamanho_bytes"] / 1024
+                }
+                for entrada in cls._obter_indice().listar(escola_id, limite, offset)
+            ]
         except Exception as e:
             logger.error(f"Erro ao listar orçamentos: {str(e)}", exc_info=True)
             return []
     
+    @classmethod
+    def contar_orcamentos(cls, escola_id: Optional[int] = None) -> int:
+        """
+        Conta os arquivos de orçamento disponíveis
+        
+        Args:
+            escola_id: Apenas arquivos desta escola (opcional)
+        
+        Returns:
+            Quantidade de arquivos
+        """
+        try:
+            return cls._obter_indice().contar(escola_id)
+        except Exception as e:
+            logger.error(f"Erro ao contar orçamentos: {str(e)}", exc_info=True)
+            return 0
+    
     @classmethod
     def deletar_arquivo(cls, nome_arquivo: str) -> bool:
         """
@@ -170,6 +657,7 @@ class ArquivoOrcamentoService:
         
         try:
             caminho.unlink()
+            cls._remover_do_indice([nome_arquivo])
             logger.info(f"Arquivo deletado: {nome_arquivo}")
             return True
         except Exception as e:
@@ -177,36 +665,213 @@ class ArquivoOrcamentoService:
             return False
     
     @classmethod
-    def limpar_arquivos_antigos(cls, dias: int = 1) -> int:
+    def _remover_arquivos(cls, entradas: List[Dict[str, Any]]) -> int:
         """
-        Deleta arquivos de orçamento mais antigos que X dias
+        Remove arquivos do disco e do índice
         
         Args:
-            dias: Número de dias (default: 1)
+            entradas: nome_arquivo e tamanho_bytes de cada arquivo (do índice)
             
         Returns:
-            Número de arquivos deletados
+            Bytes liberados
         """
-        from datetime import timedelta
-        import time
+        removidos = []
+        liberados = 0
+        for entrada in entradas:
+            try:
+                # Arquivos já apagados fora da aplicação só saem do índice
+                cls.obter_caminho_completo(entrada["nome_arquivo"]).unlink(missing_ok=True)
+                removidos.append(entrada["nome_arquivo"])
+                liberados += entrada["tamanho_bytes"]
+            except Exception as e:
+                logger.warning(f"Erro ao deletar arquivo {entrada['nome_arquivo']}: {str(e)}")
+        if removidos:
+            cls._remover_do_indice(removidos)
+        return liberados
+    
+    @classmethod
+    def _quota_bytes(cls) -> int:
+        return settings.ARQUIVOS_ORCAMENTO_QUOTA_MB * 1024 * 1024
+    
+    @classmethod
+    def aplicar_retencao(cls, dias: Optional[float] = None, preservar: Optional[str] = None) -> Dict[str, int]:
+        """
+        Remove arquivos sem uso há mais tempo que a retenção e, se o total
+        ainda passar da cota, os usados há mais tempo
         
-        cls.criar_diretorio()
-        deletados = 0
-        limite_tempo = time.time() - (dias * 24 * 60 * 60)
+        Usa apenas o índice (tamanhos e datas já registrados); o diretório
+        não é percorrido. Se outra execução estiver em andamento, retorna
+        sem fazer nada. A idade conta a partir do último uso (download ou
+        leitura como arquivo base), não da geração.
         
+        Args:
+            dias: Dias máximos sem uso (default: ARQUIVOS_ORCAMENTO_RETENCAO_DIAS; 0 desativa)
+            preservar: Arquivo que não é removido pela cota (o que acabou de ser gravado)
+            
+        Returns:
+            Dicionário com removidos_idade, removidos_quota e bytes_removidos
+        """
+        if dias is None:
+            dias = settings.ARQUIVOS_ORCAMENTO_RETENCAO_DIAS
+        resultado = {"removidos_idade": 0, "removidos_quota": 0, "bytes_removidos": 0}
+        if not cls._lock_retencao.acquire(blocking=False):
+            return resultado
         try:
-            for arquivo in cls.TEMP_DIR.glob("orcamento_*.json"):
-                if arquivo.stat().st_mtime < limite_tempo:
-                    try:
-                        arquivo.unlink()
-                        deletados += 1
-                        logger.info(f"Arquivo antigo deletado: {arquivo.name}")
-                    except Exception as e:
-                        logger.warning(f"Erro ao deletar arquivo antigo {arquivo.name}: {str(e)}")
+            indice = cls._obter_indice()
+            
+            if dias > 0:
+                limite = (datetime.now() - timedelta(days=dias)).isoformat()
+                expirados = indice.sem_uso_desde(limite)
+                resultado["bytes_removidos"] += cls._remover_arquivos(expirados)
+                resultado["removidos_idade"] = len(expirados)
+            
+            quota = cls._quota_bytes()
+            if quota > 0:
+                excedente = indice.totais()["total_bytes"] - quota
+                if excedente > 0:
+                    menos_usados = indice.menos_usados(excedente, preservar)
+                    resultado["bytes_removidos"] += cls._remover_arquivos(menos_usados)
+                    resultado["removidos_quota"] = len(menos_usados)
+            
+            for chave, valor in resultado.items():
+                cls._remocoes[chave] += valor
+            cls._ultima_retencao = datetime.now().isoformat()
+            if resultado["removidos_idade"] or resultado["removidos_quota"]:
+                logger.info(f"Retenção de arquivos de orçamento: {resultado}")
+            return resultado
+        finally:
+            cls._lock_retencao.release()
+    
+    @classmethod
+    def obter_retencao(cls) -> Dict[str, Any]:
+        """
+        Situação atual da retenção: ocupação (pelo índice), limites e
+        remoções feitas por este processo
+        """
+        return {
+            **cls._obter_indice().totais(),
+            "quota_bytes": cls._quota_bytes() or None,
+            "retencao_dias": settings.ARQUIVOS_ORCAMENTO_RETENCAO_DIAS or None,
+            **cls._remocoes,
+            "ultima_execucao": cls._ultima_retencao,
+        }
+    
+    @classmethod
+    def limpar_temporarios(cls, idade_segundos: int = 3600) -> int:
+        """
+        Remove temporários de gravações interrompidas (queda do processo)
+        
+        Returns:
+            Número de temporários removidos
+        """
+        limite_tempo = time.time() - idade_segundos
+        removidos = 0
+        for temporario in cls.TEMP_DIR.glob(".orcamento_*.tmp"):
+            try:
+                if temporario.stat().st_mtime < limite_tempo:
+                    temporario.unlink()
+                    removidos += 1
+                    logger.info(f"Arquivo temporário abandonado removido: {temporario.name}")
+            except FileNotFoundError:
+                pass
+        return removidos
+    
+    @classmethod
+    def limpar_arquivos_antigos(cls, dias: int = 1) -> int:
+        """
+        Deleta arquivos de orçamento gerados há mais de X dias
+        
+        Args:
+            dias: Número de dias (default: 1)
             
-            logger.info(f"Total de arquivos antigos deletados: {deletados}")
-            return deletados
+        Returns:
+            Número de arquivos deletados
+        """
+        try:
+            cls.limpar_temporarios()
+            limite = (datetime.now() - timedelta(days=dias)).isoformat()
+            expirados = cls._obter_indice().gerados_antes(limite)
+            liberados = cls._remover_arquivos(expirados)
+            with cls._lock_retencao:
+                cls._remocoes["removidos_idade"] += len(expirados)
+                cls._remocoes["bytes_removidos"] += liberados
+            logger.info(f"Total de arquivos antigos deletados: {len(expirados)}")
+            return len(expirados)
             
         except Exception as e:
             logger.error(f"Erro ao limpar arquivos antigos: {str(e)}", exc_info=True)
             return 0
+    
+    @classmethod
+    async def executar_retencao_periodica(cls) -> None:
+        """
+        Aplica a retenção a cada ARQUIVOS_ORCAMENTO_RETENCAO_INTERVALO_SEGUNDOS
+        (tarefa de fundo iniciada no lifespan da aplicação)
+        """
+        intervalo = settings.ARQUIVOS_ORCAMENTO_RETENCAO_INTERVALO_SEGUNDOS
+        logger.info(f"Retenção de arquivos de orçamento a cada {intervalo}s")
+        try:
+            await cls._em_thread(cls.limpar_temporarios)
+        except Exception as e:
+            logger.warning(f"Erro ao remover temporários de orçamento: {str(e)}")
+        while True:
+            try:
+                await cls._em_thread(cls.aplicar_retencao)
+            except Exception as e:
+                logger.error(f"Erro na retenção de arquivos de orçamento: {str(e)}", exc_info=True)
+            await asyncio.sleep(intervalo)
+    
+    @classmethod
+    async def listar_orcamentos_async(
+        cls,
+        escola_id: Optional[int] = None,
+        limite: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """Versão de listar_orcamentos para rotas async"""
+        return await cls._em_thread(cls.listar_orcamentos, escola_id, limite, offset)
+    
+    @classmethod
+    async def contar_orcamentos_async(cls, escola_id: Optional[int] = None) -> int:
+        """Versão de contar_orcamentos para rotas async"""
+        return await cls._em_thread(cls.contar_orcamentos, escola_id)
+    
+    @classmethod
+    async def reindexar_async(cls) -> int:
+        """Versão de reindexar para rotas async"""
+        return await cls._em_thread(cls.reindexar)
+    
+    @classmethod
+    async def obter_caminho_completo_async(cls, nome_arquivo: str) -> Path:
+        """Versão de obter_caminho_completo para rotas async"""
+        return await cls._em_thread(cls.obter_caminho_completo, nome_arquivo)
+    
+    @classmethod
+    async def arquivo_existe_async(cls, nome_arquivo: str) -> bool:
+        """Versão de arquivo_existe para rotas async"""
+        return await cls._em_thread(cls.arquivo_existe, nome_arquivo)
+    
+    @classmethod
+    async def obter_informacoes_arquivo_async(cls, nome_arquivo: str) -> Optional[Dict[str, Any]]:
+        """Versão de obter_informacoes_arquivo para rotas async"""
+        return await cls._em_thread(cls.obter_informacoes_arquivo, nome_arquivo)
+    
+    @classmethod
+    async def deletar_arquivo_async(cls, nome_arquivo: str) -> bool:
+        """Versão de deletar_arquivo para rotas async"""
+        return await cls._em_thread(cls.deletar_arquivo, nome_arquivo)
+    
+    @classmethod
+    async def limpar_arquivos_antigos_async(cls, dias: int = 1) -> int:
+        """Versão de limpar_arquivos_antigos para rotas async"""
+        return await cls._em_thread(cls.limpar_arquivos_antigos, dias)
+    
+    @classmethod
+    async def registrar_acesso_async(cls, nome_arquivo: str) -> None:
+        """Versão de registrar_acesso para rotas async"""
+        await cls._em_thread(cls.registrar_acesso, nome_arquivo)
+    
+    @classmethod
+    async def obter_retencao_async(cls) -> Dict[str, Any]:
+        """Versão de obter_retencao para rotas async"""
+        return await cls._em_thread(cls.obter_retencao)
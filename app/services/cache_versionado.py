@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+from ..config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class _EntradaCache:
+    """Resultado armazenado no cache com a versão dos dados usada para gerá-lo"""
+    __slots__ = ("versao", "criado_em", "dados")
+
+    def __init__(self, versao: Tuple, dados: Any):
+        self.versao = versao
+        self.criado_em = time.monotonic()
+        self.dados = dados
+
+
+class _GeracaoEmAndamento:
+    """Geração em curso, aguardada pelas requisições que chegam durante ela"""
+    __slots__ = ("concluida", "dados", "erro")
+
+    def __init__(self):
+        self.concluida = threading.Event()
+        self.dados: Any = None
+        self.erro: Optional[BaseException] = None
+
+
+class CacheVersionado:
+    """
+    Cache LRU em memória com TTL, versão dos dados e geração única por chave
+
+    Usado pelos caches de cascata e de orçamentos. Cada entrada guarda a
+    versão dos dados (VersaoEscolaService) lida antes da geração; uma
+    entrada de outra versão ou mais antiga que o TTL é descartada na
+    leitura. Requisições simultâneas para a mesma chave e versão sem
+    entrada no cache aguardam uma única geração. O primeiro elemento da
+    chave é sempre o escola_id (ver invalidar_escola).
+    """
+
+    def __init__(self, nome: str, max_entradas: int, ttl_segundos: int):
+        self.nome = nome
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self._entradas: "OrderedDict[Tuple, _EntradaCache]" = OrderedDict()
+        self._em_andamento: Dict[Tuple, _GeracaoEmAndamento] = {}
+        self._lock = threading.Lock()
+        self._acertos = 0
+        self._falhas = 0
+        self._aguardadas = 0
+        self._invalidacoes = 0
+        self._expulsoes = 0
+
+    @property
+    def ativo(self) -> bool:
+        """False quando max_entradas <= 0 (cache desativado)"""
+        return self.max_entradas > 0
+
+    def obter_ou_gerar(self, chave: Tuple, versao: Tuple, gerar: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Retorna o valor do cache ou o gera e armazena
+
+        Se os dados mudarem durante a geração, a entrada fica com a versão
+        antiga e é descartada na próxima leitura. Se outra requisição já
+        estiver gerando a mesma chave com a mesma versão, aguarda o
+        resultado (ou o erro) dela.
+
+        Args:
+            chave: Chave da entrada (escola_id primeiro)
+            versao: Versão dos dados, lida antes de gerar
+            gerar: Função que produz o valor (chamada apenas em caso de falha)
+
+        Returns:
+            Tupla (valor, veio_do_cache); o resultado de uma geração
+            aguardada conta como vindo do cache
+        """
+        if not self.ativo:
+            return gerar(), False
+
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                expirada = time.monotonic() - entrada.criado_em > self.ttl_segundos
+                if entrada.versao == versao and not expirada:
+                    self._entradas.move_to_end(chave)
+                    self._acertos += 1
+                    return entrada.dados, True
+
+                del self._entradas[chave]
+                self._invalidacoes += 1
+
+            geracao = self._em_andamento.get(chave + (versao,))
+            responsavel = geracao is None
+            if responsavel:
+                geracao = self._em_andamento[chave + (versao,)] = _GeracaoEmAndamento()
+                self._falhas += 1
+            else:
+                self._aguardadas += 1
+
+        if not responsavel:
+            logger.info(f"Aguardando {self.nome} em geração para escola_id={chave[0]}")
+            geracao.concluida.wait()
+            if geracao.erro is not None:
+                raise geracao.erro
+            return geracao.dados, True
+
+        try:
+            geracao.dados = gerar()
+        except BaseException as e:
+            geracao.erro = e
+            raise
+        finally:
+            with self._lock:
+                del self._em_andamento[chave + (versao,)]
+                if geracao.erro is None:
+                    self._entradas[chave] = _EntradaCache(versao, geracao.dados)
+                    self._entradas.move_to_end(chave)
+                    while len(self._entradas) > self.max_entradas:
+                        self._entradas.popitem(last=False)
+                        self._expulsoes += 1
+            geracao.concluida.set()
+
+        return geracao.dados, False
+
+    def invalidar_escola(self, escola_id: int) -> int:
+        """
+        Remove todas as entradas de uma escola
+
+        Returns:
+            Número de entradas removidas
+        """
+        with self._lock:
+            chaves = [chave for chave in self._entradas if chave[0] == escola_id]
+            for chave in chaves:
+                del self._entradas[chave]
+            self._invalidacoes += len(chaves)
+        return len(chaves)
+
+    def limpar(self) -> int:
+        """
+        Remove todas as entradas do cache
+
+        Returns:
+            Número de entradas removidas
+        """
+        with self._lock:
+            total = len(self._entradas)
+            self._entradas.clear()
+        logger.info(f"Cache de {self.nome} limpo: {total} entrada(s) removida(s)")
+        return total
+
+    def estatisticas(self) -> Dict[str, Any]:
+        """
+        Retorna os contadores do cache
+
+        Returns:
+            Dicionário com tamanho, acertos, falhas, gerações aguardadas,
+            invalidações e expulsões
+        """
+        with self._lock:
+            consultas = self._acertos + self._aguardadas + self._falhas
+            return {
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "ttl_segundos": self.ttl_segundos,
+                "acertos": self._acertos,
+                "falhas": self._falhas,
+                "aguardadas": self._aguardadas,
+                "invalidacoes": self._invalidacoes,
+                "expulsoes": self._expulsoes,
+                "taxa_acerto": round((self._acertos + self._aguardadas) / consultas, 4) if consultas else 0.0
+            }
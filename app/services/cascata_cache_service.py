@@ -0,0 +1,109 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Callable, Tuple
+from ..config.settings import get_settings
+from ..config.logging_config import get_logger
+from .cache_versionado import CacheVersionado
+from .versao_escola_service import VersaoEscolaService
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class CascataCacheService:
+    """
+    Cache LRU em memória da cascata de pedidos por (escola_id, tipo_formulario)
+
+    Cada entrada guarda a versão dos dados da escola (VersaoEscolaService);
+    se distribuições, especificações, arquivos ou unidades da escola mudarem,
+    a entrada é descartada na próxima leitura. Requisições simultâneas para
+    a mesma chave e versão sem entrada no cache aguardam uma única geração.
+    """
+
+    _cache = CacheVersionado("cascata", settings.CASCATA_CACHE_MAX_ENTRADAS, settings.CASCATA_CACHE_TTL_SEGUNDOS)
+
+    @staticmethod
+    def chave(escola_id: int, tipo_formulario: str, formato: str) -> Tuple:
+        """
+        Chave do cache: tipo_formulario normalizado como no banco (sem espaços
+        nas pontas, maiúsculas)
+
+        Args:
+            escola_id: ID da escola
+            tipo_formulario: Tipo de formulário filtrado
+            formato: "dict" ou "json" (texto JSON); cada formato tem suas entradas
+
+        Returns:
+            Tupla usada como chave do cache
+        """
+        return (escola_id, tipo_formulario.strip().upper(), formato)
+
+    @classmethod
+    def obter_ou_gerar(
+        cls,
+        db: Session,
+        escola_id: int,
+        tipo_formulario: str,
+        gerar: Callable[[], Any],
+        formato: str = "dict"
+    ) -> Tuple[Any, bool]:
+        """
+        Retorna a cascata do cache ou a gera e armazena
+
+        A versão dos dados é lida antes de gerar: se os dados mudarem durante
+        a geração, a entrada fica com uma versão antiga e é descartada na
+        próxima leitura. Se outra requisição já estiver gerando a mesma
+        chave com a mesma versão, aguarda o resultado dela.
+
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            tipo_formulario: Tipo de formulário filtrado
+            gerar: Função que executa a consulta (chamada apenas em caso de falha)
+            formato: Formato produzido por gerar ("dict" ou "json")
+
+        Returns:
+            Tupla (cascata, veio_do_cache); o resultado de uma geração
+            aguardada conta como vindo do cache
+        """
+        if not cls._cache.ativo:
+            return gerar(), False
+
+        versao = VersaoEscolaService.obter_versao(db, escola_id)
+        dados, do_cache = cls._cache.obter_ou_gerar(cls.chave(escola_id, tipo_formulario, formato), versao, gerar)
+        if do_cache:
+            logger.info(f"Cascata obtida do cache para escola_id={escola_id}")
+        return dados, do_cache
+
+    @classmethod
+    def invalidar_escola(cls, escola_id: int) -> int:
+        """
+        Remove todas as entradas de uma escola
+
+        Args:
+            escola_id: ID da escola
+
+        Returns:
+            Número de entradas removidas
+        """
+        return cls._cache.invalidar_escola(escola_id)
+
+    @classmethod
+    def limpar(cls) -> int:
+        """
+        Remove todas as entradas do cache
+
+        Returns:
+            Número de entradas removidas
+        """
+        return cls._cache.limpar()
+
+    @classmethod
+    def estatisticas(cls) -> Dict[str, Any]:
+        """
+        Retorna os contadores do cache
+
+        Returns:
+            Dicionário com tamanho, acertos, falhas, gerações aguardadas,
+            invalidações e expulsões
+        """
+        return cls._cache.estatisticas()
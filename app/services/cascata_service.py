@@ -6,6 +6,234 @@ from ..config.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Query complexa com CTEs para estruturar dados hierarquicamente
+QUERY_CASCATA = text("""
+    WITH dados_normalizados AS (
+        SELECT
+            -- TRATAMENTO DE NULOS
+            COALESCE(uc.divisao_logistica, 'Sem divisão') AS divisao_logistica,
+            COALESCE(CAST(uc.dias_uteis AS TEXT), 'Sem dias uteis') AS dias_uteis,
+
+            -- PRODUTO
+            b.id_produto,
+            b.descricao AS nome_produto,
+
+            -- DATA DE SAÍDA
+            COALESCE(
+                TO_CHAR(distri.data_saida, 'YYYY-MM-DD'),
+                'Sem data saida'
+            ) AS data_saida_formatada,
+
+            -- ARQUIVO (NÍVEL 4)
+            ar.id AS arquivo_id,
+            ar.nome as nome_arquivo,
+            distri.quantidade as quantidade,
+            ar.paginas as paginas
+
+        FROM formularios f
+        INNER JOIN especificacoes_form e 
+            ON f.id = e.formulario_id
+        INNER JOIN arquivo_pdfs ar 
+            ON ar.item_pedido_id = e.id
+        INNER JOIN distribuicao_materiais distri 
+            ON distri.arquivo_pdf_id = ar.id
+        INNER JOIN unidades_escolares uc 
+            ON distri.unidade_escolar_id = uc.id
+        INNER JOIN bremen_itens b 
+            ON e.id_produto = b.id_produto
+        WHERE f.tipo_formulario_norm = normalizar_tipo_formulario(:tipo_formulario)
+            AND uc.escola_id = :escola_id
+    ),
+
+    -- NÍVEL 4: ARQUIVOS
+    nivel_arquivos AS (
+        SELECT
+            divisao_logistica,
+            dias_uteis,
+            id_produto,
+            nome_produto,
+            data_saida_formatada,
+
+            COUNT(*) AS qtd_arquivos,
+
+            JSONB_AGG(
+                JSONB_BUILD_OBJECT(
+                    'arquivo', nome_arquivo,
+                    'copias', quantidade,
+                    'paginas', paginas
+                ) ORDER BY nome_arquivo ASC
+            ) AS lista_arquivos
+
+        FROM dados_normalizados
+        GROUP BY 1,2,3,4,5
+    ),
+
+    -- NÍVEL 3: DATAS
+    nivel_datas AS (
+        SELECT
+            divisao_logistica,
+            dias_uteis,
+            id_produto,
+            nome_produto,
+
+            SUM(qtd_arquivos) AS qtd_produto,
+
+            JSONB_AGG(
+                JSONB_BUILD_OBJECT(
+                    'data_saida', data_saida_formatada,
+                    'quantidade', qtd_arquivos,
+                    'arquivos', lista_arquivos
+                ) ORDER BY data_saida_formatada DESC
+            ) AS lista_datas
+
+        FROM nivel_arquivos
+        GROUP BY 1,2,3,4
+    ),
+
+    -- NÍVEL 2: PRODUTOS
+    nivel_produtos AS (
+        SELECT
+            divisao_logistica,
+            dias_uteis,
+
+            SUM(qtd_produto) AS qtd_divisao,
+
+            JSONB_AGG(
+                JSONB_BUILD_OBJECT(
+                    'id_produto', id_produto,
+                    'produto', nome_produto,
+                    'quantidade', qtd_produto,
+                    'datas', lista_datas
+                ) ORDER BY nome_produto ASC
+            ) AS lista_produtos
+
+        FROM nivel_datas
+        GROUP BY 1,2
+    ),
+
+    -- NÍVEL 1: DIVISÕES
+    nivel_divisoes AS (
+        SELECT
+            JSONB_BUILD_OBJECT(
+                'divisao_logistica', divisao_logistica,
+                'dias_uteis', dias_uteis,
+                'quantidade_total', qtd_divisao,
+                'produtos', lista_produtos
+            ) AS objeto_divisao
+        FROM nivel_produtos
+        ORDER BY divisao_logistica ASC
+    )
+
+    -- RESULTADO FINAL
+    SELECT 
+        JSONB_AGG(objeto_divisao) AS dashboard_completo
+    FROM nivel_divisoes;
+""")
+
+# Mesmo resultado como texto JSON: repassado ao cliente sem ser decodificado
+QUERY_CASCATA_TEXTO = text(
+    "SELECT q.dashboard_completo::text AS dashboard_completo FROM ("
+    + QUERY_CASCATA.text.strip().rstrip(";")
+    + ") AS q"
+)
+
+
+# Expansão da cascata nível a nível: cada consulta agrega apenas o nível
+# pedido, filtrado pelo caminho até ele (valores normalizados como na
+# cascata completa), e devolve uma página mais o total de nós do nível.
+_JUNCOES_CASCATA = """
+        FROM formularios f
+        INNER JOIN especificacoes_form e
+            ON f.id = e.formulario_id
+        INNER JOIN arquivo_pdfs ar
+            ON ar.item_pedido_id = e.id
+        INNER JOIN distribuicao_materiais distri
+            ON distri.arquivo_pdf_id = ar.id
+        INNER JOIN unidades_escolares uc
+            ON distri.unidade_escolar_id = uc.id
+        INNER JOIN bremen_itens b
+            ON e.id_produto = b.id_produto
+        WHERE f.tipo_formulario_norm = normalizar_tipo_formulario(:tipo_formulario)
+            AND uc.escola_id = :escola_id
+"""
+
+_FILTRO_DIVISAO = """
+            AND COALESCE(uc.divisao_logistica, 'Sem divisão') = :divisao_logistica
+            AND COALESCE(CAST(uc.dias_uteis AS TEXT), 'Sem dias uteis') = :dias_uteis
+"""
+
+_FILTRO_PRODUTO = """
+            AND b.id_produto = :id_produto
+"""
+
+_FILTRO_DATA = """
+            AND COALESCE(TO_CHAR(distri.data_saida, 'YYYY-MM-DD'), 'Sem data saida') = :data_saida
+"""
+
+
+def _query_nivel(colunas: str, filtros: str, agrupamento: str, ordenacao: str) -> text:
+    """Monta a consulta paginada de um nível (total sempre presente, mesmo sem linhas na página)"""
+    return text(f"""
+        WITH grupos AS (
+            SELECT {colunas}
+            {_JUNCOES_CASCATA}{filtros}
+            {agrupamento}
+        )
+        SELECT pagina.*, totais.total
+        FROM (SELECT COUNT(*) AS total FROM grupos) totais
+        LEFT JOIN LATERAL (
+            SELECT grupos.*, TRUE AS na_pagina
+            FROM grupos
+            ORDER BY {ordenacao}
+            LIMIT :limite OFFSET :offset
+        ) pagina ON TRUE
+    """)
+
+
+QUERY_NIVEL_DIVISOES = _query_nivel(
+    """
+                COALESCE(uc.divisao_logistica, 'Sem divisão') AS divisao_logistica,
+                COALESCE(CAST(uc.dias_uteis AS TEXT), 'Sem dias uteis') AS dias_uteis,
+                COUNT(*) AS quantidade_total,
+                COUNT(DISTINCT b.id_produto) AS total_produtos""",
+    "",
+    "GROUP BY 1, 2",
+    "divisao_logistica ASC, dias_uteis ASC",
+)
+
+QUERY_NIVEL_PRODUTOS = _query_nivel(
+    """
+                b.id_produto,
+                b.descricao AS produto,
+                COUNT(*) AS quantidade,
+                COUNT(DISTINCT distri.data_saida) + MAX(CASE WHEN distri.data_saida IS NULL THEN 1 ELSE 0 END) AS total_datas""",
+    _FILTRO_DIVISAO,
+    "GROUP BY 1, 2",
+    "produto ASC, id_produto ASC",
+)
+
+QUERY_NIVEL_DATAS = _query_nivel(
+    """
+                COALESCE(TO_CHAR(distri.data_saida, 'YYYY-MM-DD'), 'Sem data saida') AS data_saida,
+                COUNT(*) AS quantidade""",
+    _FILTRO_DIVISAO + _FILTRO_PRODUTO,
+    "GROUP BY 1",
+    "data_saida DESC",
+)
+
+# Uma linha por distribuição (o mesmo arquivo se repete por unidade): o id
+# desempata a ordenação para que a paginação seja estável
+QUERY_NIVEL_ARQUIVOS = _query_nivel(
+    """
+                distri.id AS distribuicao_id,
+                ar.nome AS arquivo,
+                distri.quantidade AS copias,
+                ar.paginas AS paginas""",
+    _FILTRO_DIVISAO + _FILTRO_PRODUTO + _FILTRO_DATA,
+    "",
+    "arquivo ASC, distribuicao_id ASC",
+)
+
 
 class CascataService:
     """Service para operações de pedidos em cascata"""
@@ -25,132 +253,8 @@ class CascataService:
         """
         logger.info(f"Buscando pedidos em cascata para escola_id={escola_id}, tipo_formulario={tipo_formulario}")
         
-        # Query complexa com CTEs para estruturar dados hierarquicamente
-        query = text("""
-            WITH dados_normalizados AS (
-                SELECT
-                    -- TRATAMENTO DE NULOS
-                    COALESCE(uc.divisao_logistica, 'Sem divisão') AS divisao_logistica,
-                    COALESCE(CAST(uc.dias_uteis AS TEXT), 'Sem dias uteis') AS dias_uteis,
-
-                    -- PRODUTO
-                    b.id_produto,
-                    b.descricao AS nome_produto,
-
-                    -- DATA DE SAÍDA
-                    COALESCE(
-                        TO_CHAR(CAST(distri.data_saida AS DATE), 'YYYY-MM-DD'),
-                        'Sem data saida'
-                    ) AS data_saida_formatada,
-
-                    -- ARQUIVO (NÍVEL 4)
-                    ar.id AS arquivo_id,
-                    ar.nome as nome_arquivo,
-                    distri.quantidade as quantidade,
-                    ar.paginas as paginas
-
-                FROM formularios f
-                INNER JOIN especificacoes_form e 
-                    ON f.id = e.formulario_id
-                INNER JOIN arquivo_pdfs ar 
-                    ON ar.item_pedido_id = e.id
-                INNER JOIN distribuicao_materiais distri 
-                    ON distri.arquivo_pdf_id = ar.id
-                INNER JOIN unidades_escolares uc 
-                    ON distri.unidade_escolar_id = uc.id
-                INNER JOIN bremen_itens b 
-                    ON e.id_produto = b.id_produto
-                WHERE UPPER(f.tipo_formulario) = UPPER(:tipo_formulario)
-                    AND uc.escola_id = :escola_id
-            ),
-
-            -- NÍVEL 4: ARQUIVOS
-            nivel_arquivos AS (
-                SELECT
-                    divisao_logistica,
-                    dias_uteis,
-                    id_produto,
-                    nome_produto,
-                    data_saida_formatada,
-
-                    COUNT(*) AS qtd_arquivos,
-
-                    JSONB_AGG(
-                        JSONB_BUILD_OBJECT(
-                            'arquivo', nome_arquivo,
-                            'copias', quantidade,
-                            'paginas', paginas
-                        ) ORDER BY nome_arquivo ASC
-                    ) AS lista_arquivos
-
-                FROM dados_normalizados
-                GROUP BY 1,2,3,4,5
-            ),
-
-            -- NÍVEL 3: DATAS
-            nivel_datas AS (
-                SELECT
-                    divisao_logistica,
-                    dias_uteis,
-                    id_produto,
-                    nome_produto,
-
-                    SUM(qtd_arquivos) AS qtd_produto,
-
-                    JSONB_AGG(
-                        JSONB_BUILD_OBJECT(
-                            'data_saida', data_saida_formatada,
-                            'quantidade', qtd_arquivos,
-                            'arquivos', lista_arquivos
-                        ) ORDER BY data_saida_formatada DESC
-                    ) AS lista_datas
-
-                FROM nivel_arquivos
-                GROUP BY 1,2,3,4
-            ),
-
-            -- NÍVEL 2: PRODUTOS
-            nivel_produtos AS (
-                SELECT
-                    divisao_logistica,
-                    dias_uteis,
-
-                    SUM(qtd_produto) AS qtd_divisao,
-
-                    JSONB_AGG(
-                        JSONB_BUILD_OBJECT(
-                            'id_produto', id_produto,
-                            'produto', nome_produto,
-                            'quantidade', qtd_produto,
-                            'datas', lista_datas
-                        ) ORDER BY nome_produto ASC
-                    ) AS lista_produtos
-
-                FROM nivel_datas
-                GROUP BY 1,2
-            ),
-
-            -- NÍVEL 1: DIVISÕES
-            nivel_divisoes AS (
-                SELECT
-                    JSONB_BUILD_OBJECT(
-                        'divisao_logistica', divisao_logistica,
-                        'dias_uteis', dias_uteis,
-                        'quantidade_total', qtd_divisao,
-                        'produtos', lista_produtos
-                    ) AS objeto_divisao
-                FROM nivel_produtos
-                ORDER BY divisao_logistica ASC
-            )
-
-            -- RESULTADO FINAL
-            SELECT 
-                JSONB_AGG(objeto_divisao) AS dashboard_completo
-            FROM nivel_divisoes;
-        """)
-        
         try:
-            result = db.execute(query, {"escola_id": escola_id, "tipo_formulario": tipo_formulario})
+            result = db.execute(QUERY_CASCATA, {"escola_id": escola_id, "tipo_formulario": tipo_formulario})
             row = result.fetchone()
             
             if row and row.dashboard_completo:
@@ -165,3 +269,166 @@ class CascataService:
         except Exception as e:
             logger.error(f"Erro ao buscar pedidos em cascata para escola_id={escola_id}: {str(e)}", exc_info=True)
             raise
+
+    @staticmethod
+    def get_pedidos_escola_cascata_json(db: Session, escola_id: int, tipo_formulario: str = 'MEMOREX') -> str:
+        """
+        Busca os pedidos em cascata como texto JSON, sem decodificar
+        
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            tipo_formulario: Tipo de formulário a filtrar (padrão: 'MEMOREX')
+            
+        Returns:
+            Lista de divisões logísticas serializada ('[]' se não houver dados)
+        """
+        logger.info(f"Buscando pedidos em cascata (JSON) para escola_id={escola_id}, tipo_formulario={tipo_formulario}")
+        
+        try:
+            dashboard_json = db.execute(
+                QUERY_CASCATA_TEXTO, {"escola_id": escola_id, "tipo_formulario": tipo_formulario}
+            ).scalar()
+            if not dashboard_json:
+                logger.warning(f"Nenhum dado encontrado para escola_id={escola_id}")
+                return "[]"
+            return dashboard_json
+            
+        except Exception as e:
+            logger.error(f"Erro ao buscar pedidos em cascata para escola_id={escola_id}: {str(e)}", exc_info=True)
+            raise
+
+    @staticmethod
+    def _listar_nivel(db: Session, query, parametros: Dict[str, Any], chave: str) -> Dict[str, Any]:
+        """
+        Executa a consulta de um nível e separa o total das linhas da página
+        
+        Returns:
+            Dicionário com total e a lista da página em `chave`
+        """
+        linhas = db.execute(query, parametros).mappings().all()
+        total = linhas[0]["total"] if linhas else 0
+        itens = [
+            {coluna: valor for coluna, valor in linha.items() if coluna not in ("total", "na_pagina")}
+            for linha in linhas
+            if linha["na_pagina"]
+        ]
+        return {"total": total, chave: itens}
+
+    @staticmethod
+    def listar_divisoes(
+        db: Session, escola_id: int, tipo_formulario: str = 'MEMOREX', limite: int = 100, offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Primeiro nível da cascata: divisões logísticas com totais
+        
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            tipo_formulario: Tipo de formulário a filtrar (padrão: 'MEMOREX')
+            limite: Quantidade máxima de divisões
+            offset: Divisões a pular (paginação)
+            
+        Returns:
+            Dicionário com total e divisoes (divisao_logistica, dias_uteis,
+            quantidade_total, total_produtos)
+        """
+        return CascataService._listar_nivel(db, QUERY_NIVEL_DIVISOES, {
+            "escola_id": escola_id,
+            "tipo_formulario": tipo_formulario,
+            "limite": limite,
+            "offset": offset,
+        }, "divisoes")
+
+    @staticmethod
+    def listar_produtos(
+        db: Session, escola_id: int, divisao_logistica: str, dias_uteis: str,
+        tipo_formulario: str = 'MEMOREX', limite: int = 100, offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Segundo nível da cascata: produtos de uma divisão
+        
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            divisao_logistica: Divisão como retornada por listar_divisoes
+            dias_uteis: Dias úteis como retornados por listar_divisoes
+            tipo_formulario: Tipo de formulário a filtrar (padrão: 'MEMOREX')
+            limite: Quantidade máxima de produtos
+            offset: Produtos a pular (paginação)
+            
+        Returns:
+            Dicionário com total e produtos (id_produto, produto, quantidade, total_datas)
+        """
+        return CascataService._listar_nivel(db, QUERY_NIVEL_PRODUTOS, {
+            "escola_id": escola_id,
+            "tipo_formulario": tipo_formulario,
+            "divisao_logistica": divisao_logistica,
+            "dias_uteis": dias_uteis,
+            "limite": limite,
+            "offset": offset,
+        }, "produtos")
+
+    @staticmethod
+    def listar_datas(
+        db: Session, escola_id: int, divisao_logistica: str, dias_uteis: str, id_produto: int,
+        tipo_formulario: str = 'MEMOREX', limite: int = 100, offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Terceiro nível da cascata: datas de saída de um produto
+        
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            divisao_logistica: Divisão como retornada por listar_divisoes
+            dias_uteis: Dias úteis como retornados por listar_divisoes
+            id_produto: ID do produto
+            tipo_formulario: Tipo de formulário a filtrar (padrão: 'MEMOREX')
+            limite: Quantidade máxima de datas
+            offset: Datas a pular (paginação)
+            
+        Returns:
+            Dicionário com total e datas (data_saida, quantidade)
+        """
+        return CascataService._listar_nivel(db, QUERY_NIVEL_DATAS, {
+            "escola_id": escola_id,
+            "tipo_formulario": tipo_formulario,
+            "divisao_logistica": divisao_logistica,
+            "dias_uteis": dias_uteis,
+            "id_produto": id_produto,
+            "limite": limite,
+            "offset": offset,
+        }, "datas")
+
+    @staticmethod
+    def listar_arquivos(
+        db: Session, escola_id: int, divisao_logistica: str, dias_uteis: str, id_produto: int, data_saida: str,
+        tipo_formulario: str = 'MEMOREX', limite: int = 100, offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Quarto nível da cascata: arquivos de uma data de saída
+        
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            divisao_logistica: Divisão como retornada por listar_divisoes
+            dias_uteis: Dias úteis como retornados por listar_divisoes
+            id_produto: ID do produto
+            data_saida: Data como retornada por listar_datas (YYYY-MM-DD ou 'Sem data saida')
+            tipo_formulario: Tipo de formulário a filtrar (padrão: 'MEMOREX')
+            limite: Quantidade máxima de arquivos
+            offset: Arquivos a pular (paginação)
+            
+        Returns:
+            Dicionário com total e arquivos (distribuicao_id, arquivo, copias, paginas)
+        """
+        return CascataService._listar_nivel(db, QUERY_NIVEL_ARQUIVOS, {
+            "escola_id": escola_id,
+            "tipo_formulario": tipo_formulario,
+            "divisao_logistica": divisao_logistica,
+            "dias_uteis": dias_uteis,
+            "id_produto": id_produto,
+            "data_saida": data_saida,
+            "limite": limite,
+            "offset": offset,
+        }, "arquivos")
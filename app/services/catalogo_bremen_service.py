@@ -0,0 +1,298 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Any, Optional, Tuple
+from decimal import Decimal
+from datetime import datetime
+import threading
+import time
+from ..config.database import SessionLocal
+from ..config.logging_config import get_logger
+from ..config.settings import get_settings
+
+logger = get_logger(__name__)
+
+
+class ProdutoBremen:
+    """Item do catálogo Bremen (bremen_itens)"""
+    __slots__ = ("id_produto", "descricao", "categoria_prod", "frente_verso", "componentes", "perguntas_gerais")
+
+    def __init__(self, id_produto: int, descricao: Optional[str], categoria_prod: Optional[str], frente_verso: Optional[str]):
+        self.id_produto = id_produto
+        self.descricao = descricao
+        self.categoria_prod = categoria_prod
+        self.frente_verso = frente_verso
+        self.componentes: Tuple["ComponenteBremen", ...] = ()
+        self.perguntas_gerais: Tuple["PerguntaBremen", ...] = ()
+
+
+class ComponenteBremen:
+    """Componente de um produto (bremen_componentes)"""
+    __slots__ = ("id", "id_produto", "id_componente", "descricao", "is_capa", "is_miolo")
+
+    def __init__(self, id: int, id_produto: int, id_componente: int, descricao: Optional[str], is_capa: bool, is_miolo: bool):
+        self.id = id
+        self.id_produto = id_produto
+        self.id_componente = id_componente
+        self.descricao = descricao
+        self.is_capa = is_capa
+        self.is_miolo = is_miolo
+
+
+class PerguntaBremen:
+    """Pergunta de componente ou geral (bremen_perguntas)"""
+    __slots__ = ("id", "id_pergunta", "id_componente", "id_geral", "nome", "tipo")
+
+    def __init__(self, id: int, id_pergunta: int, id_componente: Optional[int], id_geral: Optional[int], nome: str, tipo: str):
+        self.id = id
+        self.id_pergunta = id_pergunta
+        self.id_componente = id_componente
+        self.id_geral = id_geral
+        self.nome = nome
+        self.tipo = tipo
+
+
+class RespostaBremen:
+    """Opção de resposta de uma pergunta (bremen_respostas)"""
+    __slots__ = ("id", "id_resposta", "pergunta_id", "valor", "descricao_opcao")
+
+    def __init__(self, id: int, id_resposta: int, pergunta_id: Optional[int], valor: Optional[str], descricao_opcao: Optional[str]):
+        self.id = id
+        self.id_resposta = id_resposta
+        self.pergunta_id = pergunta_id
+        self.valor = valor
+        self.descricao_opcao = descricao_opcao
+
+
+class GramaturaBremen:
+    """Gramatura do catálogo (bremen_gramatura)"""
+    __slots__ = ("id", "id_item", "gramatura", "unidade_medida")
+
+    def __init__(self, id: int, id_item: Optional[int], gramatura: Decimal, unidade_medida: str):
+        self.id = id
+        self.id_item = id_item
+        self.gramatura = gramatura
+        self.unidade_medida = unidade_medida
+
+
+class TamanhoPapelBremen:
+    """Tamanho de papel do catálogo (bremen_tamanho_papel)"""
+    __slots__ = ("id", "largura", "altura", "label")
+
+    def __init__(self, id: int, largura: Decimal, altura: Decimal, label: Optional[str]):
+        self.id = id
+        self.largura = largura
+        self.altura = altura
+        self.label = label
+
+
+class CatalogoBremen:
+    """
+    Snapshot imutável do catálogo Bremen
+
+    Os índices são dicionários por chave natural; as listas relacionadas
+    (componentes de um produto, perguntas de um componente) são tuplas
+    ordenadas por id.
+    """
+    __slots__ = (
+        "versao", "carregado_em", "produtos", "componentes_por_id_componente",
+        "perguntas", "perguntas_por_componente", "respostas", "gramaturas", "tamanhos_papel"
+    )
+
+    def __init__(self, versao: int):
+        self.versao = versao
+        self.carregado_em = datetime.now()
+        self.produtos: Dict[int, ProdutoBremen] = {}
+        self.componentes_por_id_componente: Dict[int, Tuple[ComponenteBremen, ...]] = {}
+        self.perguntas: Dict[int, PerguntaBremen] = {}
+        self.perguntas_por_componente: Dict[int, Tuple[PerguntaBremen, ...]] = {}
+        self.respostas: Dict[int, RespostaBremen] = {}
+        self.gramaturas: Dict[int, GramaturaBremen] = {}
+        self.tamanhos_papel: Dict[int, TamanhoPapelBremen] = {}
+
+    def componentes_do_produto(self, id_produto: int) -> Tuple[ComponenteBremen, ...]:
+        """Componentes de um produto (vazio se o produto não existir)"""
+        produto = self.produtos.get(id_produto)
+        return produto.componentes if produto else ()
+
+    def descricao_produto(self, id_produto: int) -> Optional[str]:
+        """Descrição de um produto (None se não existir)"""
+        produto = self.produtos.get(id_produto)
+        return produto.descricao if produto else None
+
+    def totais(self) -> Dict[str, int]:
+        """Quantidade de registros por tabela do catálogo"""
+        return {
+            "produtos": len(self.produtos),
+            "componentes": sum(len(produto.componentes) for produto in self.produtos.values()),
+            "perguntas": len(self.perguntas),
+            "respostas": len(self.respostas),
+            "gramaturas": len(self.gramaturas),
+            "tamanhos_papel": len(self.tamanhos_papel),
+        }
+
+
+class CatalogoBremenService:
+    """
+    Snapshot em memória do catálogo Bremen
+
+    Carregado na inicialização da aplicação e recarregado quando o TTL
+    (CATALOGO_BREMEN_TTL_SEGUNDOS) expira ou por sinal explícito
+    (recarregar). A troca do snapshot é atômica: leitores continuam usando
+    o snapshot anterior enquanto o novo é carregado.
+    """
+
+    _catalogo: Optional[CatalogoBremen] = None
+    _expira_em: float = 0.0
+    _versao = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _carregar(db: Session, versao: int) -> CatalogoBremen:
+        """
+        Lê as tabelas do catálogo e monta os índices
+
+        Args:
+            db: Sessão do banco de dados
+            versao: Número da versão do novo snapshot
+
+        Returns:
+            Snapshot carregado
+        """
+        catalogo = CatalogoBremen(versao)
+
+        for row in db.execute(text("""
+            SELECT id_produto, descricao, "categoria_Prod" AS categoria_prod, frente_verso
+            FROM bremen_itens
+            ORDER BY id
+        """)):
+            # id_produto não é único na tabela: mantém o primeiro registro
+            if row.id_produto not in catalogo.produtos:
+                catalogo.produtos[row.id_produto] = ProdutoBremen(
+                    row.id_produto, row.descricao, row.categoria_prod, row.frente_verso
+                )
+
+        componentes_por_produto: Dict[int, list] = {}
+        componentes_por_id: Dict[int, list] = {}
+        for row in db.execute(text("""
+            SELECT id, id_produto, id_componente, descricao, is_capa, is_miolo
+            FROM bremen_componentes
+            ORDER BY id
+        """)):
+            componente = ComponenteBremen(
+                row.id, row.id_produto, row.id_componente, row.descricao, row.is_capa, row.is_miolo
+            )
+            componentes_por_produto.setdefault(row.id_produto, []).append(componente)
+            componentes_por_id.setdefault(row.id_componente, []).append(componente)
+
+        perguntas_por_componente: Dict[int, list] = {}
+        perguntas_gerais: Dict[int, list] = {}
+        for row in db.execute(text("""
+            SELECT id, id_pergunta, id_componente, id_geral, nome, tipo
+            FROM bremen_perguntas
+            ORDER BY id
+        """)):
+            pergunta = PerguntaBremen(row.id, row.id_pergunta, row.id_componente, row.id_geral, row.nome, row.tipo)
+            catalogo.perguntas[row.id] = pergunta
+            if row.id_componente is not None:
+                perguntas_por_componente.setdefault(row.id_componente, []).append(pergunta)
+            if row.id_geral is not None:
+                perguntas_gerais.setdefault(row.id_geral, []).append(pergunta)
+
+        for row in db.execute(text("""
+            SELECT id, id_resposta, pergunta_id, valor, descricao_opcao
+            FROM bremen_respostas
+        """)):
+            catalogo.respostas[row.id] = RespostaBremen(
+                row.id, row.id_resposta, row.pergunta_id, row.valor, row.descricao_opcao
+            )
+
+        for row in db.execute(text("SELECT id, id_item, gramatura, unidade_medida FROM bremen_gramatura")):
+            catalogo.gramaturas[row.id] = GramaturaBremen(row.id, row.id_item, row.gramatura, row.unidade_medida)
+
+        for row in db.execute(text("SELECT id, largura, altura, label FROM bremen_tamanho_papel")):
+            catalogo.tamanhos_papel[row.id] = TamanhoPapelBremen(row.id, row.largura, row.altura, row.label)
+
+        for id_produto, produto in catalogo.produtos.items():
+            produto.componentes = tuple(componentes_por_produto.get(id_produto, ()))
+            produto.perguntas_gerais = tuple(perguntas_gerais.get(id_produto, ()))
+        catalogo.componentes_por_id_componente = {
+            chave: tuple(valor) for chave, valor in componentes_por_id.items()
+        }
+        catalogo.perguntas_por_componente = {
+            chave: tuple(valor) for chave, valor in perguntas_por_componente.items()
+        }
+        return catalogo
+
+    @classmethod
+    def recarregar(cls, db: Optional[Session] = None) -> CatalogoBremen:
+        """
+        Carrega um novo snapshot e o publica
+
+        Args:
+            db: Sessão do banco de dados (opcional; abre uma própria se None)
+
+        Returns:
+            Snapshot recém-carregado
+        """
+        with cls._lock:
+            inicio = time.perf_counter()
+            sessao = db or SessionLocal()
+            try:
+                catalogo = cls._carregar(sessao, cls._versao + 1)
+            finally:
+                if db is None:
+                    sessao.close()
+
+            cls._versao = catalogo.versao
+            cls._catalogo = catalogo
+            cls._expira_em = time.monotonic() + get_settings().CATALOGO_BREMEN_TTL_SEGUNDOS
+
+        logger.info(
+            f"Catálogo Bremen carregado (versão {catalogo.versao}) em "
+            f"{(time.perf_counter() - inicio) * 1000:.0f} ms: {catalogo.totais()}"
+        )
+        return catalogo
+
+    @classmethod
+    def obter(cls, db: Optional[Session] = None) -> CatalogoBremen:
+        """
+        Retorna o snapshot atual, recarregando se não existir ou se o TTL expirou
+
+        Se outra thread já estiver recarregando, devolve o snapshot anterior
+        em vez de esperar.
+
+        Args:
+            db: Sessão do banco de dados usada se for preciso carregar
+
+        Returns:
+            Snapshot do catálogo
+        """
+        catalogo = cls._catalogo
+        if catalogo is None:
+            return cls.recarregar(db)
+
+        if time.monotonic() >= cls._expira_em and not cls._lock.locked():
+            try:
+                return cls.recarregar(db)
+            except Exception as e:
+                logger.error(f"Erro ao recarregar catálogo Bremen, usando versão {catalogo.versao}: {str(e)}", exc_info=True)
+        return catalogo
+
+    @classmethod
+    def status(cls) -> Dict[str, Any]:
+        """
+        Informações do snapshot atual
+
+        Returns:
+            Dicionário com versão, data de carga, expiração e totais
+        """
+        catalogo = cls._catalogo
+        if catalogo is None:
+            return {"carregado": False, "versao": None, "carregado_em": None, "expira_em_segundos": None, "totais": {}}
+        return {
+            "carregado": True,
+            "versao": catalogo.versao,
+            "carregado_em": catalogo.carregado_em.isoformat(),
+            "expira_em_segundos": max(0, round(cls._expira_em - time.monotonic())),
+            "totais": catalogo.totais(),
+        }
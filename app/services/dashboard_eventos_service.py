@@ -0,0 +1,191 @@
+import json
+import asyncio
+import select
+import threading
+from contextlib import suppress
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, Optional, Set, Iterable
+from ..config.database import engine
+from ..config.settings import get_settings
+from ..config.logging_config import get_logger
+from .cascata_cache_service import CascataCacheService
+from .orcamento_cache_service import OrcamentoCacheService
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Canal notificado pelos triggers de resumo_pedidos_escola
+# (migrations/007_notificar_resumo_pedidos_escola.sql)
+CANAL = "resumo_pedidos_escola"
+
+SINCRONIZAR = {"tipo": "sincronizar"}
+
+
+class Assinatura:
+    """Fila de eventos de um cliente conectado, opcionalmente filtrada por escola"""
+    __slots__ = ("fila", "escola_ids")
+
+    def __init__(self, escola_ids: Optional[Iterable[int]] = None):
+        self.fila: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(
+            maxsize=settings.DASHBOARD_EVENTOS_MAX_FILA
+        )
+        self.escola_ids = frozenset(escola_ids) if escola_ids else None
+
+    def entregar(self, evento: Optional[Dict[str, Any]]) -> None:
+        """
+        Enfileira o evento; se o cliente estiver atrasado (fila cheia), descarta
+        os pendentes e pede que ele recarregue o dashboard
+        """
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait(SINCRONIZAR if evento is not None else None)
+
+
+class DashboardEventosService:
+    """
+    Mudanças no resumo de pedidos por escola para os clientes do dashboard
+
+    Uma thread por processo mantém uma conexão dedicada (fora do pool) em
+    LISTEN no canal do resumo e repassa cada notificação, no event loop, às
+    assinaturas dos clientes SSE conectados. A escuta começa com o primeiro
+    cliente. Depois de (re)conectar, todos recebem "sincronizar", pois
+    notificações enviadas com a conexão caída se perdem.
+    """
+
+    _assinaturas: Set[Assinatura] = set()
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _thread: Optional[threading.Thread] = None
+    _parar = threading.Event()
+    _escutando = False
+    _recebidos = 0
+    _reconexoes = 0
+
+    @classmethod
+    def assinar(cls, escola_ids: Optional[Iterable[int]] = None) -> Assinatura:
+        """
+        Registra um cliente (chamado no event loop)
+
+        Args:
+            escola_ids: Escolas de interesse (None = todas)
+
+        Returns:
+            Assinatura cuja fila recebe os eventos; None na fila encerra o envio
+        """
+        cls._iniciar()
+        assinatura = Assinatura(escola_ids)
+        cls._assinaturas.add(assinatura)
+        if cls._escutando:
+            assinatura.entregar(SINCRONIZAR)
+        return assinatura
+
+    @classmethod
+    def cancelar(cls, assinatura: Assinatura) -> None:
+        """Remove o cliente"""
+        cls._assinaturas.discard(assinatura)
+
+    @classmethod
+    def _iniciar(cls) -> None:
+        """Inicia a thread de escuta, se ainda não estiver rodando"""
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+        cls._loop = asyncio.get_running_loop()
+        cls._parar.clear()
+        cls._thread = threading.Thread(target=cls._escutar, name="dashboard-eventos", daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    async def parar(cls) -> None:
+        """Encerra a escuta e os envios em andamento (shutdown da aplicação)"""
+        for assinatura in list(cls._assinaturas):
+            assinatura.entregar(None)
+        if cls._thread is None:
+            return
+        cls._parar.set()
+        await run_in_threadpool(cls._thread.join, 5)
+        cls._thread = None
+
+    @classmethod
+    def _escutar(cls) -> None:
+        """Laço da thread de escuta: conecta, faz LISTEN e lê as notificações"""
+        espera = 1
+        conectou_antes = False
+        while not cls._parar.is_set():
+            driver = None
+            try:
+                conexao = engine.raw_connection()
+                driver = conexao.driver_connection
+                conexao.detach()  # conexão dedicada: não volta ao pool
+                driver.autocommit = True
+                with driver.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CANAL}")
+
+                cls._escutando = True
+                if conectou_antes:
+                    cls._reconexoes += 1
+                conectou_antes = True
+                espera = 1
+                logger.info(f"Escutando notificações do canal {CANAL}")
+                cls._publicar(SINCRONIZAR)
+
+                while not cls._parar.is_set():
+                    if not select.select([driver], [], [], 1.0)[0]:
+                        continue
+                    driver.poll()
+                    while driver.notifies:
+                        cls._publicar(driver.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Erro na escuta do canal {CANAL}: {str(e)}; nova tentativa em {espera}s")
+                cls._parar.wait(espera)
+                espera = min(espera * 2, 30)
+            finally:
+                cls._escutando = False
+                if driver is not None:
+                    with suppress(Exception):
+                        driver.close()
+
+    @classmethod
+    def _publicar(cls, payload: Any) -> None:
+        """Agenda a distribuição de uma notificação no event loop (chamado pela thread)"""
+        with suppress(RuntimeError):  # loop já encerrado
+            cls._loop.call_soon_threadsafe(cls._distribuir, payload)
+
+    @classmethod
+    def _distribuir(cls, payload: Any) -> None:
+        """Entrega o evento às assinaturas interessadas e invalida os caches da escola"""
+        if isinstance(payload, str):
+            cls._recebidos += 1
+            try:
+                evento = json.loads(payload)
+            except ValueError:
+                logger.warning(f"Notificação inválida no canal {CANAL}: {payload[:200]}")
+                return
+        else:
+            evento = payload
+
+        escola_id = evento.get("escola_id")
+        if escola_id is not None:
+            CascataCacheService.invalidar_escola(escola_id)
+            OrcamentoCacheService.invalidar_escola(escola_id)
+
+        for assinatura in list(cls._assinaturas):
+            if escola_id is not None and assinatura.escola_ids is not None and escola_id not in assinatura.escola_ids:
+                continue
+            assinatura.entregar(evento)
+
+    @classmethod
+    def estatisticas(cls) -> Dict[str, Any]:
+        """
+        Retorna o estado da escuta neste processo
+
+        Returns:
+            Dicionário com clientes conectados, escuta ativa, eventos recebidos e reconexões
+        """
+        return {
+            "clientes": len(cls._assinaturas),
+            "escutando": cls._escutando,
+            "eventos_recebidos": cls._recebidos,
+            "reconexoes": cls._reconexoes,
+        }
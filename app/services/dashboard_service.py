@@ -1,49 +1,175 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from ..config.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Filtro opcional por tipo de formulário, pela coluna normalizada e indexada
+# (migrations/005_formularios_tipo_formulario_norm.sql), como na cascata
+_JUNCAO_TIPO_FORMULARIO = """
+        JOIN formularios f
+            ON f.id = {coluna}
+           AND f.tipo_formulario_norm = normalizar_tipo_formulario(:tipo_formulario)"""
+
+# Totais por escola mantidos por trigger (migrations/006_resumo_pedidos_escola.sql)
+QUERY_ESCOLAS = text("""
+    SELECT
+        e.id AS escola_id,
+        e.nome AS nome_escola,
+        e.codigo AS codigo_escola,
+        r.total_pedidos
+    FROM resumo_pedidos_escola r
+    JOIN escolas e
+        ON e.id = r.escola_id
+    ORDER BY e.nome
+""")
+
+# Com tipo de formulário, os pedidos são contados no resumo por formulário
+# (mesmas regras de calcular_resumo_pedidos_escola)
+_RESUMO_POR_TIPO = """(
+        SELECT
+            rf.escola_id,
+            COUNT(*) AS total_pedidos,
+            COUNT(*) FILTER (WHERE rf.distribuicoes_pendentes > 0) AS pedidos_pendentes,
+            COUNT(*) FILTER (WHERE rf.distribuicoes_concluidas = rf.distribuicoes) AS pedidos_concluidos
+        FROM resumo_pedidos_escola_formulario rf""" + _JUNCAO_TIPO_FORMULARIO.format(coluna="rf.formulario_id") + """
+        GROUP BY rf.escola_id
+    )"""
+
+QUERY_ESCOLAS_POR_TIPO = text(f"""
+    SELECT
+        e.id AS escola_id,
+        e.nome AS nome_escola,
+        e.codigo AS codigo_escola,
+        r.total_pedidos
+    FROM {_RESUMO_POR_TIPO} r
+    JOIN escolas e
+        ON e.id = r.escola_id
+    ORDER BY e.nome
+""")
+
+
+def _query_escolas_detalhado(por_tipo: bool) -> text:
+    """
+    Agregados detalhados em uma única leitura das distribuições: agrupa por
+    (escola, status) e consolida por escola. Pedidos pendentes e concluídos
+    vêm do resumo mantido por trigger.
+
+    Com por_tipo, as distribuições são agrupadas também por formulário e o
+    filtro por tipo é aplicado sobre esses grupos: o número de distribuições
+    de um tipo não depende da estimativa do planner para a junção com
+    formularios, que é ruim quando há muitos formulários sem distribuições.
+    """
+    if por_tipo:
+        por_status = """
+        por_formulario AS (
+            SELECT
+                ue.escola_id,
+                dm.formulario_id,
+                COALESCE(dm.status_distribuicao, 'sem_status') AS status_distribuicao,
+                COUNT(*) AS distribuicoes,
+                SUM(dm.quantidade) AS copias,
+                SUM(dm.quantidade * ap.paginas) AS paginas,
+                MIN(dm.data_saida) AS menor_data_saida
+            FROM distribuicao_materiais dm
+            JOIN unidades_escolares ue
+                ON ue.id = dm.unidade_escolar_id
+            LEFT JOIN arquivo_pdfs ap
+                ON ap.id = dm.arquivo_pdf_id
+            GROUP BY 1, 2, 3
+        ),
+
+        por_status AS (
+            SELECT
+                pf.escola_id,
+                pf.status_distribuicao,
+                SUM(pf.distribuicoes) AS distribuicoes,
+                SUM(pf.copias) AS copias,
+                SUM(pf.paginas) AS paginas,
+                MIN(pf.menor_data_saida) AS menor_data_saida
+            FROM por_formulario pf""" + _JUNCAO_TIPO_FORMULARIO.format(coluna="pf.formulario_id") + """
+            GROUP BY 1, 2
+        ),"""
+        resumo = _RESUMO_POR_TIPO
+    else:
+        por_status = """
+        por_status AS (
+            SELECT
+                ue.escola_id,
+                COALESCE(dm.status_distribuicao, 'sem_status') AS status_distribuicao,
+                COUNT(*) AS distribuicoes,
+                SUM(dm.quantidade) AS copias,
+                SUM(dm.quantidade * ap.paginas) AS paginas,
+                MIN(dm.data_saida) AS menor_data_saida
+            FROM distribuicao_materiais dm
+            JOIN unidades_escolares ue
+                ON ue.id = dm.unidade_escolar_id
+            LEFT JOIN arquivo_pdfs ap
+                ON ap.id = dm.arquivo_pdf_id
+            GROUP BY 1, 2
+        ),"""
+        resumo = "resumo_pedidos_escola"
+    return text(f"""
+        WITH{por_status}
+
+        por_escola AS (
+            SELECT
+                escola_id,
+                jsonb_object_agg(status_distribuicao, distribuicoes) AS distribuicoes_por_status,
+                COALESCE(SUM(copias), 0) AS total_copias,
+                COALESCE(SUM(paginas), 0) AS total_paginas,
+                MIN(menor_data_saida) FILTER (WHERE status_distribuicao = 'pendente') AS proxima_data_saida
+            FROM por_status
+            GROUP BY escola_id
+        )
+
+        SELECT
+            e.id AS escola_id,
+            e.nome AS nome_escola,
+            e.codigo AS codigo_escola,
+            r.total_pedidos,
+            r.pedidos_pendentes,
+            r.pedidos_concluidos,
+            pe.distribuicoes_por_status,
+            pe.total_copias,
+            pe.total_paginas,
+            pe.proxima_data_saida
+        FROM {resumo} r
+        JOIN escolas e
+            ON e.id = r.escola_id
+        JOIN por_escola pe
+            ON pe.escola_id = r.escola_id
+        ORDER BY e.nome
+    """)
+
+
+QUERY_ESCOLAS_DETALHADO = _query_escolas_detalhado(por_tipo=False)
+QUERY_ESCOLAS_DETALHADO_POR_TIPO = _query_escolas_detalhado(por_tipo=True)
+
 
 class DashboardService:
     """Service para operações do dashboard"""
 
     @staticmethod
-    def get_escolas_com_pedidos(db: Session) -> List[Dict[str, Any]]:
+    def get_escolas_com_pedidos(db: Session, tipo_formulario: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Busca todas as escolas agrupadas com contagem de pedidos
         
         Args:
             db: Sessão do banco de dados
+            tipo_formulario: Conta apenas pedidos deste tipo (None = todos)
             
         Returns:
             Lista de escolas com seus dados e total de pedidos
         """
-        logger.info("Buscando escolas com contagem de pedidos")
-        
-        query = text("""
-            SELECT
-                e.id AS escola_id,
-                e.nome AS nome_escola,
-                e.codigo AS codigo_escola,
-                COUNT(DISTINCT f.id) AS total_pedidos
-            FROM escolas e
-            JOIN unidades_escolares ue
-                ON ue.escola_id = e.id
-            JOIN distribuicao_materiais dm
-                ON dm.unidade_escolar_id = ue.id
-            JOIN formularios f
-                ON f.id = dm.formulario_id
-            GROUP BY
-                e.id,
-                e.nome,
-                e.codigo
-            ORDER BY e.nome;
-        """)
+        logger.info(f"Buscando escolas com contagem de pedidos (tipo_formulario={tipo_formulario})")
         
         try:
-            result = db.execute(query)
+            if tipo_formulario is None:
+                result = db.execute(QUERY_ESCOLAS)
+            else:
+                result = db.execute(QUERY_ESCOLAS_POR_TIPO, {"tipo_formulario": tipo_formulario})
             escolas = []
             
             for row in result:
@@ -61,3 +187,36 @@ class DashboardService:
         except Exception as e:
             logger.error(f"Erro ao buscar escolas com pedidos: {str(e)}", exc_info=True)
             raise
+
+    @staticmethod
+    def get_escolas_com_pedidos_detalhado(db: Session, tipo_formulario: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Busca as escolas com pedidos e os agregados detalhados de cada uma
+        
+        Além de total_pedidos, retorna pedidos pendentes e concluídos,
+        distribuições por status_distribuicao, total de cópias, total de
+        páginas (cópias × páginas do arquivo; arquivos sem páginas não somam)
+        e a próxima data de saída pendente (a menor; pode estar no passado se
+        houver atraso).
+        
+        Args:
+            db: Sessão do banco de dados
+            tipo_formulario: Considera apenas pedidos deste tipo (None = todos)
+            
+        Returns:
+            Lista de escolas com seus dados e agregados
+        """
+        logger.info(f"Buscando escolas com agregados detalhados de pedidos (tipo_formulario={tipo_formulario})")
+        
+        try:
+            if tipo_formulario is None:
+                result = db.execute(QUERY_ESCOLAS_DETALHADO)
+            else:
+                result = db.execute(QUERY_ESCOLAS_DETALHADO_POR_TIPO, {"tipo_formulario": tipo_formulario})
+            escolas = [dict(row._mapping) for row in result]
+            logger.info(f"Encontradas {len(escolas)} escolas com pedidos (detalhado)")
+            return escolas
+            
+        except Exception as e:
+            logger.error(f"Erro ao buscar agregados detalhados das escolas: {str(e)}", exc_info=True)
+            raise
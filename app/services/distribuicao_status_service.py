@@ -0,0 +1,118 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Any, List, Optional
+import time
+from ..config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+QUERY_STATUS_POR_CODIGO = text("""
+    SELECT id, codigo
+    FROM status_deskflow_pedido
+    WHERE codigo = :codigo
+""")
+
+# Transição em um único comando: trava as distribuições elegíveis, atualiza
+# com UPDATE ... RETURNING e grava o histórico com INSERT ... SELECT sobre as
+# linhas retornadas. atualizado_em é atualizado explicitamente (o onupdate
+# do ORM não se aplica a SQL direto) para invalidar caches e o modo
+# incremental do orçamento.
+QUERY_TRANSICAO = text("""
+    WITH alvo AS (
+        SELECT
+            dm.id,
+            sd.codigo AS status_anterior
+        FROM distribuicao_materiais dm
+        LEFT JOIN status_deskflow_pedido sd ON sd.id = dm.status_id
+        WHERE dm.id = ANY(CAST(:ids AS int[]))
+          AND (CAST(:status_origem AS text) IS NULL OR dm.status_distribuicao = :status_origem)
+        FOR UPDATE OF dm
+    ),
+
+    atualizadas AS (
+        UPDATE distribuicao_materiais dm
+        SET status_id = :status_id,
+            status_distribuicao = COALESCE(CAST(:status_distribuicao AS text), dm.status_distribuicao),
+            atualizado_em = now()
+        FROM alvo
+        WHERE dm.id = alvo.id
+        RETURNING dm.id, alvo.status_anterior
+    ),
+
+    historico AS (
+        INSERT INTO historico_processamento (
+            distribuicao_material_id, status_anterior, status_novo, mensagem, sucesso, data_evento
+        )
+        SELECT id, status_anterior, :status_codigo, :mensagem, TRUE, now()
+        FROM atualizadas
+        RETURNING 1
+    )
+
+    SELECT
+        COALESCE((SELECT ARRAY_AGG(id ORDER BY id) FROM atualizadas), ARRAY[]::int[]) AS ids_atualizados,
+        (SELECT COUNT(*) FROM historico) AS historicos
+""")
+
+
+class DistribuicaoStatusService:
+    """Transições de status de distribuições em lote"""
+
+    @staticmethod
+    def transicionar(
+        db: Session,
+        distribuicao_material_ids: List[int],
+        status_codigo: str,
+        status_distribuicao: Optional[str] = None,
+        status_origem: Optional[str] = "pendente",
+        mensagem: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Move as distribuições para um novo status e registra o histórico
+
+        Apenas distribuições existentes e com status_distribuicao igual a
+        status_origem (se informado) são movidas; as demais são devolvidas
+        em ids_ignorados. O commit fica a cargo de quem chamou.
+
+        Args:
+            db: Sessão do banco de dados
+            distribuicao_material_ids: IDs das distribuições (como no orçamento)
+            status_codigo: Código do novo status (status_deskflow_pedido)
+            status_distribuicao: Novo status_distribuicao (opcional; mantém o atual)
+            status_origem: status_distribuicao exigido para a transição (None aceita qualquer)
+            mensagem: Mensagem gravada no histórico (opcional)
+
+        Returns:
+            Dicionário no formato de TransicaoStatusResponse
+
+        Raises:
+            ValueError: Se o código de status não existir
+        """
+        inicio = time.perf_counter()
+        status_novo = db.execute(QUERY_STATUS_POR_CODIGO, {"codigo": status_codigo}).first()
+        if status_novo is None:
+            raise ValueError(f"Status não encontrado: {status_codigo}")
+
+        ids = sorted(set(distribuicao_material_ids))
+        resultado = db.execute(QUERY_TRANSICAO, {
+            "ids": ids,
+            "status_id": status_novo.id,
+            "status_codigo": status_novo.codigo,
+            "status_distribuicao": status_distribuicao,
+            "status_origem": status_origem,
+            "mensagem": mensagem,
+        }).one()
+
+        atualizados = set(resultado.ids_atualizados)
+        tempo = time.perf_counter() - inicio
+        logger.info(
+            f"Transição para {status_codigo}: {len(atualizados)} de {len(ids)} distribuição(ões) "
+            f"em {tempo * 1000:.0f} ms"
+        )
+        return {
+            "status_codigo": status_novo.codigo,
+            "total_solicitadas": len(ids),
+            "total_atualizadas": len(atualizados),
+            "total_historicos": resultado.historicos,
+            "ids_ignorados": [distribuicao_id for distribuicao_id in ids if distribuicao_id not in atualizados],
+            "tempo_segundos": round(tempo, 3),
+        }
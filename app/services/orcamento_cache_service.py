@@ -0,0 +1,142 @@
+import json
+from sqlalchemy.orm import Session
+from typing import Dict, Any, List, Callable, Tuple
+from ..config.settings import get_settings
+from ..config.logging_config import get_logger
+from ..schemas.orcamento import OrcamentoRequest
+from .cache_versionado import CacheVersionado
+from .versao_escola_service import VersaoEscolaService
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class OrcamentoCacheService:
+    """
+    Cache LRU em memória dos orçamentos gerados
+
+    A chave é a requisição canonizada (listas ordenadas e sem duplicados).
+    Cada entrada guarda a versão dos dados da escola (VersaoEscolaService);
+    se distribuições, especificações, arquivos ou unidades da escola mudarem,
+    a entrada é descartada na próxima leitura. Requisições simultâneas para
+    a mesma chave e versão sem entrada no cache aguardam uma única geração.
+
+    As entradas são imutáveis (tupla de textos JSON) e servem aos dois
+    formatos: orçamentos gerados como dict (lote, jobs) aquecem o cache
+    usado pelo modo JSON de /gerar e vice-versa. Cada acerto recebe
+    orçamentos próprios, que podem ser alterados sem afetar o cache.
+    """
+
+    _cache = CacheVersionado("orçamentos", settings.ORCAMENTO_CACHE_MAX_ENTRADAS, settings.ORCAMENTO_CACHE_TTL_SEGUNDOS)
+
+    @staticmethod
+    def chave(request: OrcamentoRequest) -> Tuple:
+        """
+        Canoniza a requisição: ordem e duplicados das listas não mudam a chave
+
+        Args:
+            request: Dados para geração do orçamento
+
+        Returns:
+            Tupla usada como chave do cache
+        """
+        return (
+            request.escola_id,
+            tuple(sorted(set(request.ids_produtos))),
+            tuple(sorted(set(request.datas_saida))),
+            tuple(sorted(set(request.divisoes_logistica))) if request.divisoes_logistica else None,
+            tuple(sorted(set(request.dias_uteis_filtro))) if request.dias_uteis_filtro else None,
+        )
+
+    @classmethod
+    def obter_ou_gerar(
+        cls,
+        db: Session,
+        request: OrcamentoRequest,
+        gerar: Callable[[], List[Any]],
+        formato: str = "dict"
+    ) -> Tuple[List[Any], bool]:
+        """
+        Retorna os orçamentos do cache ou os gera e armazena
+
+        A versão dos dados é lida antes de gerar: se os dados mudarem durante
+        a geração, a entrada fica com uma versão antiga e é descartada na
+        próxima leitura. Se outra requisição já estiver gerando a mesma
+        chave com a mesma versão, aguarda o resultado dela.
+
+        Args:
+            db: Sessão do banco de dados
+            request: Dados para geração do orçamento
+            gerar: Função que executa a geração (chamada apenas em caso de falha)
+            formato: Formato dos orçamentos produzidos por gerar e
+                retornados ("dict" ou "json", texto JSON); a entrada do
+                cache é a mesma para os dois
+
+        Returns:
+            Tupla (orçamentos, veio_do_cache)
+        """
+        if not cls._cache.ativo:
+            return gerar(), False
+
+        gerados: List[List[Any]] = []
+
+        def gerar_e_congelar() -> Tuple[str, ...]:
+            orcamentos = list(gerar())
+            gerados.append(orcamentos)
+            return cls._congelar(orcamentos, formato)
+
+        versao = VersaoEscolaService.obter_versao(db, request.escola_id)
+        congelados, do_cache = cls._cache.obter_ou_gerar(cls.chave(request), versao, gerar_e_congelar)
+        if not do_cache:
+            return gerados[0], False
+
+        logger.info(f"Orçamento obtido do cache para escola_id={request.escola_id}")
+        return cls._descongelar(congelados, formato), True
+
+    @staticmethod
+    def _congelar(orcamentos: List[Any], formato: str) -> Tuple[str, ...]:
+        """Converte os orçamentos do formato de gerar para a forma armazenada (textos JSON, imutáveis)"""
+        if formato == "json":
+            return tuple(orcamentos)
+        return tuple(json.dumps(orcamento, ensure_ascii=False, separators=(',', ':')) for orcamento in orcamentos)
+
+    @staticmethod
+    def _descongelar(congelados: Tuple[str, ...], formato: str) -> List[Any]:
+        """Cópia própria dos orçamentos armazenados, no formato de quem chamou"""
+        if formato == "json":
+            return list(congelados)
+        return [json.loads(orcamento) for orcamento in congelados]
+
+    @classmethod
+    def invalidar_escola(cls, escola_id: int) -> int:
+        """
+        Remove todas as entradas de uma escola
+
+        Args:
+            escola_id: ID da escola
+
+        Returns:
+            Número de entradas removidas
+        """
+        return cls._cache.invalidar_escola(escola_id)
+
+    @classmethod
+    def limpar(cls) -> int:
+        """
+        Remove todas as entradas do cache
+
+        Returns:
+            Número de entradas removidas
+        """
+        return cls._cache.limpar()
+
+    @classmethod
+    def estatisticas(cls) -> Dict[str, Any]:
+        """
+        Retorna os contadores do cache
+
+        Returns:
+            Dicionário com tamanho, acertos, falhas, gerações aguardadas,
+            invalidações e expulsões
+        """
+        return cls._cache.estatisticas()
@@ -0,0 +1,321 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date, datetime
+from typing import Dict, Any, List, Set, Tuple
+from ..config.logging_config import get_logger
+from ..schemas.orcamento import OrcamentoRequest
+from .orcamento_service import OrcamentoService
+from .orcamento_cache_service import OrcamentoCacheService
+from .arquivo_orcamento_service import ArquivoOrcamentoService
+
+logger = get_logger(__name__)
+
+# Distribuições atuais de cada unidade (mesmos filtros do join base do
+# orçamento) e se algo que entra no orçamento da unidade mudou depois de
+# :marca_dados. Arquivos entram pela especificação (item_pedido_id) e pelo
+# par (pares + formulario_id), como na montagem dos itens.
+QUERY_UNIDADES_ALTERADAS = text("""
+    WITH parametros AS (
+        SELECT
+            :escola_id AS escola_id,
+            CAST(:ids_produtos AS int[]) AS ids_produtos,
+            CAST(:datas_saida AS date[]) AS datas_saida,
+            CAST(:divisoes_logistica AS text[]) AS divisoes_logistica,
+            CAST(:dias_uteis_filtro AS int[]) AS dias_uteis_filtro,
+            CAST(:marca_dados AS timestamp) AS marca_dados
+    ),
+
+    unidades_filtradas AS (
+        SELECT
+            ue.id,
+            ue.cliente_id,
+            ue.atualizado_em
+        FROM unidades_escolares ue
+        CROSS JOIN parametros p
+        WHERE ue.escola_id = p.escola_id
+          AND (p.divisoes_logistica IS NULL OR ue.divisao_logistica = ANY(p.divisoes_logistica))
+          AND (p.dias_uteis_filtro IS NULL OR ue.dias_uteis = ANY(p.dias_uteis_filtro))
+    ),
+
+    distribuicoes AS (
+        SELECT
+            uf.id AS unidade_id,
+            uf.cliente_id,
+            dm.id,
+            ef.id AS especificacao_id,
+            GREATEST(dm.atualizado_em, ef.atualizado_em, uf.atualizado_em) AS atualizado_em
+        FROM unidades_filtradas uf
+        CROSS JOIN parametros p
+        JOIN distribuicao_materiais dm ON dm.unidade_escolar_id = uf.id
+        JOIN especificacoes_form ef ON ef.id = dm.especificacao_form_id
+        WHERE dm.quantidade > 0
+          AND dm.status_distribuicao = 'pendente'
+          AND (p.ids_produtos IS NULL OR ef.id_produto = ANY(p.ids_produtos))
+          AND (
+              p.datas_saida IS NULL
+              OR dm.data_saida = ANY(p.datas_saida)
+              OR dm.data_saida IS NULL
+          )
+    ),
+
+    arquivos_alterados AS (
+        SELECT ap.item_pedido_id, ap.pares, ap.formulario_id
+        FROM arquivo_pdfs ap
+        CROSS JOIN parametros p
+        WHERE ap.item_pedido_id IN (SELECT especificacao_id FROM distribuicoes)
+          AND ap.atualizado_em > p.marca_dados
+        UNION
+        SELECT pi.item_pedido_id, NULL, NULL
+        FROM arquivo_pdfs_paginas_item pi
+        CROSS JOIN parametros p
+        WHERE pi.item_pedido_id IN (SELECT especificacao_id FROM distribuicoes)
+          AND pi.atualizado_em > p.marca_dados
+        UNION
+        SELECT NULL, pp.pares, pp.formulario_id
+        FROM arquivo_pdfs_paginas_par pp
+        CROSS JOIN parametros p
+        WHERE pp.atualizado_em > p.marca_dados
+    ),
+
+    especificacoes_alteradas AS (
+        SELECT aa.item_pedido_id AS especificacao_id
+        FROM arquivos_alterados aa
+        WHERE aa.item_pedido_id IS NOT NULL
+        UNION
+        SELECT ap.item_pedido_id
+        FROM arquivos_alterados aa
+        JOIN arquivo_pdfs ap
+            ON ap.pares = aa.pares
+           AND ap.formulario_id = aa.formulario_id
+        WHERE aa.pares IS NOT NULL
+    )
+
+    SELECT
+        d.unidade_id,
+        d.cliente_id,
+        ARRAY_AGG(d.id ORDER BY d.id) AS distribuicao_material_ids,
+        BOOL_OR(
+            d.atualizado_em > p.marca_dados
+            OR d.especificacao_id IN (SELECT especificacao_id FROM especificacoes_alteradas)
+        ) AS alterada
+    FROM distribuicoes d
+    CROSS JOIN parametros p
+    GROUP BY d.unidade_id, d.cliente_id, p.marca_dados
+    ORDER BY d.unidade_id
+""")
+
+
+def _ids_distribuicao(orcamento: Dict[str, Any]) -> Set[int]:
+    """IDs de distribuicao_materiais de todos os itens de um orçamento"""
+    return {
+        distribuicao_id
+        for item in orcamento["data"]["itens"]
+        for distribuicao_id in item.get("distribuicao_material_ids") or ()
+    }
+
+
+class OrcamentoIncrementalService:
+    """
+    Geração incremental de orçamentos a partir de um arquivo salvo
+
+    Reaproveita os orçamentos das unidades que não mudaram desde a
+    marca_dados do arquivo (horário do banco no início da geração) e
+    recalcula apenas as demais. Uma unidade é
+    recalculada quando alguma distribuição, especificação, arquivo (ou a
+    própria unidade) foi atualizado depois do arquivo, ou quando o conjunto
+    de distribuições pendentes dela mudou (inclusões, exclusões e mudanças
+    de status). Mudanças no catálogo Bremen não são detectadas.
+    """
+
+    @staticmethod
+    def marca_dados(db: Session) -> datetime:
+        """
+        Horário do banco, no fuso da sessão, usado como marca d'água da geração
+
+        Deve ser lido antes da geração: alterações feitas durante ela ficam
+        com atualizado_em posterior e são recalculadas na próxima vez.
+        """
+        return db.execute(text("SELECT LOCALTIMESTAMP")).scalar()
+
+    @staticmethod
+    def _request_do_arquivo(dados: Dict[str, Any]) -> OrcamentoRequest:
+        """
+        Reconstrói os filtros usados para gerar um arquivo de orçamento
+
+        Raises:
+            ValueError: se o arquivo não tiver os filtros (gerado antes do modo incremental)
+        """
+        filtros = dados.get("filtros")
+        if not filtros or filtros.get("datas_saida") is None or not dados.get("marca_dados"):
+            raise ValueError("Arquivo base não registra os filtros da geração; gere o orçamento completo novamente")
+        return OrcamentoRequest(
+            escola_id=dados["escola_id"],
+            ids_produtos=dados["ids_produtos"],
+            datas_saida=[date.fromisoformat(d) for d in filtros["datas_saida"]],
+            divisoes_logistica=filtros.get("divisoes_logistica"),
+            dias_uteis_filtro=filtros.get("dias_uteis_filtro")
+        )
+
+    @staticmethod
+    def _unidades_atuais(db: Session, request: OrcamentoRequest, marca_dados: datetime) -> Dict[int, Any]:
+        """
+        Distribuições atuais e marca de alteração por unidade
+
+        Returns:
+            Dicionário unidade_id -> linha (cliente_id, distribuicao_material_ids, alterada)
+        """
+        parametros = OrcamentoService._montar_parametros(
+            request.escola_id,
+            request.ids_produtos,
+            request.datas_saida,
+            request.divisoes_logistica,
+            request.dias_uteis_filtro
+        )
+        del parametros["unidades_ids"]
+        parametros["marca_dados"] = marca_dados
+        return {row.unidade_id: row for row in db.execute(QUERY_UNIDADES_ALTERADAS, parametros)}
+
+    @staticmethod
+    def _classificar(
+        db: Session,
+        orcamentos_base: List[Dict[str, Any]],
+        atuais: Dict[int, Any]
+    ) -> Tuple[Dict[int, List[Dict[str, Any]]], Set[int], Set[int]]:
+        """
+        Associa os orçamentos do arquivo às unidades e decide o que recalcular
+
+        A unidade de cada orçamento do arquivo é a unidade atual das suas
+        distribuições. O orçamento é reaproveitado se todas elas continuam
+        pendentes nessa unidade e o cliente é o mesmo; caso contrário a
+        unidade é recalculada.
+
+        Returns:
+            Tupla (orçamentos reaproveitáveis por unidade, unidades a
+            recalcular, unidades presentes no arquivo)
+        """
+        ids_base = sorted({d for orcamento in orcamentos_base for d in _ids_distribuicao(orcamento)})
+        unidade_base = dict(db.execute(
+            text("SELECT id, unidade_escolar_id FROM distribuicao_materiais WHERE id = ANY(CAST(:ids AS int[]))"),
+            {"ids": ids_base}
+        ).all()) if ids_base else {}
+        unidade_atual = {
+            distribuicao_id: unidade_id
+            for unidade_id, atual in atuais.items()
+            for distribuicao_id in atual.distribuicao_material_ids
+        }
+
+        por_unidade: Dict[int, List[Dict[str, Any]]] = {}
+        distribuicoes_base: Dict[int, Set[int]] = {}
+        recalcular: Set[int] = set()
+        unidades_arquivo: Set[int] = set()
+        for orcamento in orcamentos_base:
+            ids = _ids_distribuicao(orcamento)
+            unidades = {unidade_base[d] for d in ids if unidade_base.get(d) is not None}
+            unidades_arquivo |= unidades
+            if len(unidades) != 1 or any(d not in unidade_base for d in ids):
+                # Distribuições excluídas ou movidas entre unidades
+                recalcular |= unidades & atuais.keys()
+                continue
+
+            unidade_id = unidades.pop()
+            if unidade_id not in atuais:
+                continue
+            if (
+                orcamento["data"].get("id_cliente") != atuais[unidade_id].cliente_id
+                or any(unidade_atual.get(d) != unidade_id for d in ids)
+            ):
+                recalcular.add(unidade_id)
+                continue
+            por_unidade.setdefault(unidade_id, []).append(orcamento)
+            distribuicoes_base.setdefault(unidade_id, set()).update(ids)
+
+        for unidade_id, atual in atuais.items():
+            if atual.alterada or distribuicoes_base.get(unidade_id) != set(atual.distribuicao_material_ids):
+                recalcular.add(unidade_id)
+
+        reaproveitar = {
+            unidade_id: orcamentos
+            for unidade_id, orcamentos in por_unidade.items()
+            if unidade_id not in recalcular
+        }
+        return reaproveitar, recalcular, unidades_arquivo
+
+    @staticmethod
+    def gerar_orcamento_incremental(
+        db: Session,
+        request: OrcamentoRequest,
+        arquivo_base: str
+    ) -> Dict[str, Any]:
+        """
+        Gera os orçamentos da escola reaproveitando um arquivo salvo
+
+        O resultado tem a mesma ordem de uma geração completa (por unidade e
+        tipo de agrupamento).
+
+        Args:
+            db: Sessão do banco de dados
+            request: Filtros da geração; devem ser os mesmos do arquivo base
+            arquivo_base: Nome do arquivo em temp_orcamentos/
+
+        Returns:
+            Dicionário com orcamentos, marca_dados (para salvar o novo
+            arquivo) e as listas unidades_reaproveitadas, unidades_recalculadas e
+            unidades_removidas
+
+        Raises:
+            FileNotFoundError: se o arquivo base não existir
+            ValueError: se o arquivo for de outra escola ou de outros filtros
+        """
+        marca_dados = OrcamentoIncrementalService.marca_dados(db)
+        dados = ArquivoOrcamentoService.obter_conteudo(arquivo_base)
+
+        request_base = OrcamentoIncrementalService._request_do_arquivo(dados)
+        if OrcamentoCacheService.chave(request_base) != OrcamentoCacheService.chave(request):
+            raise ValueError("Os filtros da requisição diferem dos filtros do arquivo base")
+        marca_base = datetime.fromisoformat(dados["marca_dados"])
+
+        atuais = OrcamentoIncrementalService._unidades_atuais(db, request, marca_base)
+        reaproveitar, recalcular, unidades_arquivo = OrcamentoIncrementalService._classificar(
+            db, dados.get("orcamentos") or [], atuais
+        )
+
+        novos: Dict[int, List[Dict[str, Any]]] = {}
+        if recalcular:
+            unidade_atual = {
+                distribuicao_id: unidade_id
+                for unidade_id in recalcular
+                for distribuicao_id in atuais[unidade_id].distribuicao_material_ids
+            }
+            for orcamento in OrcamentoService.gerar_orcamento(
+                db=db,
+                escola_id=request.escola_id,
+                ids_produtos=request.ids_produtos,
+                datas_saida=request.datas_saida,
+                divisoes_logistica=request.divisoes_logistica,
+                dias_uteis_filtro=request.dias_uteis_filtro,
+                versao_query=request.versao_query,
+                unidades_ids=sorted(recalcular)
+            ):
+                # None: distribuições criadas depois da detecção (vão para o fim)
+                unidade_id = next(
+                    (unidade_atual[d] for d in _ids_distribuicao(orcamento) if d in unidade_atual),
+                    None
+                )
+                novos.setdefault(unidade_id, []).append(orcamento)
+
+        # Mesma ordem da geração completa: por unidade e, dentro dela, na ordem da query
+        orcamentos: List[Dict[str, Any]] = []
+        for unidade_id in sorted(reaproveitar.keys() | novos.keys(), key=lambda u: (u is None, u or 0)):
+            orcamentos.extend(reaproveitar.get(unidade_id) or novos[unidade_id])
+
+        logger.info(
+            f"Orçamento incremental da escola_id={request.escola_id} a partir de {arquivo_base}: "
+            f"{len(reaproveitar)} unidade(s) reaproveitada(s), {len(recalcular)} recalculada(s)"
+        )
+        return {
+            "orcamentos": orcamentos,
+            "marca_dados": marca_dados,
+            "unidades_reaproveitadas": sorted(reaproveitar),
+            "unidades_recalculadas": sorted(recalcular),
+            "unidades_removidas": sorted(unidades_arquivo - reaproveitar.keys() - novos.keys() - {None}),
+        }
@@ -0,0 +1,173 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional
+from ..config.settings import get_settings
+from ..config.logging_config import get_logger
+from ..schemas.orcamento import OrcamentoRequest
+from .orcamento_lote_service import OrcamentoLoteService
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+STATUS_PENDENTE = "pendente"
+STATUS_EXECUTANDO = "executando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_ERRO = "erro"
+
+
+class _JobOrcamento:
+    """Estado de um job de geração de orçamento"""
+    __slots__ = (
+        "id", "escola_id", "status", "criado_em", "iniciado_em", "finalizado_em",
+        "_inicio", "_execucao", "_fim", "arquivo", "total_unidades", "erro"
+    )
+
+    def __init__(self, escola_id: int):
+        self.id = uuid.uuid4().hex
+        self.escola_id = escola_id
+        self.status = STATUS_PENDENTE
+        self.criado_em = datetime.now()
+        self.iniciado_em: Optional[datetime] = None
+        self.finalizado_em: Optional[datetime] = None
+        self._inicio = time.monotonic()
+        self._execucao: Optional[float] = None
+        self._fim: Optional[float] = None
+        self.arquivo: Optional[str] = None
+        self.total_unidades = 0
+        self.erro: Optional[str] = None
+
+    def em_andamento(self) -> bool:
+        return self.status in (STATUS_PENDENTE, STATUS_EXECUTANDO)
+
+    def para_dict(self) -> Dict[str, Any]:
+        """Representação no formato de OrcamentoJobResponse"""
+        agora = time.monotonic()
+        tempo_fila = ((self._execucao or agora) - self._inicio)
+        tempo_execucao = ((self._fim or agora) - self._execucao) if self._execucao else None
+        return {
+            "job_id": self.id,
+            "escola_id": self.escola_id,
+            "status": self.status,
+            "criado_em": self.criado_em,
+            "iniciado_em": self.iniciado_em,
+            "finalizado_em": self.finalizado_em,
+            "tempo_fila_segundos": round(tempo_fila, 3),
+            "tempo_execucao_segundos": round(tempo_execucao, 3) if tempo_execucao is not None else None,
+            "arquivo": self.arquivo,
+            "total_unidades": self.total_unidades,
+            "erro": self.erro,
+        }
+
+
+class OrcamentoJobService:
+    """
+    Jobs assíncronos de geração de orçamento
+
+    Os jobs rodam em um pool de ORCAMENTO_JOBS_MAX_PARALELO threads, cada
+    uma com sessão própria, para não esgotar o pool de conexões. Quando há
+    ORCAMENTO_JOBS_MAX_FILA jobs pendentes ou em execução, novos jobs são
+    recusados. Jobs finalizados ficam consultáveis por
+    ORCAMENTO_JOBS_RETENCAO_SEGUNDOS.
+    """
+
+    _jobs: "OrderedDict[str, _JobOrcamento]" = OrderedDict()
+    _lock = threading.Lock()
+    _executor: Optional[ThreadPoolExecutor] = None
+
+    @classmethod
+    def _obter_executor(cls) -> ThreadPoolExecutor:
+        """Cria o pool de workers na primeira submissão"""
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.ORCAMENTO_JOBS_MAX_PARALELO),
+                thread_name_prefix="orcamento-job"
+            )
+        return cls._executor
+
+    @classmethod
+    def _remover_expirados(cls) -> None:
+        """Remove jobs finalizados há mais tempo que a retenção (chamado com o lock)"""
+        limite = time.monotonic() - settings.ORCAMENTO_JOBS_RETENCAO_SEGUNDOS
+        expirados = [
+            job_id for job_id, job in cls._jobs.items()
+            if not job.em_andamento() and job._fim is not None and job._fim < limite
+        ]
+        for job_id in expirados:
+            del cls._jobs[job_id]
+
+    @classmethod
+    def submeter(cls, request: OrcamentoRequest) -> Optional[Dict[str, Any]]:
+        """
+        Enfileira a geração de um orçamento
+
+        Args:
+            request: Dados para geração do orçamento
+
+        Returns:
+            Estado inicial do job, ou None se a fila estiver cheia
+        """
+        with cls._lock:
+            cls._remover_expirados()
+            em_andamento = sum(1 for job in cls._jobs.values() if job.em_andamento())
+            if em_andamento >= settings.ORCAMENTO_JOBS_MAX_FILA:
+                logger.warning(f"Fila de jobs de orçamento cheia ({em_andamento} em andamento)")
+                return None
+
+            job = _JobOrcamento(request.escola_id)
+            cls._jobs[job.id] = job
+            cls._obter_executor().submit(cls._executar, job, request)
+            logger.info(f"Job de orçamento {job.id} enfileirado para escola_id={request.escola_id}")
+            return job.para_dict()
+
+    @classmethod
+    def _executar(cls, job: _JobOrcamento, request: OrcamentoRequest) -> None:
+        """
+        Executa um job em uma thread do pool
+
+        Args:
+            job: Job a executar
+            request: Dados para geração do orçamento
+        """
+        with cls._lock:
+            job.status = STATUS_EXECUTANDO
+            job.iniciado_em = datetime.now()
+            job._execucao = time.monotonic()
+
+        try:
+            # O arquivo é o único resultado do job: sem ele, o job falhou
+            resultado = OrcamentoLoteService.gerar_e_salvar(request, arquivo_obrigatorio=True)
+        except Exception as e:
+            resultado = {"arquivo": None, "total_unidades": 0, "erro": str(e)}
+
+        with cls._lock:
+            job.arquivo = resultado["arquivo"]
+            job.total_unidades = resultado["total_unidades"]
+            job.erro = resultado["erro"]
+            job.status = STATUS_ERRO if resultado["erro"] else STATUS_CONCLUIDO
+            job.finalizado_em = datetime.now()
+            job._fim = time.monotonic()
+
+        logger.info(
+            f"Job de orçamento {job.id} {job.status}: {job.total_unidades} unidade(s) "
+            f"em {job._fim - job._execucao:.2f}s"
+        )
+
+    @classmethod
+    def obter(cls, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Retorna o estado de um job
+
+        Args:
+            job_id: ID do job
+
+        Returns:
+            Estado do job ou None se não existir (ou já expirou)
+        """
+        with cls._lock:
+            cls._remover_expirados()
+            job = cls._jobs.get(job_id)
+            return job.para_dict() if job else None
@@ -0,0 +1,171 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Iterator, Tuple
+from ..config.database import SessionLocal
+from ..config.settings import get_settings
+from ..config.logging_config import get_logger
+from ..schemas.orcamento import OrcamentoRequest
+from .orcamento_service import OrcamentoService
+from .orcamento_cache_service import OrcamentoCacheService
+from .arquivo_orcamento_service import ArquivoOrcamentoService
+from .orcamento_incremental_service import OrcamentoIncrementalService
+from .orcamento_persistencia_service import OrcamentoPersistenciaService
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+
+class OrcamentoLoteService:
+    """Service para geração de orçamentos de várias escolas em paralelo"""
+
+    @staticmethod
+    def gerar_e_salvar(request: OrcamentoRequest, arquivo_obrigatorio: bool = False) -> Dict[str, Any]:
+        """
+        Gera (ou obtém do cache) e salva o orçamento de uma escola
+        
+        Executado em uma thread do lote (ou de um job), com sessão própria
+        do pool. Erros são devolvidos no resultado para não interromper o lote.
+        Com request.arquivo_base a geração é incremental (sem cache) e com
+        request.persistir os orçamentos também são gravados em orcamento_api.
+        
+        Uma falha ao salvar o arquivo só é registrada em log, a menos que
+        arquivo_obrigatorio seja True (jobs, cujo único resultado é o
+        arquivo): nesse caso ela vai para "erro".
+        
+        Args:
+            request: Filtros já resolvidos para a escola
+            arquivo_obrigatorio: Trata a falha ao salvar o arquivo como erro
+            
+        Returns:
+            Dicionário no formato de OrcamentoLoteItem
+        """
+        db = SessionLocal()
+        try:
+            marca_dados = OrcamentoIncrementalService.marca_dados(db)
+            if request.arquivo_base:
+                incremental = OrcamentoIncrementalService.gerar_orcamento_incremental(
+                    db, request, request.arquivo_base
+                )
+                orcamentos, marca_dados = incremental["orcamentos"], incremental["marca_dados"]
+            else:
+                orcamentos, _ = OrcamentoCacheService.obter_ou_gerar(
+                    db,
+                    request,
+                    lambda: OrcamentoService.gerar_orcamento(
+                        db=db,
+                        escola_id=request.escola_id,
+                        ids_produtos=request.ids_produtos,
+                        datas_saida=request.datas_saida,
+                        divisoes_logistica=request.divisoes_logistica,
+                        dias_uteis_filtro=request.dias_uteis_filtro,
+                        versao_query=request.versao_query
+                    )
+                )
+            persistencia = None
+            if request.persistir:
+                persistencia = OrcamentoPersistenciaService.persistir(db, orcamentos)
+            db.commit()
+            
+            nome_arquivo = None
+            erro = None
+            try:
+                nome_arquivo = ArquivoOrcamentoService.salvar_orcamento(
+                    orcamentos=orcamentos,
+                    escola_id=request.escola_id,
+                    ids_produtos=request.ids_produtos,
+                    datas_saida=request.datas_saida,
+                    divisoes_logistica=request.divisoes_logistica,
+                    dias_uteis_filtro=request.dias_uteis_filtro,
+                    marca_dados=marca_dados
+                )
+            except Exception as e:
+                logger.warning(f"Erro ao salvar arquivo de orçamento da escola_id={request.escola_id}: {str(e)}")
+                if arquivo_obrigatorio:
+                    erro = f"Erro ao salvar arquivo de orçamento: {str(e)}"
+            
+            return {
+                "escola_id": request.escola_id,
+                "orcamentos": orcamentos,
+                "total_unidades": len(orcamentos),
+                "arquivo": nome_arquivo,
+                "persistencia": persistencia,
+                "erro": erro
+            }
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Erro ao gerar orçamento da escola_id={request.escola_id} no lote: {str(e)}", exc_info=True)
+            return {
+                "escola_id": request.escola_id,
+                "orcamentos": [],
+                "total_unidades": 0,
+                "arquivo": None,
+                "persistencia": None,
+                "erro": str(e)
+            }
+        finally:
+            db.close()
+
+    @staticmethod
+    def _executar(requests: List[OrcamentoRequest]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Executa o lote com fan-out limitado sobre o pool de conexões
+        
+        No máximo ORCAMENTO_LOTE_MAX_PARALELO escolas são processadas ao mesmo
+        tempo, cada uma com sua própria sessão.
+        
+        Yields:
+            Tupla (posição na requisição, resultado) na ordem de conclusão
+        """
+        max_paralelo = max(1, min(settings.ORCAMENTO_LOTE_MAX_PARALELO, len(requests)))
+        logger.info(f"Gerando lote de {len(requests)} escola(s) com até {max_paralelo} em paralelo")
+        
+        with ThreadPoolExecutor(max_workers=max_paralelo, thread_name_prefix="orcamento-lote") as executor:
+            futures = {
+                executor.submit(OrcamentoLoteService.gerar_e_salvar, request): indice
+                for indice, request in enumerate(requests)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    @staticmethod
+    def iterar_lote(requests: List[OrcamentoRequest]) -> Iterator[Dict[str, Any]]:
+        """
+        Gera os orçamentos do lote entregando cada escola assim que termina
+        
+        Args:
+            requests: Uma requisição por escola
+            
+        Yields:
+            Resultado de cada escola (formato de OrcamentoLoteItem)
+        """
+        for _, resultado in OrcamentoLoteService._executar(requests):
+            yield resultado
+
+    @staticmethod
+    def gerar_lote(requests: List[OrcamentoRequest]) -> Dict[str, Any]:
+        """
+        Gera os orçamentos do lote e os agrupa por escola, na ordem da requisição
+        
+        Args:
+            requests: Uma requisição por escola
+            
+        Returns:
+            Dicionário no formato de OrcamentoLoteResponse
+        """
+        inicio = time.perf_counter()
+        resultados: List[Dict[str, Any]] = [None] * len(requests)
+        for indice, resultado in OrcamentoLoteService._executar(requests):
+            resultados[indice] = resultado
+        
+        tempo = time.perf_counter() - inicio
+        total_unidades = sum(resultado["total_unidades"] for resultado in resultados)
+        erros = sum(1 for resultado in resultados if resultado["erro"])
+        logger.info(f"Lote concluído: {len(resultados)} escola(s), {total_unidades} unidade(s), {erros} erro(s) em {tempo:.2f}s")
+        
+        return {
+            "resultados": resultados,
+            "total_escolas": len(resultados),
+            "total_unidades": total_unidades,
+            "tempo_segundos": round(tempo, 3),
+            "mensagem": f"Orçamentos gerados para {len(resultados) - erros} de {len(resultados)} escola(s)"
+        }
@@ -0,0 +1,453 @@
+import json
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Any, List, Iterator, Tuple, Union, Callable
+from decimal import Decimal
+from ..config.logging_config import get_logger
+from .orcamento_service import CTES_ORCAMENTO_V2
+from .catalogo_bremen_service import CatalogoBremenService, CatalogoBremen, ComponenteBremen
+
+logger = get_logger(__name__)
+
+# Linhas planas: um registro por (item, especificação candidata), já na ordem
+# final do payload. Reaproveita as CTEs da query v2; componentes, perguntas e
+# respostas vêm do catálogo Bremen em memória, por isso as CTEs que os juntam
+# não são referenciadas (e não são executadas pelo PostgreSQL).
+QUERY_LINHAS_ORCAMENTO = text(CTES_ORCAMENTO_V2 + """,
+
+    -- Especificações candidatas de cada item (mesma regra de componentes_item)
+    especificacoes_item AS (
+        SELECT ip.item_id, i.*
+        FROM itens_produto ip
+        JOIN itens i
+            ON i.pares = ip.pares
+           AND i.formulario_id = ip.formulario_id
+        WHERE ip.pares IS NOT NULL
+        UNION ALL
+        SELECT ip.item_id, i.*
+        FROM itens_produto ip
+        JOIN itens i ON i.especificacao_id = ip.especificacao_id
+        WHERE ip.pares IS NULL
+    )
+
+    SELECT
+        ip.item_id,
+        ip.unidade_id,
+        ip.cliente_id,
+        ip.tipo_agrupamento,
+        ip.especificacao_id,
+        ip.id_produto,
+        ip.nome_arquivo,
+        ip.quantidade_total,
+        COALESCE(di.distribuicao_material_ids, ARRAY[]::integer[]) AS distribuicao_material_ids,
+        ei.especificacao_id AS candidata_especificacao_id,
+        ei.id_produto AS candidata_id_produto,
+        ei.pares AS candidata_pares,
+        ei.formulario_id AS candidata_formulario_id,
+        ROUND(ei.altura_mm::numeric / 10, 2) AS altura,
+        ROUND(ei.largura_mm::numeric / 10, 2) AS largura,
+        ei.gramatura_miolo,
+        ei.gramatura_catalogo,
+        CAST(ei.corfrente AS TEXT) AS corfrente,
+        CAST(ei.corverso AS TEXT) AS corverso
+    FROM itens_produto ip
+    LEFT JOIN distribuicao_ids di
+        ON di.unidade_id = ip.unidade_id
+       AND di.chave_agrupamento = ip.chave_agrupamento
+    LEFT JOIN especificacoes_item ei ON ei.item_id = ip.item_id
+    ORDER BY ip.unidade_id, ip.tipo_agrupamento DESC, ip.chave_agrupamento, ip.item_id, ei.especificacao_id
+""")
+
+# Respostas escolhidas nas especificações (metadados resolvidos pelo catálogo)
+QUERY_RESPOSTAS_ORCAMENTO = text("""
+    SELECT bed.especificacao_id, bed.pergunta_id, bed.resposta_id
+    FROM bremen_especificacao_detalhes bed
+    WHERE bed.especificacao_id = ANY(CAST(:especificacoes AS int[]))
+""")
+
+# Páginas do PDF mais recente, apenas para os componentes escolhidos (busca pela PK)
+QUERY_PAGINAS_ORCAMENTO = text("""
+    SELECT 'par' AS origem, p.id_componente, p.pares AS chave, p.formulario_id, p.paginas, p.paginas_miolo
+    FROM arquivo_pdfs_paginas_par p
+    JOIN unnest(
+        CAST(:par_componentes AS int[]),
+        CAST(:par_pares AS int[]),
+        CAST(:par_formularios AS int[])
+    ) AS k(id_componente, pares, formulario_id)
+        USING (id_componente, pares, formulario_id)
+    UNION ALL
+    SELECT 'item', p.id_componente, p.item_pedido_id, NULL, p.paginas, p.paginas_miolo
+    FROM arquivo_pdfs_paginas_item p
+    JOIN unnest(
+        CAST(:item_componentes AS int[]),
+        CAST(:item_especificacoes AS int[])
+    ) AS k(id_componente, item_pedido_id)
+        USING (id_componente, item_pedido_id)
+""")
+
+
+def _valor_json(valor: Any) -> Any:
+    """
+    Converte valores do banco para o mesmo tipo que json.loads produziria
+
+    Um numeric sem casas decimais vira int; com casas decimais
+    (ex.: ROUND(x, 2) -> 21.00) vira float, como no JSON do PostgreSQL.
+    """
+    if isinstance(valor, Decimal):
+        return int(valor) if valor.as_tuple().exponent >= 0 else float(valor)
+    return valor
+
+
+def _valor_bruto(valor: Any) -> Any:
+    """Mantém o valor do banco (Decimal com as casas do numeric) para _json_pg"""
+    return valor
+
+
+class _ArrayPg(list):
+    """Array do PostgreSQL dentro de json_build_object (escrito sem espaços: [1,2,3])"""
+
+
+def _json_pg(valor: Any) -> str:
+    """
+    Serializa como o tipo json do PostgreSQL escreve o resultado de
+    json_build_object/json_agg, para que o texto seja idêntico ao da query v2
+
+    Objetos usam "chave" : valor separados por ", ", listas (json_agg) usam
+    ", " e arrays (_ArrayPg) ",". Um Decimal mantém as casas do numeric
+    (21.00). Strings são escapadas como em escape_json (json.dumps com
+    ensure_ascii=False escapa os mesmos caracteres).
+    """
+    if valor is None:
+        return 'null'
+    if valor is True:
+        return 'true'
+    if valor is False:
+        return 'false'
+    if isinstance(valor, str):
+        return json.dumps(valor, ensure_ascii=False)
+    if isinstance(valor, (int, Decimal)):
+        return str(valor)
+    if isinstance(valor, dict):
+        return '{' + ', '.join(f'{_json_pg(chave)} : {_json_pg(item)}' for chave, item in valor.items()) + '}'
+    if isinstance(valor, _ArrayPg):
+        return '[' + ','.join(_json_pg(item) for item in valor) + ']'
+    if isinstance(valor, list):
+        return '[' + ', '.join(_json_pg(item) for item in valor) + ']'
+    raise TypeError(f"Tipo sem serialização JSON do PostgreSQL: {type(valor).__name__}")
+
+
+def _array_pg(valores) -> str:
+    """Formata uma sequência de inteiros como literal de array do PostgreSQL"""
+    return '{' + ','.join(map(str, valores)) + '}'
+
+
+class OrcamentoMontagemService:
+    """
+    Engine de orçamento que monta o payload em Python
+
+    Busca linhas planas (itens x especificações, respostas e páginas) e
+    resolve componentes, perguntas e respostas pelo catálogo Bremen em
+    memória, produzindo o mesmo JSON da query v2 sem usar
+    json_build_object/json_agg no banco. Como texto, a saída é idêntica byte
+    a byte à da query v2 em texto; como dict, igual ao json.loads dela.
+    """
+
+    # Linhas buscadas por vez do cursor no servidor
+    TAMANHO_LOTE_LINHAS = 1000
+
+    # Unidades montadas juntas (respostas e páginas buscadas uma vez por lote)
+    UNIDADES_POR_LOTE = 20
+
+    @staticmethod
+    def _buscar_respostas(
+        db: Session,
+        catalogo: CatalogoBremen,
+        produto_da_especificacao: Dict[int, int]
+    ) -> Tuple[Dict[Tuple[int, int], List[Dict]], Dict[Tuple[int, int], List[Dict]]]:
+        """
+        Busca as respostas das especificações e indexa por chave
+
+        Args:
+            db: Sessão do banco de dados
+            catalogo: Snapshot do catálogo Bremen
+            produto_da_especificacao: id_produto de cada especificação candidata
+
+        Returns:
+            Tupla (perguntas por (especificacao_id, id_componente),
+                   perguntas gerais por (especificacao_id, id_produto)),
+            ordenadas por id_pergunta
+        """
+        por_componente: Dict[Tuple[int, int], list] = {}
+        gerais: Dict[Tuple[int, int], list] = {}
+        if not produto_da_especificacao:
+            return por_componente, gerais
+
+        result = db.execute(QUERY_RESPOSTAS_ORCAMENTO, {
+            "especificacoes": _array_pg(sorted(produto_da_especificacao))
+        })
+        for row in result:
+            pergunta = catalogo.perguntas.get(row.pergunta_id)
+            resposta = catalogo.respostas.get(row.resposta_id)
+            if pergunta is None or resposta is None or resposta.valor is None:
+                continue
+
+            ordem = (pergunta.id_pergunta, pergunta.id)
+            if pergunta.id_componente is not None:
+                por_componente.setdefault((row.especificacao_id, pergunta.id_componente), []).append((ordem, {
+                    'id_pergunta': pergunta.id_pergunta,
+                    'pergunta': pergunta.nome,
+                    'tipo': pergunta.tipo,
+                    'resposta': resposta.descricao_opcao
+                }))
+            if pergunta.id_geral is not None and pergunta.id_geral == produto_da_especificacao[row.especificacao_id]:
+                gerais.setdefault((row.especificacao_id, pergunta.id_geral), []).append((ordem, {
+                    'tipo': pergunta.tipo,
+                    'pergunta': pergunta.nome,
+                    'resposta': resposta.descricao_opcao,
+                    'id_pergunta': pergunta.id_pergunta
+                }))
+
+        def ordenar(indice):
+            return {chave: [item for _, item in sorted(lista, key=lambda par: par[0])] for chave, lista in indice.items()}
+
+        return ordenar(por_componente), ordenar(gerais)
+
+    @staticmethod
+    def _escolher_componentes(
+        catalogo: CatalogoBremen,
+        candidatas: List[Any],
+        por_componente: Dict[Tuple[int, int], List[Dict]]
+    ) -> List[Tuple[Any, ComponenteBremen]]:
+        """
+        Escolhe uma especificação por componente do item
+
+        Mesma regra da query v2: prefere a especificação com respostas para
+        o componente, depois o menor especificacao_id e o menor id do componente.
+
+        Returns:
+            Lista (linha candidata, componente) ordenada por id_componente
+        """
+        escolhidos: Dict[int, Tuple[Tuple, Any, ComponenteBremen]] = {}
+        for candidata in candidatas:
+            especificacao_id = candidata.candidata_especificacao_id
+            for componente in catalogo.componentes_do_produto(candidata.candidata_id_produto):
+                ordem = (
+                    0 if (especificacao_id, componente.id_componente) in por_componente else 1,
+                    especificacao_id,
+                    componente.id
+                )
+                atual = escolhidos.get(componente.id_componente)
+                if atual is None or ordem < atual[0]:
+                    escolhidos[componente.id_componente] = (ordem, candidata, componente)
+        return [(candidata, componente) for _, (_, candidata, componente) in sorted(escolhidos.items())]
+
+    @staticmethod
+    def _buscar_paginas(db: Session, componentes: List[Tuple[Any, ComponenteBremen]]) -> Dict[Tuple, Any]:
+        """
+        Busca as páginas do PDF mais recente de cada componente escolhido
+
+        Returns:
+            Dicionário por ('par', id_componente, pares, formulario_id) ou
+            ('item', id_componente, especificacao_id)
+        """
+        chaves_par = set()
+        chaves_item = set()
+        for candidata, componente in componentes:
+            if candidata.candidata_pares is not None:
+                if candidata.candidata_formulario_id is not None:
+                    chaves_par.add((componente.id_componente, candidata.candidata_pares, candidata.candidata_formulario_id))
+            else:
+                chaves_item.add((componente.id_componente, candidata.candidata_especificacao_id))
+
+        if not chaves_par and not chaves_item:
+            return {}
+
+        chaves_par = sorted(chaves_par)
+        chaves_item = sorted(chaves_item)
+        result = db.execute(QUERY_PAGINAS_ORCAMENTO, {
+            "par_componentes": _array_pg(c[0] for c in chaves_par),
+            "par_pares": _array_pg(c[1] for c in chaves_par),
+            "par_formularios": _array_pg(c[2] for c in chaves_par),
+            "item_componentes": _array_pg(c[0] for c in chaves_item),
+            "item_especificacoes": _array_pg(c[1] for c in chaves_item),
+        })
+
+        paginas = {}
+        for row in result:
+            if row.origem == 'par':
+                paginas[('par', row.id_componente, row.chave, row.formulario_id)] = row
+            else:
+                paginas[('item', row.id_componente, row.chave)] = row
+        return paginas
+
+    @staticmethod
+    def _montar_componente(
+        candidata: Any,
+        componente: ComponenteBremen,
+        paginas: Dict[Tuple, Any],
+        por_componente: Dict[Tuple[int, int], List[Dict]],
+        valor: Callable[[Any], Any] = _valor_json
+    ) -> Dict[str, Any]:
+        """
+        Monta o JSON de um componente (mesmas regras de componentes/componentes_item da v2)
+
+        valor converte os numerics (_valor_json para dict, _valor_bruto para texto)
+        """
+        descricao = (componente.descricao or '').lower()
+        miolo = 'miolo' in descricao
+
+        if 'capa' in descricao:
+            quantidade_paginas = 1
+        else:
+            if candidata.candidata_pares is not None:
+                registro = paginas.get(('par', componente.id_componente, candidata.candidata_pares, candidata.candidata_formulario_id))
+            else:
+                registro = paginas.get(('item', componente.id_componente, candidata.candidata_especificacao_id))
+            if registro is None:
+                quantidade_paginas = None
+            else:
+                quantidade_paginas = registro.paginas_miolo if miolo else registro.paginas
+
+        gramatura = None
+        if miolo:
+            if quantidade_paginas is None:
+                quantidade_paginas = 0
+            gramatura = candidata.gramatura_catalogo
+            if gramatura is None:
+                gramatura = candidata.gramatura_miolo
+
+        return {
+            'id': componente.id_componente,
+            'descricao': componente.descricao,
+            'altura': valor(candidata.altura),
+            'largura': valor(candidata.largura),
+            'quantidade_paginas': valor(quantidade_paginas),
+            'gramaturasubstratoimpressao': valor(gramatura),
+            'corfrente': candidata.corfrente,
+            'corverso': candidata.corverso,
+            'perguntas_componente': list(
+                por_componente.get((candidata.candidata_especificacao_id, componente.id_componente), [])
+            )
+        }
+
+    @staticmethod
+    def _montar_lote(
+        db: Session, catalogo: CatalogoBremen, linhas: List[Any], como_texto: bool
+    ) -> Iterator[Union[Dict[str, Any], str]]:
+        """
+        Monta os orçamentos de um lote de unidades completas
+
+        As respostas e páginas são buscadas pelas especificações encontradas
+        nas linhas do lote.
+
+        Yields:
+            Orçamento de uma unidade/tipo de agrupamento, na ordem das linhas
+        """
+        valor = _valor_bruto if como_texto else _valor_json
+
+        # Agrupar linhas por item, mantendo a ordem da query
+        itens: List[Tuple[Any, List[Any]]] = []
+        produto_da_especificacao: Dict[int, int] = {}
+        for linha in linhas:
+            if not itens or itens[-1][0].item_id != linha.item_id:
+                itens.append((linha, []))
+            if linha.candidata_especificacao_id is not None:
+                itens[-1][1].append(linha)
+                produto_da_especificacao[linha.candidata_especificacao_id] = linha.candidata_id_produto
+
+        por_componente, gerais = OrcamentoMontagemService._buscar_respostas(db, catalogo, produto_da_especificacao)
+
+        componentes_por_item = [
+            OrcamentoMontagemService._escolher_componentes(catalogo, candidatas, por_componente)
+            for _, candidatas in itens
+        ]
+        paginas = OrcamentoMontagemService._buscar_paginas(
+            db, [par for componentes in componentes_por_item for par in componentes]
+        )
+
+        orcamento = None
+        grupo = None
+        for (linha, _), componentes in zip(itens, componentes_por_item):
+            if (linha.unidade_id, linha.tipo_agrupamento) != grupo:
+                if orcamento is not None:
+                    yield _json_pg(orcamento) if como_texto else orcamento
+                grupo = (linha.unidade_id, linha.tipo_agrupamento)
+                orcamento = {
+                    'identifier': 'PageFlow',
+                    'data': {
+                        'id_cliente': linha.cliente_id,
+                        'id_vendedor': 2285,
+                        'id_forma_pagamento': '11',
+                        'itens': []
+                    }
+                }
+
+            orcamento['data']['itens'].append({
+                'id_produto': linha.id_produto,
+                'descricao': linha.nome_arquivo,
+                'quantidade': valor(linha.quantidade_total),
+                'usar_listapreco': 1,
+                'manter_estrutura_mod_produto': 1,
+                'distribuicao_material_ids': _ArrayPg(linha.distribuicao_material_ids),
+                'componentes': [
+                    OrcamentoMontagemService._montar_componente(candidata, componente, paginas, por_componente, valor)
+                    for candidata, componente in componentes
+                ],
+                'perguntas_gerais': list(gerais.get((linha.especificacao_id, linha.id_produto), []))
+            })
+
+        if orcamento is not None:
+            yield _json_pg(orcamento) if como_texto else orcamento
+
+    @staticmethod
+    def iterar_orcamentos(
+        db: Session, parametros: Dict[str, Any], como_texto: bool = False
+    ) -> Iterator[Union[Dict[str, Any], str]]:
+        """
+        Monta os orçamentos a partir das linhas planas
+
+        As linhas são lidas por um cursor no servidor (TAMANHO_LOTE_LINHAS por
+        vez) e montadas em lotes de UNIDADES_POR_LOTE unidades completas: a
+        memória não cresce com a quantidade de unidades.
+
+        Args:
+            db: Sessão do banco de dados (deve permanecer aberta durante a iteração)
+            parametros: Parâmetros de OrcamentoService._montar_parametros
+            como_texto: Entrega cada orçamento como texto JSON, idêntico ao da query v2
+
+        Yields:
+            Orçamento de uma unidade/tipo de agrupamento, na ordem da query v2
+        """
+        catalogo = CatalogoBremenService.obter(db)
+        result = db.execute(
+            QUERY_LINHAS_ORCAMENTO,
+            parametros,
+            execution_options={"yield_per": OrcamentoMontagemService.TAMANHO_LOTE_LINHAS}
+        )
+
+        # As linhas vêm ordenadas por unidade: um lote só fecha entre unidades
+        lote: List[Any] = []
+        unidades = 0
+        for linha in result:
+            if not lote or lote[-1].unidade_id != linha.unidade_id:
+                if unidades == OrcamentoMontagemService.UNIDADES_POR_LOTE:
+                    yield from OrcamentoMontagemService._montar_lote(db, catalogo, lote, como_texto)
+                    lote = []
+                    unidades = 0
+                unidades += 1
+            lote.append(linha)
+
+        if lote:
+            yield from OrcamentoMontagemService._montar_lote(db, catalogo, lote, como_texto)
+
+    @staticmethod
+    def gerar_orcamentos(
+        db: Session, parametros: Dict[str, Any], como_texto: bool = False
+    ) -> List[Union[Dict[str, Any], str]]:
+        """
+        Gera todos os orçamentos (ver iterar_orcamentos)
+
+        Returns:
+            Lista de orçamentos (dict, ou texto JSON com como_texto)
+        """
+        return list(OrcamentoMontagemService.iterar_orcamentos(db, parametros, como_texto))
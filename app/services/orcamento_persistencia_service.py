@@ -0,0 +1,222 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from datetime import date
+from typing import Dict, Any, List, Optional
+import json
+from ..config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Grava todos os orçamentos de uma requisição em um único comando: o JSON
+# é desmembrado no servidor (orçamento -> item -> distribuição) e cada
+# distribuição recebe os itens em que aparece. Linhas já enviadas ao
+# DeskFlow (id_orcamento preenchido) não são alteradas e são contadas como
+# preservadas; ids sem distribuição (removida) ou sem unidade escolar não
+# são gravados e voltam em nao_encontrados.
+QUERY_PERSISTIR = text("""
+    WITH itens AS (
+        SELECT
+            CAST(d.id AS integer) AS distribuicao_material_id,
+            i.item,
+            o.posicao,
+            i.posicao_item
+        FROM jsonb_array_elements(CAST(:orcamentos AS jsonb)) WITH ORDINALITY AS o(orcamento, posicao)
+        CROSS JOIN LATERAL jsonb_array_elements(o.orcamento->'data'->'itens') WITH ORDINALITY AS i(item, posicao_item)
+        CROSS JOIN LATERAL jsonb_array_elements_text(i.item->'distribuicao_material_ids') AS d(id)
+    ),
+
+    por_distribuicao AS (
+        SELECT
+            distribuicao_material_id,
+            jsonb_agg(item ORDER BY posicao, posicao_item) AS itens
+        FROM itens
+        GROUP BY distribuicao_material_id
+    ),
+
+    validas AS (
+        SELECT
+            pd.distribuicao_material_id,
+            pd.itens,
+            ue.escola_id,
+            dm.unidade_escolar_id,
+            dm.data_saida
+        FROM por_distribuicao pd
+        JOIN distribuicao_materiais dm ON dm.id = pd.distribuicao_material_id
+        JOIN unidades_escolares ue ON ue.id = dm.unidade_escolar_id
+    ),
+
+    gravadas AS (
+        INSERT INTO orcamento_api (
+            distribuicao_material_id, itens, escola_id, unidade_escolar_id, data_saida, atualizado_em
+        )
+        SELECT
+            v.distribuicao_material_id,
+            v.itens,
+            v.escola_id,
+            v.unidade_escolar_id,
+            v.data_saida,
+            now()
+        FROM validas v
+        ON CONFLICT (distribuicao_material_id) DO UPDATE
+        SET itens = EXCLUDED.itens,
+            escola_id = EXCLUDED.escola_id,
+            unidade_escolar_id = EXCLUDED.unidade_escolar_id,
+            data_saida = EXCLUDED.data_saida,
+            atualizado_em = EXCLUDED.atualizado_em
+        WHERE orcamento_api.id_orcamento IS NULL
+        RETURNING distribuicao_material_id, (xmax = 0) AS inserido
+    )
+
+    SELECT
+        (SELECT COUNT(*) FROM gravadas WHERE inserido) AS inseridos,
+        (SELECT COUNT(*) FROM gravadas WHERE NOT inserido) AS atualizados,
+        (
+            SELECT COUNT(*)
+            FROM validas v
+            WHERE NOT EXISTS (
+                SELECT 1 FROM gravadas g WHERE g.distribuicao_material_id = v.distribuicao_material_id
+            )
+        ) AS preservados,
+        (
+            SELECT COALESCE(array_agg(pd.distribuicao_material_id ORDER BY pd.distribuicao_material_id), '{}')
+            FROM por_distribuicao pd
+            WHERE NOT EXISTS (
+                SELECT 1 FROM validas v WHERE v.distribuicao_material_id = pd.distribuicao_material_id
+            )
+        ) AS nao_encontrados
+""")
+
+# Filtros comuns à página e à contagem dos orçamentos persistidos
+_FILTROS_CONSULTA = """
+    WHERE oa.escola_id = :escola_id
+      AND (CAST(:datas_saida AS date[]) IS NULL OR oa.data_saida = ANY(CAST(:datas_saida AS date[])))
+      AND (CAST(:unidade_escolar_id AS integer) IS NULL OR oa.unidade_escolar_id = :unidade_escolar_id)
+"""
+
+QUERY_CONSULTAR = text("""
+    SELECT
+        oa.id,
+        oa.distribuicao_material_id,
+        oa.escola_id,
+        oa.unidade_escolar_id,
+        oa.data_saida,
+        oa.id_orcamento,
+        oa.itens,
+        oa.criado_em,
+        oa.atualizado_em
+    FROM orcamento_api oa""" + _FILTROS_CONSULTA + """
+    ORDER BY oa.unidade_escolar_id, oa.data_saida, oa.distribuicao_material_id
+    LIMIT :limite OFFSET :offset
+""")
+
+QUERY_CONTAR = text("""
+    SELECT COUNT(*)
+    FROM orcamento_api oa""" + _FILTROS_CONSULTA)
+
+
+class OrcamentoPersistenciaService:
+    """Persistência dos orçamentos gerados na tabela orcamento_api"""
+
+    @staticmethod
+    def persistir(db: Session, orcamentos: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Grava os orçamentos em orcamento_api (uma linha por distribuição)
+
+        Args:
+            db: Sessão do banco de dados
+            orcamentos: Orçamentos gerados (formato de OrcamentoResponse)
+
+        Returns:
+            Dicionário com as contagens inseridos, atualizados e preservados
+            (já enviados ao DeskFlow) e a lista nao_encontrados (ids de
+            distribuições removidas ou sem unidade escolar)
+        """
+        return OrcamentoPersistenciaService.persistir_json(
+            db, json.dumps(orcamentos, ensure_ascii=False, default=str)
+        )
+
+    @staticmethod
+    def persistir_json(db: Session, orcamentos_json: str) -> Dict[str, Any]:
+        """
+        Grava os orçamentos, já serializados como um array JSON, em orcamento_api
+
+        Todos os orçamentos vão em um único INSERT ... ON CONFLICT; o commit
+        fica a cargo de quem chamou.
+
+        Args:
+            db: Sessão do banco de dados
+            orcamentos_json: Array JSON de orçamentos (formato de OrcamentoResponse)
+
+        Returns:
+            Dicionário com as contagens inseridos, atualizados e preservados
+            (já enviados ao DeskFlow) e a lista nao_encontrados (ids de
+            distribuições removidas ou sem unidade escolar)
+        """
+        linha = db.execute(QUERY_PERSISTIR, {"orcamentos": orcamentos_json}).one()
+        resultado = {
+            "inseridos": linha.inseridos,
+            "atualizados": linha.atualizados,
+            "preservados": linha.preservados,
+            "nao_encontrados": list(linha.nao_encontrados),
+        }
+        if resultado["nao_encontrados"]:
+            logger.warning(f"Distribuições não encontradas, não persistidas: {resultado['nao_encontrados']}")
+        logger.info(f"Orçamentos persistidos em orcamento_api: {resultado}")
+        return resultado
+
+    @staticmethod
+    def consultar(
+        db: Session,
+        escola_id: int,
+        datas_saida: Optional[List[date]] = None,
+        unidade_escolar_id: Optional[int] = None,
+        limite: int = 500,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Consulta os orçamentos persistidos de uma escola
+
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            datas_saida: Datas de saída (opcional)
+            unidade_escolar_id: ID da unidade escolar (opcional)
+            limite: Quantidade máxima de registros
+            offset: Registros a pular (paginação)
+
+        Returns:
+            Lista de registros de orcamento_api
+        """
+        resultado = db.execute(QUERY_CONSULTAR, {
+            "escola_id": escola_id,
+            "datas_saida": datas_saida or None,
+            "unidade_escolar_id": unidade_escolar_id,
+            "limite": limite,
+            "offset": offset,
+        })
+        return [dict(linha._mapping) for linha in resultado]
+
+    @staticmethod
+    def contar(
+        db: Session,
+        escola_id: int,
+        datas_saida: Optional[List[date]] = None,
+        unidade_escolar_id: Optional[int] = None
+    ) -> int:
+        """
+        Conta os orçamentos persistidos com os mesmos filtros de consultar
+
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            datas_saida: Datas de saída (opcional)
+            unidade_escolar_id: ID da unidade escolar (opcional)
+
+        Returns:
+            Quantidade de registros de orcamento_api
+        """
+        return db.execute(QUERY_CONTAR, {
+            "escola_id": escola_id,
+            "datas_saida": datas_saida or None,
+            "unidade_escolar_id": unidade_escolar_id,
+        }).scalar_one()
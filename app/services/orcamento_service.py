@@ -1,17 +1,864 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import text, bindparam
 from sqlalchemy.dialects.postgresql import ARRAY, INTEGER, DATE
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterator, Optional
 from datetime import date
 import json
 from ..config.logging_config import get_logger
+from ..config.settings import get_settings
 
 logger = get_logger(__name__)
 
+# Query de geração de orçamentos: um registro (JSON) por unidade/tipo de agrupamento
+QUERY_ORCAMENTO = text("""
+    WITH parametros AS (
+        SELECT
+            :escola_id AS escola_id,                 
+            CAST(:ids_produtos AS int[]) AS ids_produtos, 
+            CAST(:datas_saida AS date[]) AS datas_saida,
+            
+            -- DEFININDO COMO NULL PARA NÃO FILTRAR (se não fornecido)
+            CAST(:divisoes_logistica AS text[]) AS divisoes_logistica, 
+            
+            -- DEFININDO COMO NULL PARA NÃO FILTRAR (se não fornecido)
+            CAST(:dias_uteis_filtro AS int[]) AS dias_uteis_filtro,
+            
+            -- DEFININDO COMO NULL PARA NÃO FILTRAR (modo incremental)
+            CAST(:unidades_ids AS int[]) AS unidades_ids
+    ),
+
+
+    unidades_filtradas AS (
+        SELECT
+            ue.id,
+            ue.cliente_id, 
+            ue.forma_pagamento,
+            ue.escola_id
+        FROM unidades_escolares ue
+        CROSS JOIN parametros p
+        WHERE ue.escola_id = p.escola_id
+        
+        -- LÓGICA: Se o parametro for NULL, ignora o filtro e traz tudo (inclusive quem tem NULL no banco)
+        AND (
+            p.divisoes_logistica IS NULL 
+            OR ue.divisao_logistica = ANY(p.divisoes_logistica)
+        )
+        
+        AND (
+            p.dias_uteis_filtro IS NULL 
+            OR ue.dias_uteis = ANY(p.dias_uteis_filtro)
+        )
+        
+        AND (
+            p.unidades_ids IS NULL 
+            OR ue.id = ANY(p.unidades_ids)
+        )
+    ),
+
+    especificacoes_unidade AS (
+        SELECT DISTINCT
+            uf.id AS unidade_id,
+            uf.cliente_id,
+            ef.id AS especificacao_id,
+            ef.id_produto,
+            ef.corfrente,
+            ef.corverso,
+            COALESCE(bt.altura, ef.altura_num) AS altura_mm,
+            COALESCE(bt.largura, ef.largura_num) AS largura_mm,
+            ef.gramatura_miolo_num AS gramatura_miolo,
+            bg.gramatura AS gramatura_catalogo,
+            bg.unidade_medida AS unidade_gramatura,
+            dm.quantidade,
+            dm.data_saida,
+            ap.pares,
+            ap.formulario_id,
+            ap.nome AS arquivo_nome,
+            ap.tipo_arquivo,
+            ap.id_componente,
+            ap.paginas, 
+            bi.frente_verso,
+            bi."categoria_Prod"
+        FROM unidades_filtradas uf
+        CROSS JOIN parametros p
+        JOIN distribuicao_materiais dm ON dm.unidade_escolar_id = uf.id
+        JOIN especificacoes_form ef ON ef.id = dm.especificacao_form_id
+        LEFT JOIN bremen_gramatura bg ON bg.id = ef.id_gramatura
+        LEFT JOIN bremen_tamanho_papel bt ON bt.id = ef.id_papel
+        LEFT JOIN arquivo_pdfs ap ON ap.item_pedido_id = ef.id
+        LEFT JOIN bremen_itens bi ON bi.id_produto = ef.id_produto 
+        WHERE dm.quantidade > 0
+            AND (p.ids_produtos IS NULL OR ef.id_produto = ANY(p.ids_produtos))
+            AND (
+                p.datas_saida IS NULL
+                OR dm.data_saida = ANY(p.datas_saida)
+                OR dm.data_saida IS NULL
+            ) AND dm.status_distribuicao = 'pendente'
+    ),
+    distribuicao_ids AS (
+        SELECT DISTINCT
+            uf.id AS unidade_id,
+            dm.id AS distribuicao_material_id,
+            ef.id AS especificacao_id,
+            COALESCE(ap.pares::text, ef.id::text) AS chave_agrupamento,
+            ap.pares,
+            ap.formulario_id
+        FROM unidades_filtradas uf
+        CROSS JOIN parametros p
+        JOIN distribuicao_materiais dm ON dm.unidade_escolar_id = uf.id
+        JOIN especificacoes_form ef ON ef.id = dm.especificacao_form_id
+        LEFT JOIN arquivo_pdfs ap ON ap.item_pedido_id = ef.id
+        WHERE dm.quantidade > 0
+            AND (p.ids_produtos IS NULL OR ef.id_produto = ANY(p.ids_produtos))
+            AND (
+                p.datas_saida IS NULL
+                OR dm.data_saida = ANY(p.datas_saida)
+                OR dm.data_saida IS NULL
+            ) AND dm.status_distribuicao = 'pendente'
+    ),
+
+    itens_produto AS (
+        SELECT
+            eu.unidade_id,
+            eu.cliente_id, 
+            COALESCE(eu.pares::text, eu.especificacao_id::text) AS chave_agrupamento,
+            eu.pares,
+            eu.formulario_id,
+            MAX(eu.especificacao_id) AS especificacao_id,
+            MAX(eu.id_produto) AS id_produto,
+            ARRAY_AGG(DISTINCT di.distribuicao_material_id) FILTER (WHERE di.distribuicao_material_id IS NOT NULL) AS distribuicao_material_ids,
+            (
+                UPPER(
+                    TRIM(
+                        REGEXP_REPLACE(
+                            REGEXP_REPLACE(
+                                COALESCE(
+                                    MAX(CASE WHEN LOWER(eu.tipo_arquivo) = 'capa' THEN eu.arquivo_nome END),
+                                    MAX(CASE WHEN LOWER(eu.tipo_arquivo) = 'miolo' THEN eu.arquivo_nome END),
+                                    MAX(eu.arquivo_nome)
+                                ),
+                                '\.pdf$', '', 'i' 
+                            ),
+                            '[_-]+', ' ', 'g'
+                        )
+                    )
+                ) || ' (#' || MAX(form.id) || ')'
+            ) AS nome_arquivo,
+            MAX(eu.altura_mm) AS altura,
+            MAX(eu.largura_mm) AS largura,
+            MAX(eu.gramatura_miolo) AS gramatura_miolo,
+            MAX(eu.quantidade) AS quantidade_total,
+            
+            CASE
+                WHEN (MAX(eu.paginas) > 2 AND UPPER(MAX(eu.frente_verso)) = 'FV' AND UPPER(MAX(eu."categoria_Prod")) = 'PROVA')
+                  OR (MAX(eu.paginas) > 1 AND UPPER(MAX(eu.frente_verso)) = 'SF' AND UPPER(MAX(eu."categoria_Prod")) = 'PROVA')
+                THEN 'normal'
+                ELSE 'separado'
+            END AS tipo_agrupamento
+
+        FROM especificacoes_unidade eu
+        JOIN formularios form ON form.id = eu.formulario_id
+        LEFT JOIN distribuicao_ids di ON di.unidade_id = eu.unidade_id 
+            AND di.chave_agrupamento = COALESCE(eu.pares::text, eu.especificacao_id::text)
+        GROUP BY
+            eu.unidade_id, 
+            eu.cliente_id, 
+            COALESCE(eu.pares::text, eu.especificacao_id::text),
+            eu.pares,
+            eu.formulario_id
+    ),
+
+    itens AS (
+        SELECT DISTINCT
+            eu.pares,
+            eu.formulario_id,
+            eu.especificacao_id,
+            eu.id_produto,
+            eu.corfrente,
+            eu.corverso,
+            bi.descricao,
+            eu.altura_mm,
+            eu.largura_mm,
+            eu.gramatura_miolo,
+            eu.gramatura_catalogo,
+            eu.unidade_gramatura
+        FROM especificacoes_unidade eu
+        JOIN bremen_itens bi ON bi.id_produto = eu.id_produto
+    ),
+
+    componentes AS (
+        SELECT DISTINCT
+            i.pares,
+            i.formulario_id,
+            i.especificacao_id,
+            i.id_produto,
+            i.corfrente,
+            i.corverso,
+            bc.id AS componente_id,
+            bc.id_componente,
+            bc.descricao,
+            ROUND(i.altura_mm::numeric / 10, 2) AS altura,
+            ROUND(i.largura_mm::numeric / 10, 2) AS largura,
+            i.gramatura_miolo,
+            i.gramatura_catalogo,
+            CASE
+                WHEN LOWER(COALESCE(bc.descricao, '')) LIKE '%%capa%%' THEN 1
+                WHEN LOWER(COALESCE(bc.descricao, '')) LIKE '%%miolo%%' THEN
+                    CASE WHEN i.pares IS NOT NULL THEN pag_par.paginas_miolo ELSE pag_item.paginas_miolo END
+                ELSE
+                    CASE WHEN i.pares IS NOT NULL THEN pag_par.paginas ELSE pag_item.paginas END
+            END AS quantidade_paginas
+        FROM itens i
+        JOIN bremen_componentes bc ON bc.id_produto = i.id_produto
+        -- Páginas do PDF mais recente do componente (mantido por trigger, ver migrations/001)
+        LEFT JOIN arquivo_pdfs_paginas_par pag_par
+            ON i.pares IS NOT NULL
+           AND pag_par.id_componente = bc.id_componente
+           AND pag_par.pares = i.pares
+           AND pag_par.formulario_id = i.formulario_id
+        LEFT JOIN arquivo_pdfs_paginas_item pag_item
+            ON i.pares IS NULL
+           AND pag_item.id_componente = bc.id_componente
+           AND pag_item.item_pedido_id = i.especificacao_id
+        LEFT JOIN arquivo_pdfs ap_sel
+            ON ap_sel.item_pedido_id = i.especificacao_id
+           AND ap_sel.id_componente = bc.id_componente
+           AND (
+                (i.pares IS NOT NULL AND ap_sel.pares = i.pares AND ap_sel.formulario_id = i.formulario_id)
+                OR (i.pares IS NULL AND ap_sel.pares IS NULL AND (ap_sel.formulario_id = i.formulario_id OR ap_sel.formulario_id IS NULL))
+           )
+    ),
+
+    respostas_componentes AS (
+        SELECT DISTINCT ON (c.especificacao_id, c.id_componente, bp.id)
+            c.pares,
+            c.formulario_id,
+            c.especificacao_id,
+            c.id_produto,
+            c.id_componente,
+            bp.id AS pergunta_id,
+            br.descricao_opcao  AS resposta
+        FROM componentes c
+        JOIN bremen_perguntas bp ON bp.id_componente = c.id_componente
+        LEFT JOIN bremen_especificacao_detalhes bed
+            ON bed.pergunta_id = bp.id
+            AND bed.especificacao_id = c.especificacao_id
+        LEFT JOIN bremen_respostas br ON br.id = bed.resposta_id
+        WHERE br.valor IS NOT NULL
+        ORDER BY c.especificacao_id, c.id_componente, bp.id
+    ),
+
+    respostas_gerais AS (
+        SELECT DISTINCT ON (i.especificacao_id, bp.id)
+            i.pares,
+            i.formulario_id,
+            i.especificacao_id,
+            i.id_produto,
+            bp.id AS pergunta_id,
+            br.descricao_opcao  AS resposta
+        FROM itens i
+        JOIN bremen_perguntas bp ON bp.id_geral = i.id_produto
+        LEFT JOIN bremen_especificacao_detalhes bed
+            ON bed.pergunta_id = bp.id
+            AND bed.especificacao_id = i.especificacao_id
+        LEFT JOIN bremen_respostas br ON br.id = bed.resposta_id
+        WHERE br.valor IS NOT NULL
+        ORDER BY i.especificacao_id, bp.id
+    )
+
+    SELECT json_build_object(
+        'identifier', 'PageFlow',
+        'data', json_build_object(
+        
+            'id_cliente', ip.cliente_id, 
+            'id_vendedor', 2285,
+            'id_forma_pagamento', '11',
+            
+            'itens', COALESCE(
+                json_agg(
+                    json_build_object(
+                        'id_produto', ip.id_produto,
+                        'descricao', ip.nome_arquivo,
+                        'quantidade', ip.quantidade_total,
+                        'usar_listapreco', 1,
+                        'manter_estrutura_mod_produto', 1,
+                        'distribuicao_material_ids', COALESCE(ip.distribuicao_material_ids, ARRAY[]::integer[]),
+                        'componentes', COALESCE((
+                            SELECT json_agg(
+                                CASE
+                                    WHEN LOWER(COALESCE(comp_sel.descricao, '')) LIKE '%%miolo%%' THEN
+                                        json_build_object(
+                                            'id', comp_sel.id_componente,
+                                            'descricao', comp_sel.descricao,
+                                            'altura', comp_sel.altura,
+                                            'largura', comp_sel.largura,
+                                            'quantidade_paginas', COALESCE(comp_sel.quantidade_paginas, 0),
+                                            
+                                            'gramaturasubstratoimpressao', COALESCE(comp_sel.gramatura_catalogo, comp_sel.gramatura_miolo),
+                                            'corfrente', CAST(comp_sel.corfrente AS TEXT),
+                                            'corverso', CAST(comp_sel.corverso AS TEXT),
+
+                                            'perguntas_componente', COALESCE((
+                                                SELECT json_agg(
+                                                    json_build_object(
+                                                        'id_pergunta', bp.id_pergunta,
+                                                        'pergunta', bp.nome,
+                                                        'tipo', bp.tipo,
+                                                        'resposta', rc.resposta
+                                                    )
+                                                    ORDER BY bp.id_pergunta
+                                                )
+                                                FROM bremen_perguntas bp
+                                                INNER JOIN respostas_componentes rc
+                                                    ON rc.pergunta_id = bp.id
+                                                    AND rc.id_componente = comp_sel.id_componente
+                                                    AND rc.especificacao_id = comp_sel.especificacao_id
+                                                WHERE bp.id_componente = comp_sel.id_componente
+                                            ), '[]'::json)
+                                        )
+                                    ELSE
+                                        json_build_object(
+                                            'id', comp_sel.id_componente,
+                                            'descricao', comp_sel.descricao,
+                                            'altura', comp_sel.altura,
+                                            'largura', comp_sel.largura,
+                                            'quantidade_paginas', comp_sel.quantidade_paginas,
+                                            
+                                            'gramaturasubstratoimpressao', CASE
+                                                    WHEN LOWER(COALESCE(comp_sel.descricao, '')) LIKE '%%miolo%%' THEN 
+                                                        COALESCE(comp_sel.gramatura_catalogo, comp_sel.gramatura_miolo)
+                                                    ELSE NULL
+                                            END,
+                                            'corfrente', CAST(comp_sel.corfrente AS TEXT),
+                                            'corverso', CAST(comp_sel.corverso AS TEXT),
+                                            
+                                            'perguntas_componente', COALESCE((
+                                                SELECT json_agg(
+                                                    json_build_object(
+                                                        'id_pergunta', bp.id_pergunta,
+                                                        'pergunta', bp.nome,
+                                                        'tipo', bp.tipo,
+                                                        'resposta', rc.resposta
+                                                    )
+                                                    ORDER BY bp.id_pergunta
+                                                )
+                                                FROM bremen_perguntas bp
+                                                INNER JOIN respostas_componentes rc
+                                                    ON rc.pergunta_id = bp.id
+                                                    AND rc.id_componente = comp_sel.id_componente
+                                                    AND rc.especificacao_id = comp_sel.especificacao_id
+                                                WHERE bp.id_componente = comp_sel.id_componente
+                                            ), '[]'::json)
+                                        )
+                                END
+                            )
+                            FROM (
+                                SELECT DISTINCT ON (comp.id_componente)
+                                    comp.componente_id, 
+                                    comp.id_componente, 
+                                    comp.descricao, 
+                                    comp.altura, 
+                                    comp.largura, 
+                                    comp.gramatura_miolo, 
+                                    comp.gramatura_catalogo, 
+                                    comp.quantidade_paginas, 
+                                    comp.especificacao_id,
+                                    comp.corfrente,
+                                    comp.corverso
+                                FROM componentes comp
+                                WHERE (
+                                    (ip.pares IS NOT NULL AND comp.pares = ip.pares AND comp.formulario_id = ip.formulario_id)
+                                    OR (ip.pares IS NULL AND comp.especificacao_id = ip.especificacao_id)
+                                )
+                                ORDER BY comp.id_componente,
+                                    CASE WHEN EXISTS (SELECT 1 FROM respostas_componentes rc_pref WHERE rc_pref.id_componente = comp.id_componente AND rc_pref.especificacao_id = comp.especificacao_id) THEN 0 ELSE 1 END,
+                                    comp.especificacao_id
+                            ) comp_sel
+                        ), '[]'::json),
+                        'perguntas_gerais', COALESCE((
+                            SELECT json_agg(
+                                json_build_object(
+                                  'tipo', bp.tipo,
+                                  'pergunta', bp.nome,
+                                  'resposta', rg.resposta,
+                                  'id_pergunta', bp.id_pergunta
+                                )
+                            )
+                            FROM bremen_perguntas bp
+                            INNER JOIN respostas_gerais rg ON rg.pergunta_id = bp.id AND rg.especificacao_id = ip.especificacao_id
+                            WHERE bp.id_geral = ip.id_produto
+                        ), '[]'::json)
+                    )
+                    ORDER BY ip.chave_agrupamento
+                ), '[]'::json
+            )
+        )
+    ) as orcamento,
+    ip.unidade_id,
+    ip.tipo_agrupamento
+    FROM itens_produto ip
+    GROUP BY ip.unidade_id, ip.cliente_id, ip.tipo_agrupamento
+    ORDER BY ip.unidade_id, ip.tipo_agrupamento DESC;
+""")
+
+# Query de orçamento v2: mesmo resultado da v1, com o join base calculado uma
+# única vez e o JSON montado por CTEs agregadas (sem json_agg correlacionado).
+# Dividida em CTEs + SELECT final para que as CTEs possam ser reaproveitadas.
+CTES_ORCAMENTO_V2 = """
+    WITH parametros AS (
+        SELECT
+            :escola_id AS escola_id,
+            CAST(:ids_produtos AS int[]) AS ids_produtos,
+            CAST(:datas_saida AS date[]) AS datas_saida,
+            CAST(:divisoes_logistica AS text[]) AS divisoes_logistica,
+            CAST(:dias_uteis_filtro AS int[]) AS dias_uteis_filtro,
+            CAST(:unidades_ids AS int[]) AS unidades_ids
+    ),
+
+    unidades_filtradas AS (
+        SELECT
+            ue.id,
+            ue.cliente_id
+        FROM unidades_escolares ue
+        CROSS JOIN parametros p
+        WHERE ue.escola_id = p.escola_id
+          AND (p.divisoes_logistica IS NULL OR ue.divisao_logistica = ANY(p.divisoes_logistica))
+          AND (p.dias_uteis_filtro IS NULL OR ue.dias_uteis = ANY(p.dias_uteis_filtro))
+          AND (p.unidades_ids IS NULL OR ue.id = ANY(p.unidades_ids))
+    ),
+
+    -- Join base (distribuição x especificação x arquivo), usado por todas as etapas
+    base AS (
+        SELECT
+            uf.id AS unidade_id,
+            uf.cliente_id,
+            dm.id AS distribuicao_material_id,
+            dm.quantidade,
+            ef.id AS especificacao_id,
+            ef.id_produto,
+            ef.corfrente,
+            ef.corverso,
+            COALESCE(bt.altura, ef.altura_num) AS altura_mm,
+            COALESCE(bt.largura, ef.largura_num) AS largura_mm,
+            ef.gramatura_miolo_num AS gramatura_miolo,
+            bg.gramatura AS gramatura_catalogo,
+            ap.pares,
+            ap.formulario_id,
+            ap.nome AS arquivo_nome,
+            ap.tipo_arquivo,
+            ap.paginas,
+            COALESCE(ap.pares::text, ef.id::text) AS chave_agrupamento
+        FROM unidades_filtradas uf
+        CROSS JOIN parametros p
+        JOIN distribuicao_materiais dm ON dm.unidade_escolar_id = uf.id
+        JOIN especificacoes_form ef ON ef.id = dm.especificacao_form_id
+        LEFT JOIN bremen_gramatura bg ON bg.id = ef.id_gramatura
+        LEFT JOIN bremen_tamanho_papel bt ON bt.id = ef.id_papel
+        LEFT JOIN arquivo_pdfs ap ON ap.item_pedido_id = ef.id
+        WHERE dm.quantidade > 0
+          AND dm.status_distribuicao = 'pendente'
+          AND (p.ids_produtos IS NULL OR ef.id_produto = ANY(p.ids_produtos))
+          AND (
+              p.datas_saida IS NULL
+              OR dm.data_saida = ANY(p.datas_saida)
+              OR dm.data_saida IS NULL
+          )
+    ),
+
+    distribuicao_ids AS (
+        SELECT
+            b.unidade_id,
+            b.chave_agrupamento,
+            ARRAY_AGG(DISTINCT b.distribuicao_material_id) AS distribuicao_material_ids
+        FROM base b
+        GROUP BY b.unidade_id, b.chave_agrupamento
+    ),
+
+    itens_produto AS (
+        SELECT
+            ROW_NUMBER() OVER (
+                ORDER BY g.unidade_id, g.chave_agrupamento, g.pares, g.formulario_id
+            ) AS item_id,
+            g.*,
+            CASE
+                WHEN (g.paginas > 2 AND UPPER(bi.frente_verso) = 'FV' AND UPPER(bi."categoria_Prod") = 'PROVA')
+                  OR (g.paginas > 1 AND UPPER(bi.frente_verso) = 'SF' AND UPPER(bi."categoria_Prod") = 'PROVA')
+                THEN 'normal'
+                ELSE 'separado'
+            END AS tipo_agrupamento
+        FROM (
+            SELECT
+                b.unidade_id,
+                b.cliente_id,
+                b.chave_agrupamento,
+                b.pares,
+                b.formulario_id,
+                MAX(b.especificacao_id) AS especificacao_id,
+                MAX(b.id_produto) AS id_produto,
+                ARRAY_AGG(DISTINCT b.id_produto) AS ids_produto_grupo,
+                UPPER(
+                    TRIM(
+                        REGEXP_REPLACE(
+                            REGEXP_REPLACE(
+                                COALESCE(
+                                    MAX(CASE WHEN LOWER(b.tipo_arquivo) = 'capa' THEN b.arquivo_nome END),
+                                    MAX(CASE WHEN LOWER(b.tipo_arquivo) = 'miolo' THEN b.arquivo_nome END),
+                                    MAX(b.arquivo_nome)
+                                ),
+                                '\.pdf$', '', 'i'
+                            ),
+                            '[_-]+', ' ', 'g'
+                        )
+                    )
+                ) || ' (#' || b.formulario_id || ')' AS nome_arquivo,
+                MAX(b.quantidade) AS quantidade_total,
+                MAX(b.paginas) AS paginas
+            FROM base b
+            JOIN formularios form ON form.id = b.formulario_id
+            GROUP BY b.unidade_id, b.cliente_id, b.chave_agrupamento, b.pares, b.formulario_id
+        ) g
+        LEFT JOIN LATERAL (
+            SELECT
+                MAX(bi.frente_verso) AS frente_verso,
+                MAX(bi."categoria_Prod") AS "categoria_Prod"
+            FROM bremen_itens bi
+            WHERE bi.id_produto = ANY(g.ids_produto_grupo)
+        ) bi ON true
+    ),
+
+    itens AS (
+        SELECT DISTINCT
+            b.pares,
+            b.formulario_id,
+            b.especificacao_id,
+            b.id_produto,
+            b.corfrente,
+            b.corverso,
+            b.altura_mm,
+            b.largura_mm,
+            b.gramatura_miolo,
+            b.gramatura_catalogo
+        FROM base b
+        WHERE EXISTS (SELECT 1 FROM bremen_itens bi WHERE bi.id_produto = b.id_produto)
+    ),
+
+    componentes AS (
+        SELECT DISTINCT
+            i.pares,
+            i.formulario_id,
+            i.especificacao_id,
+            i.id_produto,
+            i.corfrente,
+            i.corverso,
+            bc.id AS componente_id,
+            bc.id_componente,
+            bc.descricao,
+            LOWER(COALESCE(bc.descricao, '')) LIKE '%miolo%' AS miolo,
+            ROUND(i.altura_mm::numeric / 10, 2) AS altura,
+            ROUND(i.largura_mm::numeric / 10, 2) AS largura,
+            i.gramatura_miolo,
+            i.gramatura_catalogo,
+            CASE
+                WHEN LOWER(COALESCE(bc.descricao, '')) LIKE '%capa%' THEN 1
+                WHEN LOWER(COALESCE(bc.descricao, '')) LIKE '%miolo%' THEN
+                    CASE WHEN i.pares IS NOT NULL THEN pag_par.paginas_miolo ELSE pag_item.paginas_miolo END
+                ELSE
+                    CASE WHEN i.pares IS NOT NULL THEN pag_par.paginas ELSE pag_item.paginas END
+            END AS quantidade_paginas
+        FROM itens i
+        JOIN bremen_componentes bc ON bc.id_produto = i.id_produto
+        LEFT JOIN arquivo_pdfs_paginas_par pag_par
+            ON i.pares IS NOT NULL
+           AND pag_par.id_componente = bc.id_componente
+           AND pag_par.pares = i.pares
+           AND pag_par.formulario_id = i.formulario_id
+        LEFT JOIN arquivo_pdfs_paginas_item pag_item
+            ON i.pares IS NULL
+           AND pag_item.id_componente = bc.id_componente
+           AND pag_item.item_pedido_id = i.especificacao_id
+    ),
+
+    respostas_componentes AS (
+        SELECT DISTINCT ON (c.especificacao_id, c.id_componente, bp.id)
+            c.especificacao_id,
+            c.id_componente,
+            bp.id AS pergunta_id,
+            bp.id_pergunta,
+            bp.nome,
+            bp.tipo,
+            br.descricao_opcao AS resposta
+        FROM (SELECT DISTINCT especificacao_id, id_componente FROM componentes) c
+        JOIN bremen_perguntas bp ON bp.id_componente = c.id_componente
+        JOIN bremen_especificacao_detalhes bed
+            ON bed.pergunta_id = bp.id
+           AND bed.especificacao_id = c.especificacao_id
+        JOIN bremen_respostas br ON br.id = bed.resposta_id
+        WHERE br.valor IS NOT NULL
+        ORDER BY c.especificacao_id, c.id_componente, bp.id
+    ),
+
+    perguntas_componente AS (
+        SELECT
+            rc.especificacao_id,
+            rc.id_componente,
+            json_agg(
+                json_build_object(
+                    'id_pergunta', rc.id_pergunta,
+                    'pergunta', rc.nome,
+                    'tipo', rc.tipo,
+                    'resposta', rc.resposta
+                )
+                ORDER BY rc.id_pergunta, rc.pergunta_id
+            ) AS perguntas
+        FROM respostas_componentes rc
+        GROUP BY rc.especificacao_id, rc.id_componente
+    ),
+
+    respostas_gerais AS (
+        SELECT DISTINCT ON (i.especificacao_id, bp.id)
+            i.especificacao_id,
+            i.id_produto,
+            bp.id AS pergunta_id,
+            bp.id_pergunta,
+            bp.nome,
+            bp.tipo,
+            br.descricao_opcao AS resposta
+        FROM (SELECT DISTINCT especificacao_id, id_produto FROM itens) i
+        JOIN bremen_perguntas bp ON bp.id_geral = i.id_produto
+        JOIN bremen_especificacao_detalhes bed
+            ON bed.pergunta_id = bp.id
+           AND bed.especificacao_id = i.especificacao_id
+        JOIN bremen_respostas br ON br.id = bed.resposta_id
+        WHERE br.valor IS NOT NULL
+        ORDER BY i.especificacao_id, bp.id
+    ),
+
+    perguntas_gerais AS (
+        SELECT
+            rg.especificacao_id,
+            rg.id_produto,
+            json_agg(
+                json_build_object(
+                    'tipo', rg.tipo,
+                    'pergunta', rg.nome,
+                    'resposta', rg.resposta,
+                    'id_pergunta', rg.id_pergunta
+                )
+                ORDER BY rg.id_pergunta, rg.pergunta_id
+            ) AS perguntas
+        FROM respostas_gerais rg
+        GROUP BY rg.especificacao_id, rg.id_produto
+    ),
+
+    -- Um componente por id_componente em cada item, preferindo a especificação com respostas
+    componentes_item AS (
+        SELECT
+            ci.item_id,
+            ci.especificacao_id,
+            ci.id_componente,
+            ci.descricao,
+            ci.altura,
+            ci.largura,
+            CASE
+                WHEN ci.miolo THEN COALESCE(ci.quantidade_paginas, 0)
+                ELSE ci.quantidade_paginas
+            END AS quantidade_paginas,
+            CASE
+                WHEN ci.miolo THEN COALESCE(ci.gramatura_catalogo, ci.gramatura_miolo)
+            END AS gramaturasubstratoimpressao,
+            CAST(ci.corfrente AS TEXT) AS corfrente,
+            CAST(ci.corverso AS TEXT) AS corverso
+        FROM (
+            SELECT DISTINCT ON (cand.item_id, cand.id_componente)
+                cand.*
+            FROM (
+                SELECT ip.item_id, c.*
+                FROM itens_produto ip
+                JOIN componentes c
+                    ON c.pares = ip.pares
+                   AND c.formulario_id = ip.formulario_id
+                WHERE ip.pares IS NOT NULL
+                UNION ALL
+                SELECT ip.item_id, c.*
+                FROM itens_produto ip
+                JOIN componentes c ON c.especificacao_id = ip.especificacao_id
+                WHERE ip.pares IS NULL
+            ) cand
+            LEFT JOIN (
+                SELECT DISTINCT especificacao_id, id_componente FROM respostas_componentes
+            ) cr
+                ON cr.especificacao_id = cand.especificacao_id
+               AND cr.id_componente = cand.id_componente
+            ORDER BY cand.item_id, cand.id_componente, (cr.especificacao_id IS NULL), cand.especificacao_id, cand.componente_id
+        ) ci
+    ),
+
+    componentes_json AS (
+        SELECT
+            ci.item_id,
+            json_agg(
+                json_build_object(
+                    'id', ci.id_componente,
+                    'descricao', ci.descricao,
+                    'altura', ci.altura,
+                    'largura', ci.largura,
+                    'quantidade_paginas', ci.quantidade_paginas,
+                    'gramaturasubstratoimpressao', ci.gramaturasubstratoimpressao,
+                    'corfrente', ci.corfrente,
+                    'corverso', ci.corverso,
+                    'perguntas_componente', COALESCE(pc.perguntas, '[]'::json)
+                )
+                ORDER BY ci.id_componente
+            ) AS componentes
+        FROM componentes_item ci
+        LEFT JOIN perguntas_componente pc
+            ON pc.especificacao_id = ci.especificacao_id
+           AND pc.id_componente = ci.id_componente
+        GROUP BY ci.item_id
+    )
+"""
+
+SELECT_ORCAMENTO_V2 = """
+    SELECT json_build_object(
+        'identifier', 'PageFlow',
+        'data', json_build_object(
+            'id_cliente', ip.cliente_id,
+            'id_vendedor', 2285,
+            'id_forma_pagamento', '11',
+            'itens', json_agg(
+                json_build_object(
+                    'id_produto', ip.id_produto,
+                    'descricao', ip.nome_arquivo,
+                    'quantidade', ip.quantidade_total,
+                    'usar_listapreco', 1,
+                    'manter_estrutura_mod_produto', 1,
+                    'distribuicao_material_ids', COALESCE(di.distribuicao_material_ids, ARRAY[]::integer[]),
+                    'componentes', COALESCE(cj.componentes, '[]'::json),
+                    'perguntas_gerais', COALESCE(pg.perguntas, '[]'::json)
+                )
+                ORDER BY ip.chave_agrupamento, ip.item_id
+            )
+        )
+    ) AS orcamento,
+    ip.unidade_id,
+    ip.tipo_agrupamento
+    FROM itens_produto ip
+    LEFT JOIN distribuicao_ids di
+        ON di.unidade_id = ip.unidade_id
+       AND di.chave_agrupamento = ip.chave_agrupamento
+    LEFT JOIN componentes_json cj ON cj.item_id = ip.item_id
+    LEFT JOIN perguntas_gerais pg
+        ON pg.especificacao_id = ip.especificacao_id
+       AND pg.id_produto = ip.id_produto
+    GROUP BY ip.unidade_id, ip.cliente_id, ip.tipo_agrupamento
+    ORDER BY ip.unidade_id, ip.tipo_agrupamento DESC
+"""
+
+QUERY_ORCAMENTO_V2 = text(CTES_ORCAMENTO_V2 + SELECT_ORCAMENTO_V2)
+
+QUERIES_ORCAMENTO = {
+    "v1": QUERY_ORCAMENTO,
+    "v2": QUERY_ORCAMENTO_V2,
+}
+
+
+def _query_texto(query):
+    """
+    Variante da query que devolve cada orçamento como texto JSON
+    
+    O driver não decodifica texto: o JSON montado pelo PostgreSQL chega
+    pronto para ser repassado ao cliente (ou gravado) sem virar dict.
+    """
+    return text(
+        "SELECT q.orcamento::text AS orcamento FROM ("
+        + query.text.strip().rstrip(";")
+        + ") AS q ORDER BY q.unidade_id, q.tipo_agrupamento DESC"
+    )
+
+
+QUERIES_ORCAMENTO_TEXTO = {
+    versao: _query_texto(query) for versao, query in QUERIES_ORCAMENTO.items()
+}
+
 
 class OrcamentoService:
     """Service para geração de orçamentos"""
 
+    # Linhas buscadas por vez do cursor no servidor no modo streaming
+    TAMANHO_LOTE_STREAM = 20
+
+    @staticmethod
+    def _montar_parametros(
+        escola_id: int,
+        ids_produtos: List[int],
+        datas_saida: List[date],
+        divisoes_logistica: List[str] = None,
+        dias_uteis_filtro: List[int] = None,
+        unidades_ids: List[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Converte os filtros para os parâmetros vinculados da query de orçamento
+        
+        unidades_ids restringe a geração a algumas unidades (modo incremental).
+        
+        Returns:
+            Dicionário de parâmetros para QUERY_ORCAMENTO
+        """
+        # Converter arrays Python para formato PostgreSQL
+        ids_produtos_str = '{' + ','.join(map(str, ids_produtos)) + '}'
+        datas_saida_str = '{' + ','.join([d.strftime('%Y-%m-%d') if isinstance(d, date) else str(d) for d in datas_saida]) + '}'
+        
+        # Preparar parâmetros opcionais
+        divisoes_logistica_str = None
+        if divisoes_logistica:
+            divisoes_logistica_str = '{' + ','.join([f'"{d}"' for d in divisoes_logistica]) + '}'
+        
+        dias_uteis_filtro_str = None
+        if dias_uteis_filtro:
+            dias_uteis_filtro_str = '{' + ','.join(map(str, dias_uteis_filtro)) + '}'
+        
+        unidades_ids_str = None
+        if unidades_ids is not None:
+            unidades_ids_str = '{' + ','.join(map(str, unidades_ids)) + '}'
+        
+        return {
+            "escola_id": escola_id,
+            "ids_produtos": ids_produtos_str,
+            "datas_saida": datas_saida_str,
+            "divisoes_logistica": divisoes_logistica_str,
+            "dias_uteis_filtro": dias_uteis_filtro_str,
+            "unidades_ids": unidades_ids_str
+        }
+
+    @staticmethod
+    def _obter_query(versao_query: Optional[str] = None, como_texto: bool = False):
+        """
+        Seleciona a versão da query de orçamento
+        
+        Args:
+            versao_query: "v1" ou "v2"; se None usa ORCAMENTO_QUERY_VERSAO
+            como_texto: Usa a variante que devolve o JSON como texto
+            
+        Returns:
+            Query (TextClause) da versão escolhida
+        """
+        versao = versao_query or get_settings().ORCAMENTO_QUERY_VERSAO
+        if versao not in QUERIES_ORCAMENTO:
+            raise ValueError(f"Versão de query de orçamento desconhecida: {versao}")
+        return (QUERIES_ORCAMENTO_TEXTO if como_texto else QUERIES_ORCAMENTO)[versao]
+
+    @staticmethod
+    def _usar_engine_python() -> bool:
+        """
+        Indica se o payload deve ser montado em Python (ORCAMENTO_ENGINE)
+        
+        Returns:
+            True para "python", False para "sql"
+        """
+        engine = get_settings().ORCAMENTO_ENGINE
+        if engine not in ("sql", "python"):
+            raise ValueError(f"Engine de orçamento desconhecida: {engine}")
+        return engine == "python"
+
     @staticmethod
     def gerar_orcamento(
         db: Session, 
@@ -19,7 +866,9 @@ class OrcamentoService:
         ids_produtos: List[int], 
         datas_saida: List[date],
         divisoes_logistica: List[str] = None,
-        dias_uteis_filtro: List[int] = None
+        dias_uteis_filtro: List[int] = None,
+        versao_query: Optional[str] = None,
+        unidades_ids: Optional[List[int]] = None
     ) -> List[Dict[str, Any]]:
         """
         Gera orçamentos separados por unidade escolar
@@ -31,439 +880,140 @@ class OrcamentoService:
             datas_saida: Lista de datas de saída selecionadas
             divisoes_logistica: Lista de divisões logísticas (opcional)
             dias_uteis_filtro: Lista de dias úteis (opcional)
+            versao_query: Versão da query ("v1"/"v2"); padrão da configuração.
+                Ignorada pela engine "python", que usa as CTEs da v2
+            unidades_ids: Gera apenas para estas unidades (opcional)
             
         Returns:
             Lista de orçamentos (um por unidade)
         """
-        logger.info(f"Gerando orçamento para escola_id={escola_id}, produtos={ids_produtos}, datas={datas_saida}, divisoes={divisoes_logistica}, dias_uteis={dias_uteis_filtro}")
+        logger.info(f"Gerando orçamento para escola_id={escola_id}, produtos={ids_produtos}, datas={datas_saida}, divisoes={divisoes_logistica}, dias_uteis={dias_uteis_filtro}, unidades={unidades_ids}")
         
-        # Query SQL atualizada com filtros opcionais
-        query = text("""
-            WITH parametros AS (
-                SELECT
-                    :escola_id AS escola_id,                 
-                    CAST(:ids_produtos AS int[]) AS ids_produtos, 
-                    CAST(:datas_saida AS date[]) AS datas_saida,
-                    
-                    -- DEFININDO COMO NULL PARA NÃO FILTRAR (se não fornecido)
-                    CAST(:divisoes_logistica AS text[]) AS divisoes_logistica, 
-                    
-                    -- DEFININDO COMO NULL PARA NÃO FILTRAR (se não fornecido)
-                    CAST(:dias_uteis_filtro AS int[]) AS dias_uteis_filtro 
-            ),
-
-
-            unidades_filtradas AS (
-                SELECT
-                    ue.id,
-                    ue.cliente_id, 
-                    ue.forma_pagamento,
-                    ue.escola_id
-                FROM unidades_escolares ue
-                CROSS JOIN parametros p
-                WHERE ue.escola_id = p.escola_id
-                
-                -- LÓGICA: Se o parametro for NULL, ignora o filtro e traz tudo (inclusive quem tem NULL no banco)
-                AND (
-                    p.divisoes_logistica IS NULL 
-                    OR ue.divisao_logistica = ANY(p.divisoes_logistica)
-                )
-                
-                AND (
-                    p.dias_uteis_filtro IS NULL 
-                    OR ue.dias_uteis = ANY(p.dias_uteis_filtro)
-                )
-            ),
-
-            especificacoes_unidade AS (
-                SELECT DISTINCT
-                    uf.id AS unidade_id,
-                    uf.cliente_id,
-                    ef.id AS especificacao_id,
-                    ef.id_produto,
-                    ef.corfrente,
-                    ef.corverso,
-                    COALESCE(bt.altura, NULLIF(ef.altura, '')::numeric) AS altura_mm,
-                    COALESCE(bt.largura, NULLIF(ef.largura, '')::numeric) AS largura_mm,
-                    NULLIF(ef.gramatura_miolo, '') AS gramatura_miolo,
-                    bg.gramatura AS gramatura_catalogo,
-                    bg.unidade_medida AS unidade_gramatura,
-                    dm.quantidade,
-                    dm.data_saida,
-                    ap.pares,
-                    ap.formulario_id,
-                    ap.nome AS arquivo_nome,
-                    ap.tipo_arquivo,
-                    ap.id_componente,
-                    ap.paginas, 
-                    bi.frente_verso,
-                    bi."categoria_Prod"
-                FROM unidades_filtradas uf
-                CROSS JOIN parametros p
-                JOIN distribuicao_materiais dm ON dm.unidade_escolar_id = uf.id
-                JOIN especificacoes_form ef ON ef.id = dm.especificacao_form_id
-                LEFT JOIN bremen_gramatura bg ON bg.id = ef.id_gramatura
-                LEFT JOIN bremen_tamanho_papel bt ON bt.id = ef.id_papel
-                LEFT JOIN arquivo_pdfs ap ON ap.item_pedido_id = ef.id
-                LEFT JOIN bremen_itens bi ON bi.id_produto = ef.id_produto 
-                WHERE dm.quantidade > 0
-                    AND (p.ids_produtos IS NULL OR ef.id_produto = ANY(p.ids_produtos))
-                    AND (
-                        p.datas_saida IS NULL
-                        OR NULLIF(dm.data_saida, '')::date = ANY(p.datas_saida)
-                        OR NULLIF(dm.data_saida, '') IS NULL
-                    ) AND dm.status_distribuicao = 'pendente'
-            ),
-            distribuicao_ids AS (
-                SELECT DISTINCT
-                    uf.id AS unidade_id,
-                    dm.id AS distribuicao_material_id,
-                    ef.id AS especificacao_id,
-                    COALESCE(ap.pares::text, ef.id::text) AS chave_agrupamento,
-                    ap.pares,
-                    ap.formulario_id
-                FROM unidades_filtradas uf
-                CROSS JOIN parametros p
-                JOIN distribuicao_materiais dm ON dm.unidade_escolar_id = uf.id
-                JOIN especificacoes_form ef ON ef.id = dm.especificacao_form_id
-                LEFT JOIN arquivo_pdfs ap ON ap.item_pedido_id = ef.id
-                WHERE dm.quantidade > 0
-                    AND (p.ids_produtos IS NULL OR ef.id_produto = ANY(p.ids_produtos))
-                    AND (
-                        p.datas_saida IS NULL
-                        OR NULLIF(dm.data_saida, '')::date = ANY(p.datas_saida)
-                        OR NULLIF(dm.data_saida, '') IS NULL
-                    ) AND dm.status_distribuicao = 'pendente'
-            ),
-
-            itens_produto AS (
-                SELECT
-                    eu.unidade_id,
-                    eu.cliente_id, 
-                    COALESCE(eu.pares::text, eu.especificacao_id::text) AS chave_agrupamento,
-                    eu.pares,
-                    eu.formulario_id,
-                    MAX(eu.especificacao_id) AS especificacao_id,
-                    MAX(eu.id_produto) AS id_produto,
-                    ARRAY_AGG(DISTINCT di.distribuicao_material_id) FILTER (WHERE di.distribuicao_material_id IS NOT NULL) AS distribuicao_material_ids,
-                    (
-                        UPPER(
-                            TRIM(
-                                REGEXP_REPLACE(
-                                    REGEXP_REPLACE(
-                                        COALESCE(
-                                            MAX(CASE WHEN LOWER(eu.tipo_arquivo) = 'capa' THEN eu.arquivo_nome END),
-                                            MAX(CASE WHEN LOWER(eu.tipo_arquivo) = 'miolo' THEN eu.arquivo_nome END),
-                                            MAX(eu.arquivo_nome)
-                                        ),
-                                        '\.pdf$', '', 'i' 
-                                    ),
-                                    '[_-]+', ' ', 'g'
-                                )
-                            )
-                        ) || ' (#' || MAX(form.id) || ')'
-                    ) AS nome_arquivo,
-                    MAX(eu.altura_mm) AS altura,
-                    MAX(eu.largura_mm) AS largura,
-                    MAX(eu.gramatura_miolo) AS gramatura_miolo,
-                    MAX(eu.quantidade) AS quantidade_total,
-                    
-                    CASE
-                        WHEN (MAX(eu.paginas) > 2 AND UPPER(MAX(eu.frente_verso)) = 'FV' AND UPPER(MAX(eu."categoria_Prod")) = 'PROVA')
-                          OR (MAX(eu.paginas) > 1 AND UPPER(MAX(eu.frente_verso)) = 'SF' AND UPPER(MAX(eu."categoria_Prod")) = 'PROVA')
-                        THEN 'normal'
-                        ELSE 'separado'
-                    END AS tipo_agrupamento
-
-                FROM especificacoes_unidade eu
-                JOIN formularios form ON form.id = eu.formulario_id
-                LEFT JOIN distribuicao_ids di ON di.unidade_id = eu.unidade_id 
-                    AND di.chave_agrupamento = COALESCE(eu.pares::text, eu.especificacao_id::text)
-                GROUP BY
-                    eu.unidade_id, 
-                    eu.cliente_id, 
-                    COALESCE(eu.pares::text, eu.especificacao_id::text),
-                    eu.pares,
-                    eu.formulario_id
-            ),
-
-            itens AS (
-                SELECT DISTINCT
-                    eu.pares,
-                    eu.formulario_id,
-                    eu.especificacao_id,
-                    eu.id_produto,
-                    eu.corfrente,
-                    eu.corverso,
-                    bi.descricao,
-                    eu.altura_mm,
-                    eu.largura_mm,
-                    eu.gramatura_miolo,
-                    eu.gramatura_catalogo,
-                    eu.unidade_gramatura
-                FROM especificacoes_unidade eu
-                JOIN bremen_itens bi ON bi.id_produto = eu.id_produto
-            ),
-
-            componentes AS (
-                SELECT DISTINCT
-                    i.pares,
-                    i.formulario_id,
-                    i.especificacao_id,
-                    i.id_produto,
-                    i.corfrente,
-                    i.corverso,
-                    bc.id AS componente_id,
-                    bc.id_componente,
-                    bc.descricao,
-                    ROUND(i.altura_mm::numeric / 10, 2) AS altura,
-                    ROUND(i.largura_mm::numeric / 10, 2) AS largura,
-                    i.gramatura_miolo,
-                    i.gramatura_catalogo,
-                    CASE
-                        WHEN LOWER(COALESCE(bc.descricao, '')) LIKE '%%capa%%' THEN 1
-                        WHEN LOWER(COALESCE(bc.descricao, '')) LIKE '%%miolo%%' THEN (
-                            SELECT COALESCE(ap_pag.paginas, 0)
-                            FROM arquivo_pdfs ap_pag
-                            WHERE ap_pag.id_componente = bc.id_componente
-                              AND LOWER(COALESCE(ap_pag.tipo_arquivo, '')) = 'miolo'
-                              AND (
-                                  (i.pares IS NOT NULL AND ap_pag.pares = i.pares AND ap_pag.formulario_id = i.formulario_id)
-                                  OR (i.pares IS NULL AND ap_pag.item_pedido_id = i.especificacao_id)
-                              )
-                            ORDER BY ap_pag.criado_em DESC
-                            LIMIT 1
-                        )
-                        ELSE (
-                            SELECT ap_pag.paginas
-                            FROM arquivo_pdfs ap_pag
-                            WHERE ap_pag.id_componente = bc.id_componente
-                              AND (
-                                  (i.pares IS NOT NULL AND ap_pag.pares = i.pares AND ap_pag.formulario_id = i.formulario_id)
-                                  OR (i.pares IS NULL AND ap_pag.item_pedido_id = i.especificacao_id)
-                              )
-                            ORDER BY ap_pag.criado_em DESC
-                            LIMIT 1
-                        )
-                    END AS quantidade_paginas
-                FROM itens i
-                JOIN bremen_componentes bc ON bc.id_produto = i.id_produto
-                LEFT JOIN arquivo_pdfs ap_sel
-                    ON ap_sel.item_pedido_id = i.especificacao_id
-                   AND ap_sel.id_componente = bc.id_componente
-                   AND (
-                        (i.pares IS NOT NULL AND ap_sel.pares = i.pares AND ap_sel.formulario_id = i.formulario_id)
-                        OR (i.pares IS NULL AND ap_sel.pares IS NULL AND (ap_sel.formulario_id = i.formulario_id OR ap_sel.formulario_id IS NULL))
-                   )
-            ),
-
-            respostas_componentes AS (
-                SELECT DISTINCT ON (c.especificacao_id, c.id_componente, bp.id)
-                    c.pares,
-                    c.formulario_id,
-                    c.especificacao_id,
-                    c.id_produto,
-                    c.id_componente,
-                    bp.id AS pergunta_id,
-                    br.descricao_opcao  AS resposta
-                FROM componentes c
-                JOIN bremen_perguntas bp ON bp.id_componente = c.id_componente
-                LEFT JOIN bremen_especificacao_detalhes bed
-                    ON bed.pergunta_id = bp.id
-                    AND bed.especificacao_id = c.especificacao_id
-                LEFT JOIN bremen_respostas br ON br.id = bed.resposta_id
-                WHERE br.valor IS NOT NULL
-                ORDER BY c.especificacao_id, c.id_componente, bp.id
-            ),
-
-            respostas_gerais AS (
-                SELECT DISTINCT ON (i.especificacao_id, bp.id)
-                    i.pares,
-                    i.formulario_id,
-                    i.especificacao_id,
-                    i.id_produto,
-                    bp.id AS pergunta_id,
-                    br.descricao_opcao  AS resposta
-                FROM itens i
-                JOIN bremen_perguntas bp ON bp.id_geral = i.id_produto
-                LEFT JOIN bremen_especificacao_detalhes bed
-                    ON bed.pergunta_id = bp.id
-                    AND bed.especificacao_id = i.especificacao_id
-                LEFT JOIN bremen_respostas br ON br.id = bed.resposta_id
-                WHERE br.valor IS NOT NULL
-                ORDER BY i.especificacao_id, bp.id
+        try:
+            parametros = OrcamentoService._montar_parametros(
+                escola_id, ids_produtos, datas_saida, divisoes_logistica, dias_uteis_filtro, unidades_ids
             )
-
-            SELECT json_build_object(
-                'identifier', 'PageFlow',
-                'data', json_build_object(
+            
+            if OrcamentoService._usar_engine_python():
+                from .orcamento_montagem_service import OrcamentoMontagemService
+                orcamentos = OrcamentoMontagemService.gerar_orcamentos(db, parametros)
+            else:
+                # Executar query com parâmetros vinculados para prevenir SQL injection
+                query = OrcamentoService._obter_query(versao_query)
+                result = db.execute(query, parametros)
+                orcamentos = []
                 
-                    'id_cliente', ip.cliente_id, 
-                    'id_vendedor', 2285,
-                    'id_forma_pagamento', '11',
-                    
-                    'itens', COALESCE(
-                        json_agg(
-                            json_build_object(
-                                'id_produto', ip.id_produto,
-                                'descricao', ip.nome_arquivo,
-                                'quantidade', ip.quantidade_total,
-                                'usar_listapreco', 1,
-                                'manter_estrutura_mod_produto', 1,
-                                'distribuicao_material_ids', COALESCE(ip.distribuicao_material_ids, ARRAY[]::integer[]),
-                                'componentes', COALESCE((
-                                    SELECT json_agg(
-                                        CASE
-                                            WHEN LOWER(COALESCE(comp_sel.descricao, '')) LIKE '%%miolo%%' THEN
-                                                json_build_object(
-                                                    'id', comp_sel.id_componente,
-                                                    'descricao', comp_sel.descricao,
-                                                    'altura', comp_sel.altura,
-                                                    'largura', comp_sel.largura,
-                                                    'quantidade_paginas', COALESCE(comp_sel.quantidade_paginas, 0),
-                                                    
-                                                    'gramaturasubstratoimpressao', COALESCE(
-                                                        comp_sel.gramatura_catalogo,
-                                                        NULLIF(replace(regexp_replace(comp_sel.gramatura_miolo::text, '[^0-9.,]', '', 'g'), ',', '.'), '')::numeric
-                                                    ),
-                                                    'corfrente', CAST(comp_sel.corfrente AS TEXT),
-                                                    'corverso', CAST(comp_sel.corverso AS TEXT),
-
-                                                    'perguntas_componente', COALESCE((
-                                                        SELECT json_agg(
-                                                            json_build_object(
-                                                                'id_pergunta', bp.id_pergunta,
-                                                                'pergunta', bp.nome,
-                                                                'tipo', bp.tipo,
-                                                                'resposta', rc.resposta
-                                                            )
-                                                            ORDER BY bp.id_pergunta
-                                                        )
-                                                        FROM bremen_perguntas bp
-                                                        INNER JOIN respostas_componentes rc
-                                                            ON rc.pergunta_id = bp.id
-                                                            AND rc.id_componente = comp_sel.id_componente
-                                                            AND rc.especificacao_id = comp_sel.especificacao_id
-                                                        WHERE bp.id_componente = comp_sel.id_componente
-                                                    ), '[]'::json)
-                                                )
-                                            ELSE
-                                                json_build_object(
-                                                    'id', comp_sel.id_componente,
-                                                    'descricao', comp_sel.descricao,
-                                                    'altura', comp_sel.altura,
-                                                    'largura', comp_sel.largura,
-                                                    'quantidade_paginas', comp_sel.quantidade_paginas,
-                                                    
-                                                    'gramaturasubstratoimpressao', CASE
-                                                            WHEN LOWER(COALESCE(comp_sel.descricao, '')) LIKE '%%miolo%%' THEN 
-                                                                COALESCE(
-                                                                    comp_sel.gramatura_catalogo,
-                                                                    NULLIF(replace(regexp_replace(comp_sel.gramatura_miolo::text, '[^0-9.,]', '', 'g'), ',', '.'), '')::numeric
-                                                                )
-                                                            ELSE NULL
-                                                    END,
-                                                    'corfrente', CAST(comp_sel.corfrente AS TEXT),
-                                                    'corverso', CAST(comp_sel.corverso AS TEXT),
-                                                    
-                                                    'perguntas_componente', COALESCE((
-                                                        SELECT json_agg(
-                                                            json_build_object(
-                                                                'id_pergunta', bp.id_pergunta,
-                                                                'pergunta', bp.nome,
-                                                                'tipo', bp.tipo,
-                                                                'resposta', rc.resposta
-                                                            )
-                                                            ORDER BY bp.id_pergunta
-                                                        )
-                                                        FROM bremen_perguntas bp
-                                                        INNER JOIN respostas_componentes rc
-                                                            ON rc.pergunta_id = bp.id
-                                                            AND rc.id_componente = comp_sel.id_componente
-                                                            AND rc.especificacao_id = comp_sel.especificacao_id
-                                                        WHERE bp.id_componente = comp_sel.id_componente
-                                                    ), '[]'::json)
-                                                )
-                                        END
-                                    )
-                                    FROM (
-                                        SELECT DISTINCT ON (comp.id_componente)
-                                            comp.componente_id, 
-                                            comp.id_componente, 
-                                            comp.descricao, 
-                                            comp.altura, 
-                                            comp.largura, 
-                                            comp.gramatura_miolo, 
-                                            comp.gramatura_catalogo, 
-                                            comp.quantidade_paginas, 
-                                            comp.especificacao_id,
-                                            comp.corfrente,
-                                            comp.corverso
-                                        FROM componentes comp
-                                        WHERE (
-                                            (ip.pares IS NOT NULL AND comp.pares = ip.pares AND comp.formulario_id = ip.formulario_id)
-                                            OR (ip.pares IS NULL AND comp.especificacao_id = ip.especificacao_id)
-                                        )
-                                        ORDER BY comp.id_componente,
-                                            CASE WHEN EXISTS (SELECT 1 FROM respostas_componentes rc_pref WHERE rc_pref.id_componente = comp.id_componente AND rc_pref.especificacao_id = comp.especificacao_id) THEN 0 ELSE 1 END,
-                                            comp.especificacao_id
-                                    ) comp_sel
-                                ), '[]'::json),
-                                'perguntas_gerais', COALESCE((
-                                    SELECT json_agg(
-                                        json_build_object(
-                                          'tipo', bp.tipo,
-                                          'pergunta', bp.nome,
-                                          'resposta', rg.resposta,
-                                          'id_pergunta', bp.id_pergunta
-                                        )
-                                    )
-                                    FROM bremen_perguntas bp
-                                    INNER JOIN respostas_gerais rg ON rg.pergunta_id = bp.id AND rg.especificacao_id = ip.especificacao_id
-                                    WHERE bp.id_geral = ip.id_produto
-                                ), '[]'::json)
-                            )
-                            ORDER BY ip.chave_agrupamento
-                        ), '[]'::json
-                    )
-                )
-            ) as orcamento
-            FROM itens_produto ip
-            GROUP BY ip.unidade_id, ip.cliente_id, ip.tipo_agrupamento
-            ORDER BY ip.unidade_id, ip.tipo_agrupamento DESC;
-        """)
+                for row in result:
+                    if row.orcamento:
+                        orcamentos.append(row.orcamento)
+            
+            logger.info(f"Gerados {len(orcamentos)} orçamentos para escola_id={escola_id}")
+            return orcamentos
+            
+        except Exception as e:
+            logger.error(f"Erro ao gerar orçamento: {str(e)}", exc_info=True)
+            raise
+
+    @staticmethod
+    def gerar_orcamento_json(
+        db: Session, 
+        escola_id: int, 
+        ids_produtos: List[int], 
+        datas_saida: List[date],
+        divisoes_logistica: List[str] = None,
+        dias_uteis_filtro: List[int] = None,
+        versao_query: Optional[str] = None,
+        unidades_ids: Optional[List[int]] = None
+    ) -> List[str]:
+        """
+        Gera orçamentos separados por unidade escolar, já serializados
+        
+        Mesmos filtros de gerar_orcamento; cada orçamento vem do PostgreSQL
+        como texto JSON e é devolvido sem ser decodificado.
+        
+        Returns:
+            Lista de orçamentos (texto JSON, um por unidade)
+        """
+        logger.info(f"Gerando orçamento (JSON) para escola_id={escola_id}, produtos={ids_produtos}, datas={datas_saida}, divisoes={divisoes_logistica}, dias_uteis={dias_uteis_filtro}, unidades={unidades_ids}")
         
         try:
-            # Converter arrays Python para formato PostgreSQL
-            ids_produtos_str = '{' + ','.join(map(str, ids_produtos)) + '}'
-            datas_saida_str = '{' + ','.join([d.strftime('%Y-%m-%d') if isinstance(d, date) else str(d) for d in datas_saida]) + '}'
+            parametros = OrcamentoService._montar_parametros(
+                escola_id, ids_produtos, datas_saida, divisoes_logistica, dias_uteis_filtro, unidades_ids
+            )
             
-            # Preparar parâmetros opcionais
-            divisoes_logistica_str = None
-            if divisoes_logistica:
-                divisoes_logistica_str = '{' + ','.join([f'"{d}"' for d in divisoes_logistica]) + '}'
+            if OrcamentoService._usar_engine_python():
+                from .orcamento_montagem_service import OrcamentoMontagemService
+                orcamentos = OrcamentoMontagemService.gerar_orcamentos(db, parametros, como_texto=True)
+            else:
+                query = OrcamentoService._obter_query(versao_query, como_texto=True)
+                orcamentos = [row.orcamento for row in db.execute(query, parametros) if row.orcamento]
             
-            dias_uteis_filtro_str = None
-            if dias_uteis_filtro:
-                dias_uteis_filtro_str = '{' + ','.join(map(str, dias_uteis_filtro)) + '}'
+            logger.info(f"Gerados {len(orcamentos)} orçamentos (JSON) para escola_id={escola_id}")
+            return orcamentos
             
-            # Executar query com parâmetros vinculados para prevenir SQL injection
-            result = db.execute(query, {
-                "escola_id": escola_id,
-                "ids_produtos": ids_produtos_str,
-                "datas_saida": datas_saida_str,
-                "divisoes_logistica": divisoes_logistica_str,
-                "dias_uteis_filtro": dias_uteis_filtro_str
-            })
-            orcamentos = []
+        except Exception as e:
+            logger.error(f"Erro ao gerar orçamento: {str(e)}", exc_info=True)
+            raise
+
+    @staticmethod
+    def iterar_orcamentos(
+        db: Session,
+        escola_id: int,
+        ids_produtos: List[int],
+        datas_saida: List[date],
+        divisoes_logistica: List[str] = None,
+        dias_uteis_filtro: List[int] = None,
+        versao_query: Optional[str] = None,
+        como_texto: bool = False
+    ) -> Iterator[Any]:
+        """
+        Gera orçamentos um a um, à medida que o PostgreSQL produz as linhas
+        
+        Usa um cursor no servidor (stream_results), buscando
+        TAMANHO_LOTE_STREAM linhas por vez; a memória não cresce com a
+        quantidade de unidades.
+        
+        Args:
+            db: Sessão do banco de dados (deve permanecer aberta durante a iteração)
+            escola_id: ID da escola
+            ids_produtos: Lista de IDs de produtos selecionados
+            datas_saida: Lista de datas de saída selecionadas
+            divisoes_logistica: Lista de divisões logísticas (opcional)
+            dias_uteis_filtro: Lista de dias úteis (opcional)
+            versao_query: Versão da query ("v1"/"v2"); padrão da configuração.
+                Ignorada pela engine "python", que usa as CTEs da v2
+            como_texto: Entrega cada orçamento como texto JSON (sem decodificar)
             
-            for row in result:
-                if row.orcamento:
-                    orcamentos.append(row.orcamento)
+        Yields:
+            Orçamento de uma unidade (dict, ou str com como_texto)
+        """
+        logger.info(f"Gerando orçamento (streaming) para escola_id={escola_id}, produtos={ids_produtos}, datas={datas_saida}, divisoes={divisoes_logistica}, dias_uteis={dias_uteis_filtro}")
+        
+        total = 0
+        try:
+            parametros = OrcamentoService._montar_parametros(
+                escola_id, ids_produtos, datas_saida, divisoes_logistica, dias_uteis_filtro
+            )
             
-            logger.info(f"Gerados {len(orcamentos)} orçamentos para escola_id={escola_id}")
-            return orcamentos
+            if OrcamentoService._usar_engine_python():
+                from .orcamento_montagem_service import OrcamentoMontagemService
+                for orcamento in OrcamentoMontagemService.iterar_orcamentos(db, parametros, como_texto):
+                    total += 1
+                    yield orcamento
+            else:
+                result = db.execute(
+                    OrcamentoService._obter_query(versao_query, como_texto),
+                    parametros,
+                    execution_options={"yield_per": OrcamentoService.TAMANHO_LOTE_STREAM}
+                )
+                
+                for row in result:
+                    if row.orcamento:
+                        total += 1
+                        yield row.orcamento
+            
+            logger.info(f"Transmitidos {total} orçamentos para escola_id={escola_id}")
             
         except Exception as e:
-            logger.error(f"Erro ao gerar orçamento: {str(e)}", exc_info=True)
+            logger.error(f"Erro ao transmitir orçamento após {total} unidade(s): {str(e)}", exc_info=True)
             raise
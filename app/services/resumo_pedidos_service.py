@@ -0,0 +1,112 @@
+import time
+import asyncio
+from datetime import datetime
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from fastapi.concurrency import run_in_threadpool
+from typing import Dict, Any, List, Optional
+from ..config.database import SessionLocal
+from ..config.settings import get_settings
+from ..config.logging_config import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+# Escolas cujo resumo difere do calculado a partir das distribuições, em
+# qualquer das duas tabelas (migrations/006_resumo_pedidos_escola.sql)
+QUERY_DIVERGENCIAS = text("""
+    WITH formularios_divergentes AS (
+        SELECT COALESCE(c.escola_id, r.escola_id) AS escola_id
+        FROM calcular_resumo_pedidos_formulario(NULL) c
+        FULL JOIN resumo_pedidos_escola_formulario r
+            ON r.escola_id = c.escola_id
+           AND r.formulario_id = c.formulario_id
+        WHERE (c.distribuicoes, c.distribuicoes_pendentes, c.distribuicoes_concluidas,
+               c.quantidade, c.quantidade_pendente, c.quantidade_concluida)
+              IS DISTINCT FROM
+              (r.distribuicoes, r.distribuicoes_pendentes, r.distribuicoes_concluidas,
+               r.quantidade, r.quantidade_pendente, r.quantidade_concluida)
+    ),
+
+    escolas_divergentes AS (
+        SELECT COALESCE(c.escola_id, r.escola_id) AS escola_id
+        FROM calcular_resumo_pedidos_escola(NULL) c
+        FULL JOIN resumo_pedidos_escola r ON r.escola_id = c.escola_id
+        WHERE (c.total_pedidos, c.pedidos_pendentes, c.pedidos_concluidos,
+               c.total_distribuicoes, c.distribuicoes_pendentes, c.distribuicoes_concluidas,
+               c.quantidade_total, c.quantidade_pendente, c.quantidade_concluida)
+              IS DISTINCT FROM
+              (r.total_pedidos, r.pedidos_pendentes, r.pedidos_concluidos,
+               r.total_distribuicoes, r.distribuicoes_pendentes, r.distribuicoes_concluidas,
+               r.quantidade_total, r.quantidade_pendente, r.quantidade_concluida)
+    )
+
+    SELECT escola_id FROM formularios_divergentes
+    UNION
+    SELECT escola_id FROM escolas_divergentes
+    ORDER BY escola_id
+""")
+
+QUERY_RECALCULAR = text("SELECT recalcular_resumo_pedidos(CAST(:escola_ids AS integer[]))")
+
+
+class ResumoPedidosService:
+    """
+    Reconciliação do resumo de pedidos por escola
+
+    O resumo é mantido por triggers em distribuicao_materiais e
+    unidades_escolares; a reconciliação compara as tabelas com o cálculo a
+    partir das distribuições e refaz apenas as escolas divergentes (ex.:
+    triggers desativados durante uma carga, edição manual das tabelas).
+    """
+
+    @staticmethod
+    def reconciliar(db: Optional[Session] = None) -> Dict[str, Any]:
+        """
+        Corrige as escolas cujo resumo divergiu das distribuições
+
+        Args:
+            db: Sessão do banco de dados (opcional; abre uma própria se None)
+
+        Returns:
+            Dicionário com as escolas corrigidas, duração e horário da execução
+        """
+        inicio = time.perf_counter()
+        sessao = db or SessionLocal()
+        try:
+            escola_ids: List[int] = list(sessao.execute(QUERY_DIVERGENCIAS).scalars())
+            if escola_ids:
+                sessao.execute(QUERY_RECALCULAR, {"escola_ids": escola_ids})
+            sessao.commit()
+        except Exception:
+            sessao.rollback()
+            raise
+        finally:
+            if db is None:
+                sessao.close()
+
+        resultado = {
+            "escolas_corrigidas": escola_ids,
+            "duracao_ms": round((time.perf_counter() - inicio) * 1000, 1),
+            "executado_em": datetime.now().isoformat(timespec="seconds"),
+        }
+        if escola_ids:
+            logger.warning(f"Resumo de pedidos divergente corrigido para escola_ids={escola_ids}")
+        else:
+            logger.info(f"Resumo de pedidos consistente ({resultado['duracao_ms']} ms)")
+        return resultado
+
+    @classmethod
+    async def executar_reconciliacao_periodica(cls) -> None:
+        """
+        Reconcilia o resumo a cada RESUMO_PEDIDOS_RECONCILIACAO_INTERVALO_SEGUNDOS
+        (tarefa de fundo iniciada no lifespan da aplicação)
+        """
+        intervalo = settings.RESUMO_PEDIDOS_RECONCILIACAO_INTERVALO_SEGUNDOS
+        logger.info(f"Reconciliação do resumo de pedidos a cada {intervalo}s")
+        while True:
+            await asyncio.sleep(intervalo)
+            try:
+                await run_in_threadpool(cls.reconciliar)
+            except Exception as e:
+                logger.error(f"Erro na reconciliação do resumo de pedidos: {str(e)}", exc_info=True)
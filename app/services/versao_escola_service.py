@@ -0,0 +1,78 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Tuple
+from ..config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class VersaoEscolaService:
+    """Service para calcular a versão (marca d'água) dos dados de uma escola"""
+
+    @staticmethod
+    def obter_versao(db: Session, escola_id: int) -> Tuple:
+        """
+        Calcula a marca d'água dos dados de pedidos de uma escola
+        
+        Combina contagem e maior atualizado_em de distribuicao_materiais,
+        especificacoes_form, arquivo_pdfs e unidades_escolares da escola.
+        A contagem detecta exclusões, que não alteram atualizado_em.
+        
+        Args:
+            db: Sessão do banco de dados
+            escola_id: ID da escola
+            
+        Returns:
+            Tupla comparável; muda sempre que algum desses registros muda
+        """
+        query = text("""
+            WITH distribuicoes AS (
+                SELECT
+                    dm.id,
+                    dm.formulario_id,
+                    dm.especificacao_form_id,
+                    dm.atualizado_em
+                FROM distribuicao_materiais dm
+                JOIN unidades_escolares ue ON ue.id = dm.unidade_escolar_id
+                WHERE ue.escola_id = :escola_id
+            ),
+            especificacoes AS (
+                SELECT DISTINCT especificacao_form_id AS id
+                FROM distribuicoes
+                WHERE especificacao_form_id IS NOT NULL
+            ),
+            formularios_escola AS (
+                SELECT DISTINCT formulario_id AS id
+                FROM distribuicoes
+            )
+            SELECT
+                (SELECT COUNT(*) FROM distribuicoes) AS total_distribuicoes,
+                (SELECT MAX(atualizado_em) FROM distribuicoes) AS distribuicoes_atualizado_em,
+                (
+                    SELECT MAX(ef.atualizado_em)
+                    FROM especificacoes_form ef
+                    JOIN especificacoes e ON e.id = ef.id
+                ) AS especificacoes_atualizado_em,
+                arquivos.total AS total_arquivos,
+                arquivos.atualizado_em AS arquivos_atualizado_em,
+                unidades.total AS total_unidades,
+                unidades.atualizado_em AS unidades_atualizado_em
+            FROM (
+                SELECT COUNT(*) AS total, MAX(ap.atualizado_em) AS atualizado_em
+                FROM arquivo_pdfs ap
+                WHERE ap.item_pedido_id IN (SELECT id FROM especificacoes)
+                   OR ap.formulario_id IN (SELECT id FROM formularios_escola)
+            ) arquivos
+            CROSS JOIN (
+                SELECT COUNT(*) AS total, MAX(ue.atualizado_em) AS atualizado_em
+                FROM unidades_escolares ue
+                WHERE ue.escola_id = :escola_id
+            ) unidades
+        """)
+        
+        try:
+            row = db.execute(query, {"escola_id": escola_id}).fetchone()
+            return tuple(row)
+        except Exception as e:
+            logger.error(f"Erro ao calcular versão dos dados da escola_id={escola_id}: {str(e)}", exc_info=True)
+            raise
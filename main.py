@@ -1,9 +1,16 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import auth, dashboard, pedido_cascata, orcamento
+from app.routers import auth, dashboard, pedido_cascata, orcamento, catalogo_bremen, distribuicao
 from app.config.settings import get_settings
 from app.config.logging_config import setup_logging, get_logger
 from app.middleware import RequestLoggingMiddleware
+from app.services.catalogo_bremen_service import CatalogoBremenService
+from app.services.arquivo_orcamento_service import ArquivoOrcamentoService
+from app.services.resumo_pedidos_service import ResumoPedidosService
+from app.services.dashboard_eventos_service import DashboardEventosService
 
 # Inicializar logging
 setup_logging()
@@ -11,13 +18,40 @@ logger = get_logger(__name__)
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Catálogo Bremen em memória; se falhar aqui, é carregado no primeiro uso
+    try:
+        await run_in_threadpool(CatalogoBremenService.recarregar)
+    except Exception as e:
+        logger.error(f"Não foi possível carregar o catálogo Bremen na inicialização: {str(e)}")
+
+    # Retenção dos arquivos de orçamento (idade e cota) em segundo plano
+    tarefas = []
+    if settings.ARQUIVOS_ORCAMENTO_RETENCAO_INTERVALO_SEGUNDOS > 0:
+        tarefas.append(asyncio.create_task(ArquivoOrcamentoService.executar_retencao_periodica()))
+
+    # Reconciliação do resumo de pedidos por escola (mantido por triggers)
+    if settings.RESUMO_PEDIDOS_RECONCILIACAO_INTERVALO_SEGUNDOS > 0:
+        tarefas.append(asyncio.create_task(ResumoPedidosService.executar_reconciliacao_periodica()))
+    yield
+    # Encerra os fluxos SSE abertos e a escuta de notificações do dashboard
+    await DashboardEventosService.parar()
+    for tarefa in tarefas:
+        tarefa.cancel()
+        with suppress(asyncio.CancelledError):
+            await tarefa
+
+
 def create_app() -> FastAPI:
     logger.info("Criando aplicação FastAPI...")
     app = FastAPI(
         title=settings.APP_NAME,
         debug=settings.DEBUG,
         version="1.0.0",
-        description="Sistema PCP - Planejamento e Controle de Produção"
+        description="Sistema PCP - Planejamento e Controle de Produção",
+        lifespan=lifespan
     )
 
     # Middleware de logging (adicionar antes de outros middlewares)
@@ -39,7 +73,9 @@ def create_app() -> FastAPI:
     app.include_router(dashboard.router)
     app.include_router(pedido_cascata.router)
     app.include_router(orcamento.router)
-    logger.info("Routers registrados: auth, dashboard, pedido_cascata, orcamento")
+    app.include_router(catalogo_bremen.router)
+    app.include_router(distribuicao.router)
+    logger.info("Routers registrados: auth, dashboard, pedido_cascata, orcamento, catalogo_bremen, distribuicao")
 
     # Health check endpoint
     @app.get("/healthz", tags=["Health"])
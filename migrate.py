@@ -0,0 +1,189 @@
+"""
+Script para aplicar as migrações SQL versionadas do diretório migrations/
+
+Cada arquivo NNN_descricao.sql é aplicado uma única vez, em ordem, dentro de
+uma transação. As versões aplicadas ficam registradas em schema_migrations.
+
+Arquivos que começam com a linha "-- migrate: sem-transacao" são executados
+fora de transação, um comando por vez (necessário para CREATE INDEX
+CONCURRENTLY). Nesses arquivos cada comando deve terminar com ";" no fim
+da linha.
+"""
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+# Adicionar o diretório backend ao path
+backend_dir = Path(__file__).parent
+sys.path.insert(0, str(backend_dir))
+
+from app.config.database import engine
+from app.config.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MIGRATIONS_DIR = backend_dir / "migrations"
+
+MARCADOR_SEM_TRANSACAO = "-- migrate: sem-transacao"
+
+
+def listar_migracoes() -> List[Tuple[str, Path]]:
+    """
+    Lista os arquivos de migração em ordem de versão
+    
+    Returns:
+        Lista de tuplas (versao, caminho)
+    """
+    migracoes = []
+    for arquivo in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        versao = arquivo.name.split("_", 1)[0]
+        migracoes.append((versao, arquivo))
+    return migracoes
+
+
+def dividir_comandos(sql: str) -> List[str]:
+    """
+    Divide um arquivo de migração em comandos terminados por ";" no fim da linha
+    
+    Args:
+        sql: Conteúdo do arquivo
+        
+    Returns:
+        Lista de comandos (sem comentários de linha inteira)
+    """
+    comandos = []
+    atual = []
+    for linha in sql.splitlines():
+        if not atual and (not linha.strip() or linha.strip().startswith("--")):
+            continue
+        atual.append(linha)
+        if linha.rstrip().endswith(";"):
+            comandos.append("\n".join(atual))
+            atual = []
+    if any(linha.strip() and not linha.strip().startswith("--") for linha in atual):
+        comandos.append("\n".join(atual))
+    return comandos
+
+
+def _criar_tabela_controle(cursor) -> None:
+    """Cria a tabela de controle das migrações aplicadas"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            versao VARCHAR(20) PRIMARY KEY,
+            nome VARCHAR(255) NOT NULL,
+            aplicado_em TIMESTAMP NOT NULL DEFAULT now()
+        )
+    """)
+
+
+def versoes_aplicadas() -> set:
+    """
+    Retorna as versões já aplicadas no banco
+    
+    Returns:
+        Conjunto de versões
+    """
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        _criar_tabela_controle(cursor)
+        conn.commit()
+        cursor.execute("SELECT versao FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    finally:
+        conn.close()
+
+
+def aplicar_migracao(versao: str, arquivo: Path) -> None:
+    """
+    Aplica um arquivo de migração em uma transação
+    
+    Args:
+        versao: Versão da migração
+        arquivo: Caminho do arquivo .sql
+    """
+    sql = arquivo.read_text(encoding="utf-8")
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        if sql.lstrip().startswith(MARCADOR_SEM_TRANSACAO):
+            # Cada comando é confirmado isoladamente (ex.: CREATE INDEX CONCURRENTLY)
+            conn.driver_connection.autocommit = True
+            for comando in dividir_comandos(sql):
+                logger.info(f"  {comando.splitlines()[0].strip()}")
+                cursor.execute(comando)
+            conn.driver_connection.autocommit = False
+        else:
+            cursor.execute(sql)
+        cursor.execute(
+            "INSERT INTO schema_migrations (versao, nome) VALUES (%s, %s)",
+            (versao, arquivo.name)
+        )
+        conn.commit()
+    except Exception:
+        if conn.driver_connection.autocommit:
+            conn.driver_connection.autocommit = False
+        else:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def migrar() -> bool:
+    """
+    Aplica todas as migrações pendentes
+    
+    Returns:
+        True se todas foram aplicadas com sucesso
+    """
+    try:
+        logger.info("=" * 80)
+        logger.info("Aplicando migrações pendentes...")
+        logger.info("=" * 80)
+        
+        aplicadas = versoes_aplicadas()
+        pendentes = [(v, a) for v, a in listar_migracoes() if v not in aplicadas]
+        
+        if not pendentes:
+            logger.info("✅ Banco de dados já está atualizado")
+            return True
+        
+        for versao, arquivo in pendentes:
+            logger.info(f"Aplicando {arquivo.name}...")
+            aplicar_migracao(versao, arquivo)
+            logger.info(f"  ✅ {arquivo.name} aplicada")
+        
+        logger.info("=" * 80)
+        logger.info(f"✅ {len(pendentes)} migração(ões) aplicada(s)")
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Erro ao aplicar migrações: {str(e)}", exc_info=True)
+        return False
+
+
+def mostrar_status() -> None:
+    """Mostra quais migrações estão aplicadas e quais estão pendentes"""
+    aplicadas = versoes_aplicadas()
+    for versao, arquivo in listar_migracoes():
+        marcador = "✅" if versao in aplicadas else "⏳"
+        print(f"{marcador} {arquivo.name}")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Aplicar migrações SQL versionadas')
+    parser.add_argument(
+        '--status',
+        action='store_true',
+        help='Apenas mostra as migrações aplicadas e pendentes'
+    )
+    
+    args = parser.parse_args()
+    
+    if args.status:
+        mostrar_status()
+    else:
+        sys.exit(0 if migrar() else 1)
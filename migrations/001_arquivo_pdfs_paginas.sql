@@ -0,0 +1,230 @@
+-- =============================================================================
+-- 001 - Lookup do arquivo PDF mais recente por componente (quantidade_paginas)
+--
+-- A query de orçamento precisava ordenar arquivo_pdfs por criado_em para cada
+-- componente de cada item. As tabelas abaixo guardam o resultado já resolvido
+-- e são mantidas por trigger em arquivo_pdfs (INSERT / UPDATE / DELETE).
+--
+--   paginas        -> páginas do arquivo mais recente do componente
+--   paginas_miolo  -> COALESCE(paginas, 0) do arquivo 'miolo' mais recente
+--                     (NULL quando não existe arquivo de miolo)
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS arquivo_pdfs_paginas_par (
+    id_componente INTEGER NOT NULL,
+    pares INTEGER NOT NULL,
+    formulario_id INTEGER NOT NULL,
+    paginas INTEGER,
+    paginas_miolo INTEGER,
+    atualizado_em TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (id_componente, pares, formulario_id)
+);
+
+CREATE TABLE IF NOT EXISTS arquivo_pdfs_paginas_item (
+    id_componente INTEGER NOT NULL,
+    item_pedido_id INTEGER NOT NULL,
+    paginas INTEGER,
+    paginas_miolo INTEGER,
+    atualizado_em TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (id_componente, item_pedido_id)
+);
+
+-- Índices usados pelo recálculo disparado pela trigger
+CREATE INDEX IF NOT EXISTS idx_arquivo_pdfs_componente_par
+    ON arquivo_pdfs (id_componente, pares, formulario_id, criado_em DESC);
+
+CREATE INDEX IF NOT EXISTS idx_arquivo_pdfs_componente_item
+    ON arquivo_pdfs (id_componente, item_pedido_id, criado_em DESC);
+
+
+-- Recalcula a linha do lookup (id_componente, pares, formulario_id)
+CREATE OR REPLACE FUNCTION atualizar_arquivo_pdfs_paginas_par(
+    p_id_componente INTEGER,
+    p_pares INTEGER,
+    p_formulario_id INTEGER
+) RETURNS void AS $$
+DECLARE
+    v_existe BOOLEAN;
+    v_paginas INTEGER;
+    v_paginas_miolo INTEGER;
+BEGIN
+    IF p_id_componente IS NULL OR p_pares IS NULL OR p_formulario_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- Serializa o recálculo da mesma chave entre transações concorrentes
+    PERFORM pg_advisory_xact_lock(
+        hashtext('arquivo_pdfs_paginas_par'),
+        hashtext(p_id_componente || ':' || p_pares || ':' || p_formulario_id)
+    );
+
+    SELECT true, ap.paginas
+      INTO v_existe, v_paginas
+      FROM arquivo_pdfs ap
+     WHERE ap.id_componente = p_id_componente
+       AND ap.pares = p_pares
+       AND ap.formulario_id = p_formulario_id
+     ORDER BY ap.criado_em DESC, ap.id DESC
+     LIMIT 1;
+
+    IF v_existe IS NULL THEN
+        DELETE FROM arquivo_pdfs_paginas_par
+         WHERE id_componente = p_id_componente
+           AND pares = p_pares
+           AND formulario_id = p_formulario_id;
+        RETURN;
+    END IF;
+
+    SELECT COALESCE(ap.paginas, 0)
+      INTO v_paginas_miolo
+      FROM arquivo_pdfs ap
+     WHERE ap.id_componente = p_id_componente
+       AND ap.pares = p_pares
+       AND ap.formulario_id = p_formulario_id
+       AND LOWER(COALESCE(ap.tipo_arquivo, '')) = 'miolo'
+     ORDER BY ap.criado_em DESC, ap.id DESC
+     LIMIT 1;
+
+    INSERT INTO arquivo_pdfs_paginas_par (id_componente, pares, formulario_id, paginas, paginas_miolo, atualizado_em)
+    VALUES (p_id_componente, p_pares, p_formulario_id, v_paginas, v_paginas_miolo, now())
+    ON CONFLICT (id_componente, pares, formulario_id) DO UPDATE
+        SET paginas = EXCLUDED.paginas,
+            paginas_miolo = EXCLUDED.paginas_miolo,
+            atualizado_em = EXCLUDED.atualizado_em;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- Recalcula a linha do lookup (id_componente, item_pedido_id)
+CREATE OR REPLACE FUNCTION atualizar_arquivo_pdfs_paginas_item(
+    p_id_componente INTEGER,
+    p_item_pedido_id INTEGER
+) RETURNS void AS $$
+DECLARE
+    v_existe BOOLEAN;
+    v_paginas INTEGER;
+    v_paginas_miolo INTEGER;
+BEGIN
+    IF p_id_componente IS NULL OR p_item_pedido_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    PERFORM pg_advisory_xact_lock(
+        hashtext('arquivo_pdfs_paginas_item'),
+        hashtext(p_id_componente || ':' || p_item_pedido_id)
+    );
+
+    SELECT true, ap.paginas
+      INTO v_existe, v_paginas
+      FROM arquivo_pdfs ap
+     WHERE ap.id_componente = p_id_componente
+       AND ap.item_pedido_id = p_item_pedido_id
+     ORDER BY ap.criado_em DESC, ap.id DESC
+     LIMIT 1;
+
+    IF v_existe IS NULL THEN
+        DELETE FROM arquivo_pdfs_paginas_item
+         WHERE id_componente = p_id_componente
+           AND item_pedido_id = p_item_pedido_id;
+        RETURN;
+    END IF;
+
+    SELECT COALESCE(ap.paginas, 0)
+      INTO v_paginas_miolo
+      FROM arquivo_pdfs ap
+     WHERE ap.id_componente = p_id_componente
+       AND ap.item_pedido_id = p_item_pedido_id
+       AND LOWER(COALESCE(ap.tipo_arquivo, '')) = 'miolo'
+     ORDER BY ap.criado_em DESC, ap.id DESC
+     LIMIT 1;
+
+    INSERT INTO arquivo_pdfs_paginas_item (id_componente, item_pedido_id, paginas, paginas_miolo, atualizado_em)
+    VALUES (p_id_componente, p_item_pedido_id, v_paginas, v_paginas_miolo, now())
+    ON CONFLICT (id_componente, item_pedido_id) DO UPDATE
+        SET paginas = EXCLUDED.paginas,
+            paginas_miolo = EXCLUDED.paginas_miolo,
+            atualizado_em = EXCLUDED.atualizado_em;
+END;
+$$ LANGUAGE plpgsql;
+
+
+CREATE OR REPLACE FUNCTION trg_arquivo_pdfs_paginas() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM atualizar_arquivo_pdfs_paginas_par(OLD.id_componente, OLD.pares, OLD.formulario_id);
+        PERFORM atualizar_arquivo_pdfs_paginas_item(OLD.id_componente, OLD.item_pedido_id);
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        PERFORM atualizar_arquivo_pdfs_paginas_par(NEW.id_componente, NEW.pares, NEW.formulario_id);
+        PERFORM atualizar_arquivo_pdfs_paginas_item(NEW.id_componente, NEW.item_pedido_id);
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- A chave antiga já foi recalculada acima; só recalcula a nova se mudou
+        IF (NEW.id_componente, NEW.pares, NEW.formulario_id)
+           IS DISTINCT FROM (OLD.id_componente, OLD.pares, OLD.formulario_id) THEN
+            PERFORM atualizar_arquivo_pdfs_paginas_par(NEW.id_componente, NEW.pares, NEW.formulario_id);
+        END IF;
+        IF (NEW.id_componente, NEW.item_pedido_id)
+           IS DISTINCT FROM (OLD.id_componente, OLD.item_pedido_id) THEN
+            PERFORM atualizar_arquivo_pdfs_paginas_item(NEW.id_componente, NEW.item_pedido_id);
+        END IF;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_arquivo_pdfs_paginas ON arquivo_pdfs;
+
+CREATE TRIGGER trg_arquivo_pdfs_paginas
+    AFTER INSERT OR DELETE
+       OR UPDATE OF id_componente, pares, formulario_id, item_pedido_id, paginas, tipo_arquivo, criado_em
+    ON arquivo_pdfs
+    FOR EACH ROW
+    EXECUTE FUNCTION trg_arquivo_pdfs_paginas();
+
+
+-- Carga inicial a partir dos arquivos existentes
+INSERT INTO arquivo_pdfs_paginas_par (id_componente, pares, formulario_id, paginas, paginas_miolo)
+SELECT u.id_componente, u.pares, u.formulario_id, u.paginas, m.paginas_miolo
+FROM (
+    SELECT DISTINCT ON (id_componente, pares, formulario_id)
+        id_componente, pares, formulario_id, paginas
+    FROM arquivo_pdfs
+    WHERE id_componente IS NOT NULL AND pares IS NOT NULL AND formulario_id IS NOT NULL
+    ORDER BY id_componente, pares, formulario_id, criado_em DESC, id DESC
+) u
+LEFT JOIN (
+    SELECT DISTINCT ON (id_componente, pares, formulario_id)
+        id_componente, pares, formulario_id, COALESCE(paginas, 0) AS paginas_miolo
+    FROM arquivo_pdfs
+    WHERE id_componente IS NOT NULL AND pares IS NOT NULL AND formulario_id IS NOT NULL
+      AND LOWER(COALESCE(tipo_arquivo, '')) = 'miolo'
+    ORDER BY id_componente, pares, formulario_id, criado_em DESC, id DESC
+) m USING (id_componente, pares, formulario_id)
+ON CONFLICT (id_componente, pares, formulario_id) DO UPDATE
+    SET paginas = EXCLUDED.paginas,
+        paginas_miolo = EXCLUDED.paginas_miolo,
+        atualizado_em = now();
+
+INSERT INTO arquivo_pdfs_paginas_item (id_componente, item_pedido_id, paginas, paginas_miolo)
+SELECT u.id_componente, u.item_pedido_id, u.paginas, m.paginas_miolo
+FROM (
+    SELECT DISTINCT ON (id_componente, item_pedido_id)
+        id_componente, item_pedido_id, paginas
+    FROM arquivo_pdfs
+    WHERE id_componente IS NOT NULL AND item_pedido_id IS NOT NULL
+    ORDER BY id_componente, item_pedido_id, criado_em DESC, id DESC
+) u
+LEFT JOIN (
+    SELECT DISTINCT ON (id_componente, item_pedido_id)
+        id_componente, item_pedido_id, COALESCE(paginas, 0) AS paginas_miolo
+    FROM arquivo_pdfs
+    WHERE id_componente IS NOT NULL AND item_pedido_id IS NOT NULL
+      AND LOWER(COALESCE(tipo_arquivo, '')) = 'miolo'
+    ORDER BY id_componente, item_pedido_id, criado_em DESC, id DESC
+) m USING (id_componente, item_pedido_id)
+ON CONFLICT (id_componente, item_pedido_id) DO UPDATE
+    SET paginas = EXCLUDED.paginas,
+        paginas_miolo = EXCLUDED.paginas_miolo,
+        atualizado_em = now();
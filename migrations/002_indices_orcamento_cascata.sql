@@ -0,0 +1,43 @@
+-- migrate: sem-transacao
+-- =============================================================================
+-- 002 - Índices das chaves de junção/filtro do orçamento e da cascata
+--
+-- Criados com CONCURRENTLY para não bloquear escrita em produção; por isso
+-- o arquivo roda fora de transação (marcador acima), um comando por vez.
+-- Se a criação de um índice falhar, ele pode ficar INVALID: remova-o com
+-- DROP INDEX CONCURRENTLY <nome> antes de rodar a migração novamente.
+-- =============================================================================
+
+-- Orçamento: distribuições pendentes por unidade (cobre quantidade e data_saida)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_distribuicao_materiais_pendente_unidade
+    ON distribuicao_materiais (unidade_escolar_id, especificacao_form_id)
+    INCLUDE (quantidade, data_saida)
+    WHERE status_distribuicao = 'pendente';
+
+-- Cascata: distribuições por unidade com o arquivo vinculado
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_distribuicao_materiais_unidade_arquivo
+    ON distribuicao_materiais (unidade_escolar_id, arquivo_pdf_id)
+    INCLUDE (quantidade);
+
+-- FK arquivo_pdf_id (ON DELETE SET NULL em arquivo_pdfs)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_distribuicao_materiais_arquivo_pdf_id
+    ON distribuicao_materiais (arquivo_pdf_id);
+
+-- FKs de especificação e formulário com o status (transições de status por pedido)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_distribuicao_materiais_especificacao_status
+    ON distribuicao_materiais (especificacao_form_id, status_distribuicao);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_distribuicao_materiais_formulario_status
+    ON distribuicao_materiais (formulario_id, status_distribuicao);
+
+-- Arquivos por especificação (orçamento e cascata juntam por item_pedido_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_arquivo_pdfs_item_pedido_id
+    ON arquivo_pdfs (item_pedido_id);
+
+-- Arquivos vinculados por pares (capa/miolo)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_arquivo_pdfs_pares_formulario
+    ON arquivo_pdfs (pares, formulario_id)
+    WHERE pares IS NOT NULL;
+
+ANALYZE distribuicao_materiais;
+ANALYZE arquivo_pdfs;
@@ -0,0 +1,126 @@
+-- =============================================================================
+-- 003 - data_saida como date e dimensões numéricas das especificações
+--
+-- distribuicao_materiais.data_saida (texto no legado) passa a ser date; as
+-- queries deixam de converter a coluna em cada linha e o filtro por data
+-- pode usar o índice (unidade_escolar_id, data_saida). Valores que não são
+-- datas válidas ficam registrados em distribuicao_materiais_data_saida_legado
+-- antes da conversão e viram NULL.
+--
+-- especificacoes_form ganha altura_num, largura_num e gramatura_miolo_num,
+-- mantidas por trigger a partir dos campos digitados (texto). A conversão
+-- nunca falha: valores não numéricos viram NULL.
+--
+-- ALTER COLUMN TYPE reescreve distribuicao_materiais com lock exclusivo;
+-- aplique em janela de manutenção.
+-- =============================================================================
+
+-- Conversões tolerantes (IMMUTABLE: resultado depende apenas do texto)
+CREATE OR REPLACE FUNCTION texto_para_numeric(valor text)
+RETURNS numeric
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+    RETURN NULLIF(btrim(valor), '')::numeric;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+-- Gramatura digitada (ex.: '90,5 g' -> 90.5)
+CREATE OR REPLACE FUNCTION gramatura_para_numeric(valor text)
+RETURNS numeric
+LANGUAGE plpgsql
+IMMUTABLE
+AS $$
+BEGIN
+    RETURN NULLIF(replace(regexp_replace(valor, '[^0-9.,]', '', 'g'), ',', '.'), '')::numeric;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION texto_para_date(valor text)
+RETURNS date
+LANGUAGE plpgsql
+STABLE
+AS $$
+BEGIN
+    RETURN NULLIF(btrim(valor), '')::date;
+EXCEPTION WHEN others THEN
+    RETURN NULL;
+END;
+$$;
+
+-- -----------------------------------------------------------------------------
+-- distribuicao_materiais.data_saida: text -> date
+-- -----------------------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS distribuicao_materiais_data_saida_legado (
+    distribuicao_material_id INTEGER PRIMARY KEY,
+    data_saida TEXT NOT NULL,
+    registrado_em TIMESTAMP NOT NULL DEFAULT now()
+);
+
+DO $$
+BEGIN
+    IF (
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'distribuicao_materiais'
+          AND column_name = 'data_saida'
+    ) <> 'date' THEN
+        INSERT INTO distribuicao_materiais_data_saida_legado (distribuicao_material_id, data_saida)
+        SELECT id, data_saida
+        FROM distribuicao_materiais
+        WHERE btrim(data_saida) <> ''
+          AND texto_para_date(data_saida) IS NULL
+        ON CONFLICT (distribuicao_material_id) DO NOTHING;
+
+        ALTER TABLE distribuicao_materiais
+            ALTER COLUMN data_saida TYPE date USING texto_para_date(data_saida);
+    END IF;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_distribuicao_materiais_unidade_data_saida
+    ON distribuicao_materiais (unidade_escolar_id, data_saida);
+
+-- -----------------------------------------------------------------------------
+-- especificacoes_form: dimensões numéricas mantidas na escrita
+-- -----------------------------------------------------------------------------
+ALTER TABLE especificacoes_form
+    ADD COLUMN IF NOT EXISTS altura_num NUMERIC,
+    ADD COLUMN IF NOT EXISTS largura_num NUMERIC,
+    ADD COLUMN IF NOT EXISTS gramatura_miolo_num NUMERIC;
+
+CREATE OR REPLACE FUNCTION atualizar_especificacoes_form_dimensoes()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.altura_num := texto_para_numeric(NEW.altura);
+    NEW.largura_num := texto_para_numeric(NEW.largura);
+    NEW.gramatura_miolo_num := gramatura_para_numeric(NEW.gramatura_miolo);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_especificacoes_form_dimensoes ON especificacoes_form;
+CREATE TRIGGER trg_especificacoes_form_dimensoes
+    BEFORE INSERT OR UPDATE OF altura, largura, gramatura_miolo, altura_num, largura_num, gramatura_miolo_num
+    ON especificacoes_form
+    FOR EACH ROW
+    EXECUTE FUNCTION atualizar_especificacoes_form_dimensoes();
+
+-- Backfill
+UPDATE especificacoes_form
+SET altura_num = texto_para_numeric(altura),
+    largura_num = texto_para_numeric(largura),
+    gramatura_miolo_num = gramatura_para_numeric(gramatura_miolo)
+WHERE altura IS NOT NULL
+   OR largura IS NOT NULL
+   OR gramatura_miolo IS NOT NULL;
+
+ANALYZE distribuicao_materiais;
+ANALYZE especificacoes_form;
@@ -0,0 +1,30 @@
+-- =============================================================================
+-- 004 - Persistência dos orçamentos gerados em orcamento_api
+--
+-- Cada distribuição de um orçamento gerado com "persistir" passa a ter uma
+-- linha em orcamento_api com os itens em que aparece. escola_id,
+-- unidade_escolar_id e data_saida são copiados da distribuição no momento
+-- da gravação, para consultar os orçamentos por escola e data sem join e
+-- sem ler os arquivos em temp_orcamentos/.
+-- =============================================================================
+
+ALTER TABLE orcamento_api
+    ADD COLUMN IF NOT EXISTS escola_id INTEGER,
+    ADD COLUMN IF NOT EXISTS unidade_escolar_id INTEGER,
+    ADD COLUMN IF NOT EXISTS data_saida DATE,
+    ADD COLUMN IF NOT EXISTS atualizado_em TIMESTAMP;
+
+-- Backfill das linhas existentes
+UPDATE orcamento_api oa
+SET escola_id = ue.escola_id,
+    unidade_escolar_id = dm.unidade_escolar_id,
+    data_saida = dm.data_saida
+FROM distribuicao_materiais dm
+JOIN unidades_escolares ue ON ue.id = dm.unidade_escolar_id
+WHERE dm.id = oa.distribuicao_material_id
+  AND oa.escola_id IS NULL;
+
+CREATE INDEX IF NOT EXISTS idx_orcamento_api_escola_data_saida
+    ON orcamento_api (escola_id, data_saida);
+
+ANALYZE orcamento_api;
@@ -0,0 +1,50 @@
+-- =============================================================================
+-- 005 - tipo_formulario normalizado em formularios
+--
+-- A cascata filtrava com UPPER(f.tipo_formulario) = UPPER(:tipo_formulario),
+-- o que obriga a ler todos os formulários. tipo_formulario_norm guarda o
+-- valor canônico (sem espaços nas pontas, em maiúsculas), mantido por
+-- trigger na escrita, e é indexado; as queries comparam com o parâmetro
+-- normalizado da mesma forma.
+--
+-- O backfill atualiza todas as linhas de formularios; em tabelas grandes
+-- aplique em janela de manutenção.
+-- =============================================================================
+
+ALTER TABLE formularios
+    ADD COLUMN IF NOT EXISTS tipo_formulario_norm VARCHAR;
+
+CREATE OR REPLACE FUNCTION normalizar_tipo_formulario(valor text)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT upper(btrim(valor));
+$$;
+
+CREATE OR REPLACE FUNCTION atualizar_formularios_tipo_formulario_norm()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.tipo_formulario_norm := normalizar_tipo_formulario(NEW.tipo_formulario);
+    RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_formularios_tipo_formulario_norm ON formularios;
+CREATE TRIGGER trg_formularios_tipo_formulario_norm
+    BEFORE INSERT OR UPDATE OF tipo_formulario, tipo_formulario_norm
+    ON formularios
+    FOR EACH ROW
+    EXECUTE FUNCTION atualizar_formularios_tipo_formulario_norm();
+
+-- Backfill
+UPDATE formularios
+SET tipo_formulario_norm = normalizar_tipo_formulario(tipo_formulario)
+WHERE tipo_formulario_norm IS DISTINCT FROM normalizar_tipo_formulario(tipo_formulario);
+
+CREATE INDEX IF NOT EXISTS idx_formularios_tipo_formulario_norm
+    ON formularios (tipo_formulario_norm, id);
+
+ANALYZE formularios;
@@ -0,0 +1,352 @@
+-- =============================================================================
+-- 006 - Resumo de pedidos por escola mantido na escrita
+--
+-- O dashboard contava os pedidos de cada escola com COUNT(DISTINCT) sobre
+-- todas as distribuições a cada carregamento. Os totais passam a ficar em
+-- duas tabelas mantidas por triggers de comando (FOR EACH STATEMENT, com
+-- tabelas de transição) em distribuicao_materiais:
+--
+-- - resumo_pedidos_escola_formulario: uma linha por (escola, formulário)
+--   com contagens e quantidades; recebe apenas a diferença de cada comando,
+--   o que mantém a contagem distinta de pedidos sem reler a escola;
+-- - resumo_pedidos_escola: uma linha por escola (lida pelo dashboard),
+--   recalculada a partir da tabela acima para as escolas afetadas.
+--
+-- Pedido = formulário com distribuições para unidades da escola; pendente
+-- se alguma distribuição está 'pendente', concluído se todas estão
+-- 'concluido'. Escritas concorrentes na mesma escola são serializadas por
+-- advisory lock de transação. Mudanças que os triggers não alcançam são
+-- corrigidas pela reconciliação periódica (ResumoPedidosService).
+-- =============================================================================
+
+CREATE TABLE IF NOT EXISTS resumo_pedidos_escola_formulario (
+    escola_id INTEGER NOT NULL,
+    formulario_id INTEGER NOT NULL,
+    distribuicoes INTEGER NOT NULL DEFAULT 0,
+    distribuicoes_pendentes INTEGER NOT NULL DEFAULT 0,
+    distribuicoes_concluidas INTEGER NOT NULL DEFAULT 0,
+    quantidade BIGINT NOT NULL DEFAULT 0,
+    quantidade_pendente BIGINT NOT NULL DEFAULT 0,
+    quantidade_concluida BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (escola_id, formulario_id)
+);
+
+CREATE TABLE IF NOT EXISTS resumo_pedidos_escola (
+    escola_id INTEGER PRIMARY KEY,
+    total_pedidos INTEGER NOT NULL,
+    pedidos_pendentes INTEGER NOT NULL,
+    pedidos_concluidos INTEGER NOT NULL,
+    total_distribuicoes INTEGER NOT NULL,
+    distribuicoes_pendentes INTEGER NOT NULL,
+    distribuicoes_concluidas INTEGER NOT NULL,
+    quantidade_total BIGINT NOT NULL,
+    quantidade_pendente BIGINT NOT NULL,
+    quantidade_concluida BIGINT NOT NULL,
+    atualizado_em TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- -----------------------------------------------------------------------------
+-- Cálculo a partir das distribuições (NULL = todas as escolas)
+-- -----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION calcular_resumo_pedidos_formulario(escola_ids integer[])
+RETURNS TABLE (
+    escola_id integer,
+    formulario_id integer,
+    distribuicoes integer,
+    distribuicoes_pendentes integer,
+    distribuicoes_concluidas integer,
+    quantidade bigint,
+    quantidade_pendente bigint,
+    quantidade_concluida bigint
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        ue.escola_id,
+        dm.formulario_id,
+        COUNT(*)::integer,
+        (COUNT(*) FILTER (WHERE dm.status_distribuicao = 'pendente'))::integer,
+        (COUNT(*) FILTER (WHERE dm.status_distribuicao = 'concluido'))::integer,
+        COALESCE(SUM(dm.quantidade), 0)::bigint,
+        COALESCE(SUM(dm.quantidade) FILTER (WHERE dm.status_distribuicao = 'pendente'), 0)::bigint,
+        COALESCE(SUM(dm.quantidade) FILTER (WHERE dm.status_distribuicao = 'concluido'), 0)::bigint
+    FROM distribuicao_materiais dm
+    JOIN unidades_escolares ue ON ue.id = dm.unidade_escolar_id
+    WHERE escola_ids IS NULL OR ue.escola_id = ANY(escola_ids)
+    GROUP BY ue.escola_id, dm.formulario_id;
+$$;
+
+-- Totais por escola a partir de resumo_pedidos_escola_formulario
+CREATE OR REPLACE FUNCTION calcular_resumo_pedidos_escola(escola_ids integer[])
+RETURNS TABLE (
+    escola_id integer,
+    total_pedidos integer,
+    pedidos_pendentes integer,
+    pedidos_concluidos integer,
+    total_distribuicoes integer,
+    distribuicoes_pendentes integer,
+    distribuicoes_concluidas integer,
+    quantidade_total bigint,
+    quantidade_pendente bigint,
+    quantidade_concluida bigint
+)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        rf.escola_id,
+        COUNT(*)::integer,
+        (COUNT(*) FILTER (WHERE rf.distribuicoes_pendentes > 0))::integer,
+        (COUNT(*) FILTER (WHERE rf.distribuicoes_concluidas = rf.distribuicoes))::integer,
+        SUM(rf.distribuicoes)::integer,
+        SUM(rf.distribuicoes_pendentes)::integer,
+        SUM(rf.distribuicoes_concluidas)::integer,
+        SUM(rf.quantidade)::bigint,
+        SUM(rf.quantidade_pendente)::bigint,
+        SUM(rf.quantidade_concluida)::bigint
+    FROM resumo_pedidos_escola_formulario rf
+    WHERE escola_ids IS NULL OR rf.escola_id = ANY(escola_ids)
+    GROUP BY rf.escola_id;
+$$;
+
+-- -----------------------------------------------------------------------------
+-- Manutenção
+-- -----------------------------------------------------------------------------
+
+-- Serializa as escritas no resumo das escolas até o fim da transação (em
+-- ordem de escola_id, para evitar deadlock entre comandos com várias escolas)
+CREATE OR REPLACE FUNCTION travar_resumo_pedidos(escola_ids integer[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('resumo_pedidos_escola'), id)
+    FROM (SELECT DISTINCT id FROM unnest(escola_ids) AS id WHERE id IS NOT NULL ORDER BY id) escolas;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION atualizar_resumo_pedidos_escola(escola_ids integer[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM resumo_pedidos_escola r
+    WHERE r.escola_id = ANY(escola_ids)
+      AND NOT EXISTS (
+          SELECT 1 FROM resumo_pedidos_escola_formulario rf WHERE rf.escola_id = r.escola_id
+      );
+
+    INSERT INTO resumo_pedidos_escola (
+        escola_id, total_pedidos, pedidos_pendentes, pedidos_concluidos,
+        total_distribuicoes, distribuicoes_pendentes, distribuicoes_concluidas,
+        quantidade_total, quantidade_pendente, quantidade_concluida, atualizado_em
+    )
+    SELECT c.*, now()
+    FROM calcular_resumo_pedidos_escola(escola_ids) c
+    ON CONFLICT (escola_id) DO UPDATE
+    SET total_pedidos = EXCLUDED.total_pedidos,
+        pedidos_pendentes = EXCLUDED.pedidos_pendentes,
+        pedidos_concluidos = EXCLUDED.pedidos_concluidos,
+        total_distribuicoes = EXCLUDED.total_distribuicoes,
+        distribuicoes_pendentes = EXCLUDED.distribuicoes_pendentes,
+        distribuicoes_concluidas = EXCLUDED.distribuicoes_concluidas,
+        quantidade_total = EXCLUDED.quantidade_total,
+        quantidade_pendente = EXCLUDED.quantidade_pendente,
+        quantidade_concluida = EXCLUDED.quantidade_concluida,
+        atualizado_em = EXCLUDED.atualizado_em;
+END;
+$$;
+
+-- Refaz o resumo das escolas a partir das distribuições (reconciliação)
+CREATE OR REPLACE FUNCTION recalcular_resumo_pedidos(escola_ids integer[])
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM travar_resumo_pedidos(escola_ids);
+
+    DELETE FROM resumo_pedidos_escola_formulario WHERE escola_id = ANY(escola_ids);
+
+    INSERT INTO resumo_pedidos_escola_formulario
+    SELECT * FROM calcular_resumo_pedidos_formulario(escola_ids);
+
+    PERFORM atualizar_resumo_pedidos_escola(escola_ids);
+END;
+$$;
+
+-- -----------------------------------------------------------------------------
+-- Triggers em distribuicao_materiais
+-- -----------------------------------------------------------------------------
+
+-- Aplica a diferença do comando: linhas novas somam, linhas antigas subtraem.
+-- Comandos que não mudam escola, formulário, status nem quantidade (ex.:
+-- apenas atualizado_em) resultam em diferença vazia e não escrevem nada.
+CREATE OR REPLACE FUNCTION aplicar_delta_resumo_pedidos()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    linhas text;
+    delta jsonb;
+    escolas integer[];
+BEGIN
+    linhas := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sinal, * FROM novas'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sinal, * FROM antigas'
+        ELSE 'SELECT 1 AS sinal, * FROM novas UNION ALL SELECT -1 AS sinal, * FROM antigas'
+    END;
+
+    EXECUTE format($q$
+        SELECT jsonb_agg(d)
+        FROM (
+            SELECT
+                ue.escola_id,
+                l.formulario_id,
+                SUM(l.sinal) AS distribuicoes,
+                COALESCE(SUM(l.sinal) FILTER (WHERE l.status_distribuicao = 'pendente'), 0) AS distribuicoes_pendentes,
+                COALESCE(SUM(l.sinal) FILTER (WHERE l.status_distribuicao = 'concluido'), 0) AS distribuicoes_concluidas,
+                COALESCE(SUM(l.sinal * l.quantidade), 0) AS quantidade,
+                COALESCE(SUM(l.sinal * l.quantidade) FILTER (WHERE l.status_distribuicao = 'pendente'), 0) AS quantidade_pendente,
+                COALESCE(SUM(l.sinal * l.quantidade) FILTER (WHERE l.status_distribuicao = 'concluido'), 0) AS quantidade_concluida
+            FROM (%s) l
+            JOIN unidades_escolares ue ON ue.id = l.unidade_escolar_id
+            GROUP BY ue.escola_id, l.formulario_id
+        ) d
+        WHERE (d.distribuicoes, d.distribuicoes_pendentes, d.distribuicoes_concluidas,
+               d.quantidade, d.quantidade_pendente, d.quantidade_concluida) <> (0, 0, 0, 0, 0, 0)
+    $q$, linhas) INTO delta;
+
+    IF delta IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    escolas := ARRAY(SELECT DISTINCT (e->>'escola_id')::integer FROM jsonb_array_elements(delta) e);
+    PERFORM travar_resumo_pedidos(escolas);
+
+    INSERT INTO resumo_pedidos_escola_formulario AS rf (
+        escola_id, formulario_id, distribuicoes, distribuicoes_pendentes, distribuicoes_concluidas,
+        quantidade, quantidade_pendente, quantidade_concluida
+    )
+    SELECT d.*
+    FROM jsonb_to_recordset(delta) AS d(
+        escola_id integer,
+        formulario_id integer,
+        distribuicoes integer,
+        distribuicoes_pendentes integer,
+        distribuicoes_concluidas integer,
+        quantidade bigint,
+        quantidade_pendente bigint,
+        quantidade_concluida bigint
+    )
+    ON CONFLICT (escola_id, formulario_id) DO UPDATE
+    SET distribuicoes = rf.distribuicoes + EXCLUDED.distribuicoes,
+        distribuicoes_pendentes = rf.distribuicoes_pendentes + EXCLUDED.distribuicoes_pendentes,
+        distribuicoes_concluidas = rf.distribuicoes_concluidas + EXCLUDED.distribuicoes_concluidas,
+        quantidade = rf.quantidade + EXCLUDED.quantidade,
+        quantidade_pendente = rf.quantidade_pendente + EXCLUDED.quantidade_pendente,
+        quantidade_concluida = rf.quantidade_concluida + EXCLUDED.quantidade_concluida;
+
+    DELETE FROM resumo_pedidos_escola_formulario
+    WHERE escola_id = ANY(escolas)
+      AND distribuicoes <= 0;
+
+    PERFORM atualizar_resumo_pedidos_escola(escolas);
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION limpar_resumo_pedidos()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE resumo_pedidos_escola_formulario, resumo_pedidos_escola;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_distribuicao_materiais_resumo_insert ON distribuicao_materiais;
+CREATE TRIGGER trg_distribuicao_materiais_resumo_insert
+    AFTER INSERT ON distribuicao_materiais
+    REFERENCING NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION aplicar_delta_resumo_pedidos();
+
+DROP TRIGGER IF EXISTS trg_distribuicao_materiais_resumo_update ON distribuicao_materiais;
+CREATE TRIGGER trg_distribuicao_materiais_resumo_update
+    AFTER UPDATE ON distribuicao_materiais
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION aplicar_delta_resumo_pedidos();
+
+DROP TRIGGER IF EXISTS trg_distribuicao_materiais_resumo_delete ON distribuicao_materiais;
+CREATE TRIGGER trg_distribuicao_materiais_resumo_delete
+    AFTER DELETE ON distribuicao_materiais
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION aplicar_delta_resumo_pedidos();
+
+DROP TRIGGER IF EXISTS trg_distribuicao_materiais_resumo_truncate ON distribuicao_materiais;
+CREATE TRIGGER trg_distribuicao_materiais_resumo_truncate
+    AFTER TRUNCATE ON distribuicao_materiais
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION limpar_resumo_pedidos();
+
+-- -----------------------------------------------------------------------------
+-- Trigger em unidades_escolares: unidade movida de escola ou excluída
+-- -----------------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION recalcular_resumo_pedidos_unidades()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    escolas integer[];
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        escolas := ARRAY(SELECT DISTINCT escola_id FROM antigas);
+    ELSE
+        escolas := ARRAY(
+            SELECT o.escola_id
+            FROM antigas o
+            JOIN novas n ON n.id = o.id
+            WHERE n.escola_id IS DISTINCT FROM o.escola_id
+            UNION
+            SELECT n.escola_id
+            FROM antigas o
+            JOIN novas n ON n.id = o.id
+            WHERE n.escola_id IS DISTINCT FROM o.escola_id
+        );
+    END IF;
+
+    IF cardinality(escolas) > 0 THEN
+        PERFORM recalcular_resumo_pedidos(escolas);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_unidades_escolares_resumo_update ON unidades_escolares;
+CREATE TRIGGER trg_unidades_escolares_resumo_update
+    AFTER UPDATE ON unidades_escolares
+    REFERENCING OLD TABLE AS antigas NEW TABLE AS novas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION recalcular_resumo_pedidos_unidades();
+
+DROP TRIGGER IF EXISTS trg_unidades_escolares_resumo_delete ON unidades_escolares;
+CREATE TRIGGER trg_unidades_escolares_resumo_delete
+    AFTER DELETE ON unidades_escolares
+    REFERENCING OLD TABLE AS antigas
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION recalcular_resumo_pedidos_unidades();
+
+-- Carga inicial
+TRUNCATE resumo_pedidos_escola_formulario, resumo_pedidos_escola;
+
+INSERT INTO resumo_pedidos_escola_formulario
+SELECT * FROM calcular_resumo_pedidos_formulario(NULL);
+
+SELECT atualizar_resumo_pedidos_escola(ARRAY(SELECT DISTINCT escola_id FROM resumo_pedidos_escola_formulario));
+
+ANALYZE resumo_pedidos_escola_formulario;
+ANALYZE resumo_pedidos_escola;
@@ -0,0 +1,72 @@
+-- =============================================================================
+-- 007 - Notificação das mudanças no resumo de pedidos por escola
+--
+-- Cada mudança em resumo_pedidos_escola (migração 006, mantido a partir de
+-- distribuicao_materiais) envia um NOTIFY no canal resumo_pedidos_escola
+-- com a linha nova em JSON. A aplicação escuta o canal com uma conexão por
+-- processo e repassa as mudanças aos clientes do dashboard por SSE
+-- (GET /api/dashboard/eventos), em vez de cada cliente refazer a consulta.
+--
+-- Payloads:
+--   {"tipo": "escola", "escola_id": ..., "nome_escola": ..., ...}  linha nova
+--   {"tipo": "escola_removida", "escola_id": ...}                   sem pedidos
+--   {"tipo": "sincronizar"}                                          resumo esvaziado
+--
+-- As notificações são entregues no commit; transações desfeitas não notificam.
+-- =============================================================================
+
+CREATE OR REPLACE FUNCTION notificar_resumo_pedidos_escola()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify(
+            'resumo_pedidos_escola',
+            jsonb_build_object('tipo', 'escola_removida', 'escola_id', OLD.escola_id)::text
+        );
+    ELSE
+        PERFORM pg_notify(
+            'resumo_pedidos_escola',
+            (
+                jsonb_build_object(
+                    'tipo', 'escola',
+                    'nome_escola', (SELECT e.nome FROM escolas e WHERE e.id = NEW.escola_id),
+                    'codigo_escola', (SELECT e.codigo FROM escolas e WHERE e.id = NEW.escola_id)
+                ) || to_jsonb(NEW)
+            )::text
+        );
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION notificar_resumo_pedidos_limpo()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('resumo_pedidos_escola', jsonb_build_object('tipo', 'sincronizar')::text);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS trg_resumo_pedidos_escola_notificar ON resumo_pedidos_escola;
+CREATE TRIGGER trg_resumo_pedidos_escola_notificar
+    AFTER INSERT OR DELETE ON resumo_pedidos_escola
+    FOR EACH ROW
+    EXECUTE FUNCTION notificar_resumo_pedidos_escola();
+
+-- Recalcular uma escola sem mudança nos totais só altera atualizado_em: não notifica
+DROP TRIGGER IF EXISTS trg_resumo_pedidos_escola_notificar_update ON resumo_pedidos_escola;
+CREATE TRIGGER trg_resumo_pedidos_escola_notificar_update
+    AFTER UPDATE ON resumo_pedidos_escola
+    FOR EACH ROW
+    WHEN (to_jsonb(OLD) - 'atualizado_em' IS DISTINCT FROM to_jsonb(NEW) - 'atualizado_em')
+    EXECUTE FUNCTION notificar_resumo_pedidos_escola();
+
+DROP TRIGGER IF EXISTS trg_resumo_pedidos_escola_notificar_truncate ON resumo_pedidos_escola;
+CREATE TRIGGER trg_resumo_pedidos_escola_notificar_truncate
+    AFTER TRUNCATE ON resumo_pedidos_escola
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notificar_resumo_pedidos_limpo();
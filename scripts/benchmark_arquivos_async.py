@@ -0,0 +1,216 @@
+"""
+Latência de outras requisições durante operações grandes com arquivos de orçamento
+
+Enquanto um arquivo grande é gravado (salvar_orcamento) ou o índice é
+reconstruído (reindexar), uma sonda chama GET /healthz da aplicação a cada
+poucos milissegundos, no mesmo event loop, e mede quanto cada chamada
+demorou desde o momento em que deveria ter começado. Cada operação roda de
+duas formas:
+
+- "bloqueante": o método síncrono chamado dentro da corrotina, como as
+  rotas async faziam antes;
+- "async": a variante *_async, executada no pool de I/O do serviço.
+
+Com a variante async a latência da sonda deve ficar próxima da medida com
+o servidor ocioso. Os arquivos são gravados em um diretório temporário,
+removido ao final; o banco de dados não é acessado.
+
+Uso:
+    python scripts/benchmark_arquivos_async.py
+    python scripts/benchmark_arquivos_async.py --unidades 4000 --itens 60 --limite-ms 50
+"""
+import sys
+import json
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Awaitable
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from main import app
+from app.services.arquivo_orcamento_service import ArquivoOrcamentoService
+
+INTERVALO_SONDA = 0.005
+
+
+def gerar_orcamentos(unidades: int, itens: int) -> List[str]:
+    """
+    Monta orçamentos fictícios já serializados (como no modo JSON do controller)
+
+    Returns:
+        Lista de textos JSON, um por unidade
+    """
+    orcamentos = []
+    for unidade in range(unidades):
+        orcamentos.append(json.dumps({
+            "url": "https://exemplo.invalido/api/orcamento",
+            "identifier": "BENCHMARK",
+            "user": "benchmark",
+            "password": "benchmark",
+            "data": {
+                "cliente": f"UNIDADE {unidade:05d}",
+                "observacao": f"Orçamento fictício da unidade {unidade}",
+                "itens": [
+                    {
+                        "produto": f"PRODUTO-{item:04d}",
+                        "quantidade": (unidade * 7 + item * 13) % 500 + 1,
+                        "formulario": f"FORMULARIO {item % 17}",
+                        "distribuicao_material_ids": [unidade * itens + item],
+                    }
+                    for item in range(itens)
+                ],
+            },
+        }, ensure_ascii=False))
+    return orcamentos
+
+
+async def chamar_healthz() -> int:
+    """Executa GET /healthz direto na aplicação ASGI e retorna o status HTTP"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/healthz",
+        "raw_path": b"/healthz",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    respostas: List[int] = []
+
+    async def receive() -> Dict[str, Any]:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(mensagem: Dict[str, Any]) -> None:
+        if mensagem["type"] == "http.response.start":
+            respostas.append(mensagem["status"])
+
+    await app(scope, receive, send)
+    return respostas[0]
+
+
+async def sondar(parar: asyncio.Event, latencias: List[float]) -> None:
+    """
+    Chama /healthz até `parar` ser sinalizado
+
+    A latência conta a partir do instante em que a chamada deveria ter
+    começado: se o event loop estiver travado, o atraso entra na medida.
+    """
+    while not parar.is_set():
+        previsto = time.perf_counter() + INTERVALO_SONDA
+        await asyncio.sleep(INTERVALO_SONDA)
+        status = await chamar_healthz()
+        if status != 200:
+            raise RuntimeError(f"/healthz retornou {status}")
+        latencias.append((time.perf_counter() - previsto) * 1000)
+
+
+async def medir(operacao: Callable[[], Awaitable[Any]]) -> Dict[str, float]:
+    """
+    Executa a operação com a sonda rodando em paralelo
+
+    Returns:
+        Duração da operação e percentis da latência da sonda (ms)
+    """
+    latencias: List[float] = []
+    parar = asyncio.Event()
+    sonda = asyncio.create_task(sondar(parar, latencias))
+    await asyncio.sleep(INTERVALO_SONDA * 4)
+
+    inicio = time.perf_counter()
+    await operacao()
+    duracao = time.perf_counter() - inicio
+
+    parar.set()
+    await sonda
+    latencias.sort()
+    return {
+        "duracao_ms": duracao * 1000,
+        "chamadas": len(latencias),
+        "p50_ms": statistics.median(latencias),
+        "p99_ms": latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))],
+        "max_ms": latencias[-1],
+    }
+
+
+def imprimir(nome: str, resultado: Dict[str, float]) -> None:
+    print(
+        f"{nome:<24} {resultado['duracao_ms']:>10.0f} {resultado['chamadas']:>8} "
+        f"{resultado['p50_ms']:>8.1f} {resultado['p99_ms']:>8.1f} {resultado['max_ms']:>8.1f}"
+    )
+
+
+async def benchmark(unidades: int, itens: int, arquivos: int, limite_ms: float) -> bool:
+    """
+    Compara a latência da sonda com as operações bloqueantes e async
+
+    Returns:
+        True se a latência p99 com as operações async ficou abaixo do limite
+    """
+    orcamentos = gerar_orcamentos(unidades, itens)
+    tamanho_mb = sum(len(orcamento) for orcamento in orcamentos) / 1024 / 1024
+    print(f"Arquivo de teste: {unidades} unidade(s), {tamanho_mb:.1f} MB de JSON; {arquivos} arquivo(s) no diretório")
+
+    async def ocioso():
+        await asyncio.sleep(1)
+
+    async def salvar_bloqueante():
+        ArquivoOrcamentoService.salvar_orcamento(orcamentos, 1, [1], json_bruto=True)
+
+    async def salvar_async():
+        await ArquivoOrcamentoService.salvar_orcamento_async(orcamentos, 1, [1], json_bruto=True)
+
+    async def reindexar_bloqueante():
+        ArquivoOrcamentoService.reindexar()
+
+    async def reindexar_async():
+        await ArquivoOrcamentoService.reindexar_async()
+
+    await chamar_healthz()  # aquece a aplicação antes das medidas
+    print(f"\n{'operação':<24} {'duração':>10} {'chamadas':>8} {'p50':>8} {'p99':>8} {'máx':>8}  (ms)")
+    imprimir("ocioso", await medir(ocioso))
+    imprimir("salvar bloqueante", await medir(salvar_bloqueante))
+    salvar = await medir(salvar_async)
+    imprimir("salvar async", salvar)
+
+    # Arquivos menores para a reconstrução do índice
+    for _ in range(arquivos):
+        ArquivoOrcamentoService.salvar_orcamento(orcamentos[:50], 2, [2], json_bruto=True)
+    imprimir("reindexar bloqueante", await medir(reindexar_bloqueante))
+    reindexar = await medir(reindexar_async)
+    imprimir("reindexar async", reindexar)
+
+    aprovado = salvar["p99_ms"] <= limite_ms and reindexar["p99_ms"] <= limite_ms
+    print(f"\n{'✅' if aprovado else '❌'} p99 da sonda com operações async: "
+          f"salvar {salvar['p99_ms']:.1f} ms, reindexar {reindexar['p99_ms']:.1f} ms (limite {limite_ms:.0f} ms)")
+    return aprovado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Latência do event loop durante I/O de arquivos de orçamento')
+    parser.add_argument('--unidades', type=int, default=3000, help='Unidades (orçamentos) no arquivo grande')
+    parser.add_argument('--itens', type=int, default=40, help='Itens por orçamento')
+    parser.add_argument('--arquivos', type=int, default=300, help='Arquivos no diretório ao reindexar')
+    parser.add_argument('--limite-ms', type=float, default=50, help='p99 máximo aceito para as operações async')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    diretorio = Path(tempfile.mkdtemp(prefix="benchmark_orcamentos_"))
+    ArquivoOrcamentoService.TEMP_DIR = diretorio
+    try:
+        aprovado = asyncio.run(benchmark(args.unidades, args.itens, args.arquivos, args.limite_ms))
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    sys.exit(0 if aprovado else 1)
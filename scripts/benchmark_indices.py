@@ -0,0 +1,234 @@
+"""
+Benchmark antes/depois dos índices da migração 002 (orçamento e cascata)
+
+Para cada escola do conjunto sintético (scripts/dataset_sintetico.py)
+executa EXPLAIN (ANALYZE, BUFFERS) das queries de orçamento (v1 e v2) e da
+cascata duas vezes:
+
+- "antes": dentro de uma transação que remove os índices da migração 002
+  (DROP INDEX é transacional no PostgreSQL) e é desfeita com ROLLBACK;
+- "depois": com os índices criados.
+
+Mostra tempo, buffers e os nós do plano que mudaram (índices usados e
+Seq Scans nas tabelas indexadas).
+
+ATENÇÃO: DROP INDEX bloqueia as tabelas durante a transação e --ampliar
+insere dados fictícios; use apenas em um banco de dados descartável, com
+a migração 002 aplicada (python migrate.py).
+
+Uso:
+    python scripts/benchmark_indices.py --popular --ampliar 40 --confirmar
+    python scripts/benchmark_indices.py --repeticoes 5
+"""
+import sys
+import argparse
+from datetime import date
+from pathlib import Path
+from typing import Dict, Any, List, Set
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config.database import SessionLocal, engine
+from app.services.orcamento_service import OrcamentoService, QUERIES_ORCAMENTO
+from app.services.cascata_service import QUERY_CASCATA
+
+from dataset_sintetico import popular, obter_existente, medir_explain
+
+# Índices criados por migrations/002_indices_orcamento_cascata.sql
+INDICES_MIGRACAO = (
+    "idx_distribuicao_materiais_pendente_unidade",
+    "idx_distribuicao_materiais_unidade_arquivo",
+    "idx_distribuicao_materiais_arquivo_pdf_id",
+    "idx_distribuicao_materiais_especificacao_status",
+    "idx_distribuicao_materiais_formulario_status",
+    "idx_arquivo_pdfs_item_pedido_id",
+    "idx_arquivo_pdfs_pares_formulario",
+)
+
+TABELAS_INDEXADAS = ("distribuicao_materiais", "arquivo_pdfs")
+
+
+def ampliar(conn, fator: int) -> int:
+    """
+    Adiciona histórico às distribuições sintéticas
+
+    Cada distribuição ganha `fator` cópias já concluídas, com datas de saída
+    no ano anterior, para que as pendentes sejam uma fração pequena da
+    tabela (como em produção).
+
+    Returns:
+        Quantidade de linhas inseridas
+    """
+    tipo_data_saida = conn.execute(text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'distribuicao_materiais' AND column_name = 'data_saida'
+    """)).scalar()
+    expr_data_saida = "DATE '2025-01-06' + (k % 52) * 7"
+    if tipo_data_saida != "date":
+        expr_data_saida = f"TO_CHAR({expr_data_saida}, 'YYYY-MM-DD')"
+
+    resultado = conn.execute(text(f"""
+        INSERT INTO distribuicao_materiais (
+            quantidade, status_distribuicao, data_saida, formulario_id,
+            unidade_escolar_id, especificacao_form_id, arquivo_pdf_id
+        )
+        SELECT
+            dm.quantidade,
+            'concluido',
+            {expr_data_saida},
+            dm.formulario_id,
+            dm.unidade_escolar_id,
+            dm.especificacao_form_id,
+            dm.arquivo_pdf_id
+        FROM distribuicao_materiais dm
+        JOIN unidades_escolares ue ON ue.id = dm.unidade_escolar_id
+        JOIN escolas e ON e.id = ue.escola_id AND e.codigo LIKE 'SINTETICO-%'
+        CROSS JOIN generate_series(1, :fator) k
+        WHERE dm.status_distribuicao = 'pendente'
+    """), {"fator": fator})
+    for tabela in TABELAS_INDEXADAS:
+        conn.execute(text(f"ANALYZE {tabela}"))
+    return resultado.rowcount
+
+
+def montar_casos(ids: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Monta as queries medidas para cada escola
+
+    Returns:
+        Lista de casos com nome, query (texto) e parâmetros
+    """
+    datas = [date.fromisoformat(d) for d in ids["datas_saida"]]
+    casos = []
+    for escola_id in ids["escola_ids"]:
+        parametros = OrcamentoService._montar_parametros(
+            escola_id, ids_produtos=ids["ids_produtos"], datas_saida=datas
+        )
+        for versao in ("v1", "v2"):
+            casos.append({
+                "nome": f"orcamento {versao}",
+                "escola_id": escola_id,
+                "query": QUERIES_ORCAMENTO[versao].text,
+                "parametros": parametros,
+            })
+        casos.append({
+            "nome": "cascata",
+            "escola_id": escola_id,
+            "query": QUERY_CASCATA.text,
+            "parametros": {"escola_id": escola_id, "tipo_formulario": "MEMOREX"},
+        })
+    return casos
+
+
+def medir_sem_indices(db: Session, casos: List[Dict[str, Any]], repeticoes: int) -> List[Dict[str, Any]]:
+    """
+    Mede todos os casos sem os índices da migração (DROP INDEX + ROLLBACK)
+
+    Returns:
+        Métricas na mesma ordem dos casos
+    """
+    try:
+        for indice in INDICES_MIGRACAO:
+            db.execute(text(f"DROP INDEX IF EXISTS {indice}"))
+        return [medir_explain(db, caso["query"], caso["parametros"], repeticoes, TABELAS_INDEXADAS) for caso in casos]
+    finally:
+        db.rollback()
+
+
+def benchmark(repeticoes: int) -> bool:
+    """
+    Compara os planos antes e depois dos índices
+
+    Returns:
+        True se os índices da migração existirem e o benchmark rodar
+    """
+    db = SessionLocal()
+    try:
+        ids = obter_existente(db.connection())
+        if not ids:
+            print("❌ Nenhum dado sintético encontrado. Use --popular --confirmar.")
+            return False
+
+        existentes = {row[0] for row in db.execute(
+            text("SELECT indexname FROM pg_indexes WHERE indexname = ANY(:nomes)"),
+            {"nomes": list(INDICES_MIGRACAO)}
+        )}
+        faltando = [indice for indice in INDICES_MIGRACAO if indice not in existentes]
+        if faltando:
+            print(f"❌ Índices da migração 002 não encontrados: {', '.join(faltando)}. Rode python migrate.py.")
+            return False
+        linhas = db.execute(text("SELECT COUNT(*) FROM distribuicao_materiais")).scalar()
+        db.rollback()
+
+        casos = montar_casos(ids)
+        antes = medir_sem_indices(db, casos, repeticoes)
+        depois = [medir_explain(db, caso["query"], caso["parametros"], repeticoes, TABELAS_INDEXADAS) for caso in casos]
+
+        print(f"distribuicao_materiais: {linhas} linha(s)")
+        print(f"{'escola':>8} {'caso':<13} {'antes ms':>9} {'depois ms':>9} {'antes hits':>10} {'depois hits':>11}")
+        soma = {"antes": {"tempo_ms": 0.0, "hits": 0.0}, "depois": {"tempo_ms": 0.0, "hits": 0.0}}
+        planos: Dict[str, Dict[str, Set[str]]] = {}
+        for caso, m_antes, m_depois in zip(casos, antes, depois):
+            for rotulo, metricas in (("antes", m_antes), ("depois", m_depois)):
+                soma[rotulo]["tempo_ms"] += metricas["tempo_ms"]
+                soma[rotulo]["hits"] += metricas["hits"]
+                plano = planos.setdefault(f"{caso['nome']} ({rotulo})", {"indices": set(), "seq_scans": set()})
+                plano["indices"] |= metricas["indices"]
+                plano["seq_scans"] |= metricas["seq_scans"]
+            print(
+                f"{caso['escola_id']:>8} {caso['nome']:<13} "
+                f"{m_antes['tempo_ms']:>9.2f} {m_depois['tempo_ms']:>9.2f} "
+                f"{m_antes['hits']:>10.0f} {m_depois['hits']:>11.0f}"
+            )
+
+        print("-" * 80)
+        for chave, rotulo in (("tempo_ms", "Tempo total (ms)"), ("hits", "Buffers (hit)")):
+            a, d = soma["antes"][chave], soma["depois"][chave]
+            variacao = f"{(d - a) / a * 100:+.1f}%" if a else "-"
+            print(f"{rotulo:<18} antes={a:>12.2f}  depois={d:>12.2f}  diferença={variacao}")
+
+        print("-" * 80)
+        print("Nós do plano")
+        for nome, plano in planos.items():
+            print(f"  {nome}")
+            print(f"    índices:   {', '.join(sorted(plano['indices'])) or '-'}")
+            print(f"    seq scans: {', '.join(sorted(plano['seq_scans'])) or '-'}")
+        return True
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark antes/depois dos índices da migração 002')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Execuções de EXPLAIN ANALYZE por caso')
+    parser.add_argument('--popular', action='store_true', help='Popula o conjunto sintético se não existir')
+    parser.add_argument('--escolas', type=int, default=3)
+    parser.add_argument('--unidades', type=int, default=20, help='Unidades por escola')
+    parser.add_argument(
+        '--ampliar',
+        type=int,
+        default=0,
+        help='Cópias concluídas (histórico) por distribuição pendente'
+    )
+    parser.add_argument(
+        '--confirmar',
+        action='store_true',
+        help='Confirma que o banco configurado é descartável'
+    )
+    args = parser.parse_args()
+
+    if args.popular or args.ampliar:
+        if not args.confirmar:
+            print("❌ Use --confirmar para alterar o banco (apenas em bancos descartáveis).")
+            sys.exit(1)
+        with engine.begin() as conn:
+            if args.popular and not obter_existente(conn):
+                popular(conn, escolas=args.escolas, unidades_por_escola=args.unidades)
+            if args.ampliar:
+                print(f"Histórico inserido: {ampliar(conn, args.ampliar)} linha(s)")
+
+    sys.exit(0 if benchmark(args.repeticoes) else 1)
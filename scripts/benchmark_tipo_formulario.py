@@ -0,0 +1,199 @@
+"""
+Benchmark do filtro por tipo_formulario antes/depois da migração 005
+
+Compara, com EXPLAIN (ANALYZE, BUFFERS), o filtro antigo
+UPPER(f.tipo_formulario) = UPPER(:tipo_formulario) com o filtro pela
+coluna normalizada e indexada (f.tipo_formulario_norm) em:
+
+- formularios: contagem dos formulários de um tipo (o filtro isolado);
+- cascata: a cascata completa de cada escola sintética;
+- divisões: o primeiro nível da cascata (expansão por níveis).
+
+Com --ampliar, insere formulários fictícios de outros tipos para que o
+tipo filtrado seja uma fração pequena da tabela (como em produção); eles
+são identificados pelo nome e removidos com --remover.
+
+ATENÇÃO: --ampliar e --remover alteram dados; use apenas em um banco de
+dados descartável, com a migração 005 aplicada (python migrate.py).
+
+Uso:
+    python scripts/benchmark_tipo_formulario.py --ampliar 200000 --confirmar
+    python scripts/benchmark_tipo_formulario.py --repeticoes 5
+    python scripts/benchmark_tipo_formulario.py --remover --confirmar
+"""
+import sys
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List, Set
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from app.config.database import SessionLocal, engine
+from app.services.cascata_service import QUERY_CASCATA, QUERY_NIVEL_DIVISOES
+
+from dataset_sintetico import obter_existente, medir_explain
+
+NOME_FICTICIO = "BENCHMARK-TIPO-FORMULARIO"
+
+FILTRO_NOVO = "f.tipo_formulario_norm = normalizar_tipo_formulario(:tipo_formulario)"
+FILTRO_ANTIGO = "UPPER(f.tipo_formulario) = UPPER(:tipo_formulario)"
+
+QUERY_FORMULARIOS = f"SELECT COUNT(*) FROM formularios f WHERE {FILTRO_NOVO}"
+
+
+def ampliar(conn, quantidade: int) -> int:
+    """
+    Insere formulários fictícios de outros tipos
+
+    Returns:
+        Quantidade de linhas inseridas
+    """
+    resultado = conn.execute(text("""
+        INSERT INTO formularios (nome, titulo, tipo_formulario)
+        SELECT
+            :nome,
+            'Formulário fictício ' || k,
+            (ARRAY['COMERCIAL', 'zerohum', 'Apostila', 'PROVA DIGITAL'])[1 + k % 4]
+        FROM generate_series(1, :quantidade) k
+    """), {"nome": NOME_FICTICIO, "quantidade": quantidade})
+    conn.execute(text("ANALYZE formularios"))
+    return resultado.rowcount
+
+
+def remover(conn) -> int:
+    """
+    Remove os formulários fictícios inseridos por ampliar()
+
+    Returns:
+        Quantidade de linhas removidas
+    """
+    resultado = conn.execute(text("DELETE FROM formularios WHERE nome = :nome"), {"nome": NOME_FICTICIO})
+    conn.execute(text("ANALYZE formularios"))
+    return resultado.rowcount
+
+
+def montar_casos(ids: Dict[str, Any], tipo_formulario: str) -> List[Dict[str, Any]]:
+    """
+    Monta os casos medidos, cada um com a query nova e a antiga
+
+    Returns:
+        Lista de casos com nome, escola, queries (texto) e parâmetros
+    """
+    casos = [{
+        "nome": "formularios",
+        "escola_id": "-",
+        "query": QUERY_FORMULARIOS,
+        "parametros": {"tipo_formulario": tipo_formulario},
+    }]
+    for escola_id in ids["escola_ids"]:
+        parametros = {"escola_id": escola_id, "tipo_formulario": tipo_formulario}
+        casos.append({
+            "nome": "cascata",
+            "escola_id": escola_id,
+            "query": QUERY_CASCATA.text,
+            "parametros": parametros,
+        })
+        casos.append({
+            "nome": "divisões",
+            "escola_id": escola_id,
+            "query": QUERY_NIVEL_DIVISOES.text,
+            "parametros": {**parametros, "limite": 100, "offset": 0},
+        })
+    for caso in casos:
+        if FILTRO_NOVO not in caso["query"]:
+            raise RuntimeError(f"Filtro por tipo_formulario_norm não encontrado na query '{caso['nome']}'")
+        caso["query_antiga"] = caso["query"].replace(FILTRO_NOVO, FILTRO_ANTIGO)
+    return casos
+
+
+def benchmark(repeticoes: int, tipo_formulario: str) -> bool:
+    """
+    Compara o filtro antigo com o filtro pela coluna normalizada
+
+    Returns:
+        True se a migração 005 estiver aplicada e o benchmark rodar
+    """
+    db = SessionLocal()
+    try:
+        existe = db.execute(text("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name = 'formularios'
+              AND column_name = 'tipo_formulario_norm'
+        """)).scalar()
+        if not existe:
+            print("❌ Coluna formularios.tipo_formulario_norm não encontrada. Rode python migrate.py.")
+            return False
+
+        ids = obter_existente(db.connection())
+        if not ids:
+            print("❌ Nenhum dado sintético encontrado. Use scripts/benchmark_indices.py --popular --confirmar.")
+            return False
+
+        linhas = db.execute(text("SELECT COUNT(*) FROM formularios")).scalar()
+        do_tipo = db.execute(text(QUERY_FORMULARIOS), {"tipo_formulario": tipo_formulario}).scalar()
+
+        print(f"formularios: {linhas} linha(s), {do_tipo} do tipo {tipo_formulario}")
+        print(f"{'escola':>8} {'caso':<12} {'antes ms':>9} {'depois ms':>9} {'antes buf':>10} {'depois buf':>11}")
+        soma = {"antes": {"tempo_ms": 0.0, "buffers": 0.0}, "depois": {"tempo_ms": 0.0, "buffers": 0.0}}
+        planos: Dict[str, Dict[str, Set[str]]] = {}
+        for caso in montar_casos(ids, tipo_formulario):
+            m_antes = medir_explain(db, caso["query_antiga"], caso["parametros"], repeticoes, ("formularios",))
+            m_depois = medir_explain(db, caso["query"], caso["parametros"], repeticoes, ("formularios",))
+            for rotulo, metricas in (("antes", m_antes), ("depois", m_depois)):
+                metricas["buffers"] = metricas["hits"] + metricas["leituras"]
+                soma[rotulo]["tempo_ms"] += metricas["tempo_ms"]
+                soma[rotulo]["buffers"] += metricas["buffers"]
+                plano = planos.setdefault(f"{caso['nome']} ({rotulo})", {"indices": set(), "seq_scans": set()})
+                plano["indices"] |= metricas["indices"]
+                plano["seq_scans"] |= metricas["seq_scans"]
+            print(
+                f"{caso['escola_id']:>8} {caso['nome']:<12} "
+                f"{m_antes['tempo_ms']:>9.2f} {m_depois['tempo_ms']:>9.2f} "
+                f"{m_antes['buffers']:>10.0f} {m_depois['buffers']:>11.0f}"
+            )
+
+        print("-" * 80)
+        for chave, rotulo in (("tempo_ms", "Tempo total (ms)"), ("buffers", "Buffers")):
+            a, d = soma["antes"][chave], soma["depois"][chave]
+            variacao = f"{(d - a) / a * 100:+.1f}%" if a else "-"
+            print(f"{rotulo:<18} antes={a:>12.2f}  depois={d:>12.2f}  diferença={variacao}")
+
+        print("-" * 80)
+        print("Nós do plano")
+        for nome, plano in planos.items():
+            print(f"  {nome}")
+            print(f"    índices:   {', '.join(sorted(plano['indices'])) or '-'}")
+            print(f"    seq scans: {', '.join(sorted(plano['seq_scans'])) or '-'}")
+        return True
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark do filtro por tipo_formulario (migração 005)')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Execuções de EXPLAIN ANALYZE por caso')
+    parser.add_argument('--tipo-formulario', default='MEMOREX', help='Tipo filtrado (qualquer grafia)')
+    parser.add_argument('--ampliar', type=int, default=0, help='Formulários fictícios de outros tipos a inserir')
+    parser.add_argument('--remover', action='store_true', help='Remove os formulários fictícios e sai')
+    parser.add_argument(
+        '--confirmar',
+        action='store_true',
+        help='Confirma que o banco configurado é descartável'
+    )
+    args = parser.parse_args()
+
+    if args.ampliar or args.remover:
+        if not args.confirmar:
+            print("❌ Use --confirmar para alterar o banco (apenas em bancos descartáveis).")
+            sys.exit(1)
+        with engine.begin() as conn:
+            if args.remover:
+                print(f"Formulários fictícios removidos: {remover(conn)}")
+                sys.exit(0)
+            print(f"Formulários fictícios inseridos: {ampliar(conn, args.ampliar)}")
+
+    sys.exit(0 if benchmark(args.repeticoes, args.tipo_formulario) else 1)
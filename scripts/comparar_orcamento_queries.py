@@ -0,0 +1,163 @@
+"""
+Compara as versões v1 e v2 da query de orçamento
+
+Executa as duas versões sobre o mesmo banco (populado com o conjunto
+sintético de scripts/dataset_sintetico.py), verifica se os orçamentos
+gerados são idênticos em JSON e mostra a diferença de latência e de
+buffers (EXPLAIN ANALYZE, BUFFERS) entre elas. A saída da engine "python"
+(montagem a partir de linhas planas) também é comparada com a da v2: o
+texto JSON byte a byte (como repassado ao cliente e gravado em arquivo) e
+os dicts decodificados.
+
+ATENÇÃO: com --popular o script insere dados fictícios; use apenas em um
+banco de dados descartável.
+
+Uso:
+    python scripts/comparar_orcamento_queries.py --popular --confirmar
+    python scripts/comparar_orcamento_queries.py --repeticoes 5
+"""
+import sys
+import json
+import argparse
+from datetime import date
+from pathlib import Path
+from typing import Dict, Any, List
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from app.config.database import SessionLocal, engine
+from app.services.orcamento_service import OrcamentoService, QUERIES_ORCAMENTO
+from app.services.orcamento_montagem_service import OrcamentoMontagemService
+
+from dataset_sintetico import popular, obter_existente, medir_explain
+
+VERSOES = ("v1", "v2")
+
+
+def montar_casos(ids: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Monta os filtros comparados para cada escola
+
+    Returns:
+        Lista de (nome, filtros) cobrindo os parâmetros opcionais
+    """
+    datas = [date.fromisoformat(d) for d in ids["datas_saida"]]
+    produtos = ids["ids_produtos"]
+    return [
+        ("todos", dict(ids_produtos=produtos, datas_saida=datas)),
+        ("parcial", dict(ids_produtos=produtos[: len(produtos) // 2 or 1], datas_saida=datas[:2])),
+        ("divisoes", dict(ids_produtos=produtos, datas_saida=datas, divisoes_logistica=["Norte", "Sul"])),
+        ("dias_uteis", dict(ids_produtos=produtos, datas_saida=datas[1:], dias_uteis_filtro=[5])),
+    ]
+
+
+def normalizar(orcamentos: List[Dict[str, Any]]) -> str:
+    """
+    Serializa os orçamentos para comparação
+
+    A v1 não define a ordem de perguntas_gerais (json_agg sem ORDER BY);
+    apenas essa lista é ordenada antes de comparar. Todo o resto, inclusive
+    a ordem das chaves, precisa ser idêntico.
+    """
+    for orcamento in orcamentos:
+        for item in orcamento["data"]["itens"]:
+            item["perguntas_gerais"] = sorted(
+                item["perguntas_gerais"],
+                key=lambda p: (p["id_pergunta"], json.dumps(p, sort_keys=True))
+            )
+    return json.dumps(orcamentos, ensure_ascii=False)
+
+
+def comparar(repeticoes: int) -> bool:
+    """
+    Compara v1 e v2 para todas as escolas sintéticas
+
+    Returns:
+        True se todas as saídas forem idênticas
+    """
+    db = SessionLocal()
+    try:
+        ids = obter_existente(db.connection())
+        if not ids:
+            print("❌ Nenhum dado sintético encontrado. Use --popular --confirmar.")
+            return False
+
+        iguais = True
+        soma = {versao: {"tempo_ms": 0.0, "hits": 0.0, "leituras": 0.0} for versao in VERSOES}
+
+        print(f"{'escola':>8} {'caso':<11} {'unid.':>5} {'v1 ms':>9} {'v2 ms':>9} {'v1 hits':>9} {'v2 hits':>9}  resultado")
+        for escola_id in ids["escola_ids"]:
+            for nome, filtros in montar_casos(ids):
+                saidas = {
+                    versao: OrcamentoService.gerar_orcamento(
+                        db, escola_id=escola_id, versao_query=versao, **filtros
+                    )
+                    for versao in VERSOES
+                }
+                parametros = OrcamentoService._montar_parametros(escola_id, **filtros)
+                saida_python = OrcamentoMontagemService.gerar_orcamentos(db, parametros)
+                texto_python = OrcamentoMontagemService.gerar_orcamentos(db, parametros, como_texto=True)
+                texto_v2 = [
+                    row.orcamento
+                    for row in db.execute(OrcamentoService._obter_query("v2", como_texto=True), parametros)
+                    if row.orcamento
+                ]
+
+                # A engine python segue a ordem da v2: comparada antes da normalização
+                identico = texto_python == texto_v2
+                identico = identico and json.dumps(saida_python, ensure_ascii=False) == json.dumps(saidas["v2"], ensure_ascii=False)
+                identico = identico and normalizar(saidas["v1"]) == normalizar(saidas["v2"])
+                iguais = iguais and identico
+
+                metricas = {
+                    versao: medir_explain(db, QUERIES_ORCAMENTO[versao].text, parametros, repeticoes)
+                    for versao in VERSOES
+                }
+                for versao in VERSOES:
+                    for chave in soma[versao]:
+                        soma[versao][chave] += metricas[versao][chave]
+
+                print(
+                    f"{escola_id:>8} {nome:<11} {len(saidas['v1']):>5} "
+                    f"{metricas['v1']['tempo_ms']:>9.2f} {metricas['v2']['tempo_ms']:>9.2f} "
+                    f"{metricas['v1']['hits']:>9.0f} {metricas['v2']['hits']:>9.0f}  "
+                    f"{'✅ idêntico' if identico else '❌ DIFERENTE'}"
+                )
+
+        print("-" * 80)
+        for chave, rotulo in (("tempo_ms", "Tempo total (ms)"), ("hits", "Buffers (hit)"), ("leituras", "Buffers (read)")):
+            v1, v2 = soma["v1"][chave], soma["v2"][chave]
+            variacao = f"{(v2 - v1) / v1 * 100:+.1f}%" if v1 else "-"
+            print(f"{rotulo:<18} v1={v1:>12.2f}  v2={v2:>12.2f}  diferença={variacao}")
+
+        print("✅ Saídas idênticas" if iguais else "❌ Há saídas diferentes entre v1 e v2")
+        return iguais
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compara as queries de orçamento v1 e v2')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Execuções de EXPLAIN ANALYZE por caso')
+    parser.add_argument('--popular', action='store_true', help='Popula o conjunto sintético se não existir')
+    parser.add_argument('--escolas', type=int, default=3)
+    parser.add_argument('--unidades', type=int, default=20, help='Unidades por escola')
+    parser.add_argument(
+        '--confirmar',
+        action='store_true',
+        help='Confirma que o banco configurado é descartável'
+    )
+    args = parser.parse_args()
+
+    if args.popular:
+        if not args.confirmar:
+            print("❌ Use --confirmar para popular o banco (apenas em bancos descartáveis).")
+            sys.exit(1)
+        with engine.begin() as conn:
+            if not obter_existente(conn):
+                popular(conn, escolas=args.escolas, unidades_por_escola=args.unidades)
+
+    sys.exit(0 if comparar(args.repeticoes) else 1)
@@ -0,0 +1,401 @@
+"""
+Gera um conjunto de dados sintético para benchmarks e testes de equivalência
+
+ATENÇÃO: use apenas em um banco de dados descartável. O script insere
+escolas, unidades, formulários, especificações, arquivos e distribuições
+fictícias, além de um catálogo Bremen mínimo.
+
+Uso:
+    python scripts/dataset_sintetico.py --escolas 5 --unidades 40 --confirmar
+"""
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, Any, Iterable, Set
+
+# Adicionar o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Datas de saída geradas (índice 0 significa "sem data")
+DATAS_SAIDA = ["2026-02-02", "2026-02-09", "2026-02-16", "2026-03-02"]
+
+# Prefixo usado nos nomes para identificar os dados sintéticos
+PREFIXO = "SINTETICO"
+
+
+def _tipo_coluna(conn: Connection, tabela: str, coluna: str) -> str:
+    """Retorna o data_type de uma coluna no schema public"""
+    return conn.execute(text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = :tabela AND column_name = :coluna
+    """), {"tabela": tabela, "coluna": coluna}).scalar()
+
+
+def popular(
+    conn: Connection,
+    escolas: int = 3,
+    unidades_por_escola: int = 20,
+    formularios_por_escola: int = 6,
+    especificacoes_por_formulario: int = 3,
+    produtos: int = 12
+) -> Dict[str, Any]:
+    """
+    Insere o conjunto de dados sintético usando apenas INSERT ... SELECT
+
+    Os valores são derivados de generate_series com aritmética modular, de
+    forma que duas execuções com os mesmos parâmetros geram os mesmos dados.
+
+    Args:
+        conn: Conexão em transação (ex.: engine.begin())
+        escolas: Quantidade de escolas
+        unidades_por_escola: Unidades escolares por escola
+        formularios_por_escola: Formulários (pedidos) por escola
+        especificacoes_por_formulario: Especificações por formulário
+        produtos: Quantidade de produtos no catálogo Bremen
+
+    Returns:
+        Dicionário com os IDs gerados (escolas, produtos e datas)
+    """
+    parametros = {
+        "escolas": escolas,
+        "unidades": unidades_por_escola,
+        "formularios": formularios_por_escola,
+        "especificacoes": especificacoes_por_formulario,
+        "produtos": produtos,
+        "prefixo": PREFIXO,
+    }
+
+    # data_saida pode ser texto (legado) ou date (coluna já tipada)
+    tipo_data_saida = _tipo_coluna(conn, "distribuicao_materiais", "data_saida")
+    if tipo_data_saida == "date":
+        expr_data_saida = "NULLIF(d.data_txt, '')::date"
+    else:
+        expr_data_saida = "d.data_txt"
+
+    # Catálogo Bremen: itens, componentes, perguntas, respostas
+    conn.execute(text("""
+        INSERT INTO bremen_itens (id_produto, descricao, "categoria_Prod", frente_verso, is_ativo, is_conveniado)
+        SELECT
+            900000 + g,
+            :prefixo || ' PRODUTO ' || g,
+            (ARRAY['Prova', 'Apostila', 'Livreto', 'Avulso'])[1 + g % 4],
+            (ARRAY['FV', 'SF', NULL])[1 + g % 3],
+            true,
+            false
+        FROM generate_series(1, :produtos) g
+    """), parametros)
+
+    conn.execute(text("""
+        INSERT INTO bremen_componentes (id_produto, id_componente, descricao, is_capa, is_miolo)
+        SELECT
+            bi.id_produto,
+            bi.id_produto * 10 + k,
+            (ARRAY['Capa', 'Miolo', 'Encarte'])[k],
+            k = 1,
+            k = 2
+        FROM bremen_itens bi
+        CROSS JOIN generate_series(1, 3) k
+        WHERE bi.id_produto > 900000
+          AND (k < 3 OR bi.id_produto % 2 = 0)
+    """))
+
+    conn.execute(text("""
+        INSERT INTO bremen_perguntas (id_pergunta, id_componente, id_geral, nome, tipo)
+        SELECT
+            bc.id_componente * 10 + k,
+            bc.id_componente,
+            NULL,
+            'Pergunta componente ' || k,
+            (ARRAY['lista', 'texto'])[1 + k % 2]
+        FROM bremen_componentes bc
+        CROSS JOIN generate_series(1, 2) k
+        WHERE bc.id_produto > 900000
+        UNION ALL
+        SELECT
+            bi.id_produto * 100 + k,
+            NULL,
+            bi.id_produto,
+            'Pergunta geral ' || k,
+            'lista'
+        FROM bremen_itens bi
+        CROSS JOIN generate_series(1, 2) k
+        WHERE bi.id_produto > 900000
+    """))
+
+    conn.execute(text("""
+        INSERT INTO bremen_respostas (id_resposta, pergunta_id, valor, descricao_opcao)
+        SELECT
+            bp.id_pergunta * 10 + k,
+            bp.id,
+            'v' || k,
+            'Opção ' || k || ' da pergunta ' || bp.id_pergunta
+        FROM bremen_perguntas bp
+        CROSS JOIN generate_series(1, 3) k
+        WHERE bp.id_pergunta > 9000000
+    """))
+
+    conn.execute(text("""
+        INSERT INTO bremen_gramatura (id_item, gramatura, unidade_medida)
+        SELECT bi.id_produto, 75 + (bi.id_produto % 3) * 15, 'g/m²'
+        FROM bremen_itens bi
+        WHERE bi.id_produto > 900000
+        ON CONFLICT DO NOTHING
+    """))
+
+    conn.execute(text("""
+        INSERT INTO bremen_tamanho_papel (largura, altura, label)
+        VALUES (210, 297, 'A4'), (148, 210, 'A5'), (297, 420, 'A3')
+        ON CONFLICT DO NOTHING
+    """))
+
+    # Escolas e unidades
+    escola_ids = [row[0] for row in conn.execute(text("""
+        INSERT INTO escolas (nome, codigo, tipo_escola, status)
+        SELECT :prefixo || ' ESCOLA ' || g, :prefixo || '-' || g, 'privada', 'ativo'
+        FROM generate_series(1, :escolas) g
+        RETURNING id
+    """), parametros)]
+
+    conn.execute(text("""
+        INSERT INTO unidades_escolares (nome, tipo_unidade, status, escola_id, divisao_logistica, dias_uteis, cliente_id, forma_pagamento)
+        SELECT
+            e.nome || ' UNIDADE ' || g,
+            'sede',
+            'ativo',
+            e.id,
+            (ARRAY['Norte', 'Sul', 'Leste', NULL])[1 + g % 4],
+            (ARRAY[3, 5, NULL])[1 + g % 3],
+            50000 + e.id * 1000 + g,
+            '11'
+        FROM escolas e
+        CROSS JOIN generate_series(1, :unidades) g
+        WHERE e.codigo LIKE :prefixo || '-%'
+    """), parametros)
+
+    # Formulários e especificações
+    conn.execute(text("""
+        INSERT INTO formularios (nome, titulo, tipo_formulario, cliente_id)
+        SELECT
+            e.nome,
+            'Pedido ' || g,
+            (ARRAY['MEMOREX', 'memorex', 'COMERCIAL'])[1 + g % 3],
+            e.id
+        FROM escolas e
+        CROSS JOIN generate_series(1, :formularios) g
+        WHERE e.codigo LIKE :prefixo || '-%'
+    """), parametros)
+
+    conn.execute(text("""
+        INSERT INTO especificacoes_form (
+            nome_item, quantidade, formulario_id, id_produto,
+            altura, largura, gramatura_miolo, id_gramatura, id_papel, corfrente, corverso
+        )
+        SELECT
+            'Item ' || g,
+            1,
+            f.id,
+            900001 + (f.id * 7 + g) % :produtos,
+            (ARRAY['297', '', '210.5', NULL])[1 + (f.id + g) % 4],
+            (ARRAY['210', '', '148', NULL])[1 + (f.id + g) % 4],
+            (ARRAY['75g', '', '90,5 g', NULL])[1 + (f.id + g) % 4],
+            CASE WHEN (f.id + g) % 3 = 0 THEN (
+                SELECT bg.id FROM bremen_gramatura bg
+                WHERE bg.id_item = 900001 + (f.id * 7 + g) % :produtos
+                LIMIT 1
+            ) END,
+            CASE WHEN (f.id + g) % 2 = 0 THEN (
+                SELECT bt.id FROM bremen_tamanho_papel bt ORDER BY bt.id LIMIT 1
+            ) END,
+            4,
+            (f.id + g) % 2 * 4
+        FROM formularios f
+        JOIN escolas e ON e.id = f.cliente_id AND e.codigo LIKE :prefixo || '-%'
+        CROSS JOIN generate_series(1, :especificacoes) g
+    """), parametros)
+
+    # Arquivos: capa + miolo por especificação, miolo com uma versão antiga.
+    # Metade das especificações usa "pares" (vinculação capa/miolo).
+    conn.execute(text("""
+        INSERT INTO arquivo_pdfs (nome, paginas, tipo_arquivo, pares, id_componente, formulario_id, item_pedido_id, criado_em)
+        SELECT
+            'arquivo_' || ef.id || '_' || v.tipo || '_v' || v.versao || '.pdf',
+            CASE v.tipo WHEN 'capa' THEN 2 ELSE 8 + (ef.id % 5) * 4 + v.versao END,
+            v.tipo,
+            CASE WHEN ef.id % 2 = 0 THEN ef.id * 10 END,
+            ef.id_produto * 10 + CASE v.tipo WHEN 'capa' THEN 1 ELSE 2 END,
+            ef.formulario_id,
+            ef.id,
+            TIMESTAMP '2026-01-01' + (ef.id % 50) * INTERVAL '1 hour' + v.versao * INTERVAL '1 day'
+        FROM especificacoes_form ef
+        JOIN formularios f ON f.id = ef.formulario_id
+        JOIN escolas e ON e.id = f.cliente_id AND e.codigo LIKE :prefixo || '-%'
+        CROSS JOIN (VALUES ('capa', 1), ('miolo', 0), ('miolo', 1)) AS v(tipo, versao)
+    """), parametros)
+
+    # Respostas escolhidas para as especificações
+    conn.execute(text("""
+        INSERT INTO bremen_especificacao_detalhes (especificacao_id, pergunta_id, resposta_id)
+        SELECT ef.id, bp.id, br.id
+        FROM especificacoes_form ef
+        JOIN formularios f ON f.id = ef.formulario_id
+        JOIN escolas e ON e.id = f.cliente_id AND e.codigo LIKE :prefixo || '-%'
+        JOIN bremen_perguntas bp
+            ON bp.id_geral = ef.id_produto
+            OR bp.id_componente IN (SELECT bc.id_componente FROM bremen_componentes bc WHERE bc.id_produto = ef.id_produto)
+        JOIN bremen_respostas br
+            ON br.pergunta_id = bp.id
+           AND br.id_resposta % 10 = 1 + (ef.id + bp.id_pergunta) % 3
+        WHERE (ef.id + bp.id_pergunta) % 4 <> 0
+    """), parametros)
+
+    # Distribuições: cada unidade recebe parte das especificações da escola
+    conn.execute(text(f"""
+        INSERT INTO distribuicao_materiais (
+            quantidade, status_distribuicao, data_saida, formulario_id,
+            unidade_escolar_id, especificacao_form_id, arquivo_pdf_id
+        )
+        SELECT
+            (ue.id + ef.id) % 40,
+            CASE WHEN (ue.id + ef.id) % 5 = 0 THEN 'concluido' ELSE 'pendente' END,
+            {expr_data_saida},
+            ef.formulario_id,
+            ue.id,
+            ef.id,
+            (
+                SELECT ap.id FROM arquivo_pdfs ap
+                WHERE ap.item_pedido_id = ef.id AND ap.tipo_arquivo = 'miolo'
+                ORDER BY ap.criado_em DESC LIMIT 1
+            )
+        FROM unidades_escolares ue
+        JOIN escolas e ON e.id = ue.escola_id AND e.codigo LIKE :prefixo || '-%'
+        JOIN formularios f ON f.cliente_id = e.id
+        JOIN especificacoes_form ef ON ef.formulario_id = f.id
+        CROSS JOIN LATERAL (
+            SELECT (ARRAY['', '2026-02-02', '2026-02-09', '2026-02-16', '2026-03-02'])[1 + (ue.id * 3 + ef.id) % 5] AS data_txt
+        ) d
+        WHERE (ue.id + ef.id) % 3 <> 0
+    """), parametros)
+
+    produto_ids = [row[0] for row in conn.execute(text(
+        "SELECT id_produto FROM bremen_itens WHERE id_produto > 900000 ORDER BY id_produto"
+    ))]
+
+    return {
+        "escola_ids": escola_ids,
+        "ids_produtos": produto_ids,
+        "datas_saida": list(DATAS_SAIDA),
+    }
+
+
+def obter_existente(conn: Connection) -> Dict[str, Any]:
+    """Retorna os IDs de um conjunto sintético já populado (ou None)"""
+    escola_ids = [row[0] for row in conn.execute(text(
+        "SELECT id FROM escolas WHERE codigo LIKE :prefixo || '-%' ORDER BY id"
+    ), {"prefixo": PREFIXO})]
+    if not escola_ids:
+        return None
+    produto_ids = [row[0] for row in conn.execute(text(
+        "SELECT id_produto FROM bremen_itens WHERE id_produto > 900000 ORDER BY id_produto"
+    ))]
+    return {
+        "escola_ids": escola_ids,
+        "ids_produtos": produto_ids,
+        "datas_saida": list(DATAS_SAIDA),
+    }
+
+
+
+def _nos_do_plano(no: Dict[str, Any], tabelas: Iterable[str], indices: Set[str], seq_scans: Set[str]) -> None:
+    """Percorre o plano coletando índices usados e Seq Scans nas tabelas observadas"""
+    if "Index Name" in no:
+        indices.add(no["Index Name"])
+    if no.get("Node Type") == "Seq Scan" and no.get("Relation Name") in tabelas:
+        seq_scans.add(no["Relation Name"])
+    for filho in no.get("Plans", ()):
+        _nos_do_plano(filho, tabelas, indices, seq_scans)
+
+
+def medir_explain(
+    conn: Connection,
+    query: str,
+    parametros: Dict[str, Any],
+    repeticoes: int,
+    tabelas: Iterable[str] = ()
+) -> Dict[str, Any]:
+    """
+    Executa EXPLAIN (ANALYZE, BUFFERS) e retorna a média das execuções
+
+    Args:
+        conn: Conexão (ou sessão) do banco
+        query: SQL a medir
+        parametros: Parâmetros da query
+        repeticoes: Número de execuções
+        tabelas: Tabelas cujos Seq Scans são reportados
+
+    Returns:
+        Tempo (ms), buffers hit e read, e índices usados e Seq Scans nas
+        tabelas observadas no último plano
+    """
+    tabelas = tuple(tabelas)
+    explain = text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + query)
+    tempo = hits = leituras = 0.0
+    indices: Set[str] = set()
+    seq_scans: Set[str] = set()
+    for _ in range(repeticoes):
+        plano = conn.execute(explain, parametros).scalar()
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+        plano = plano[0]
+        tempo += plano["Planning Time"] + plano["Execution Time"]
+        hits += plano["Plan"].get("Shared Hit Blocks", 0)
+        leituras += plano["Plan"].get("Shared Read Blocks", 0)
+        indices.clear()
+        seq_scans.clear()
+        _nos_do_plano(plano["Plan"], tabelas, indices, seq_scans)
+    return {
+        "tempo_ms": tempo / repeticoes,
+        "hits": hits / repeticoes,
+        "leituras": leituras / repeticoes,
+        "indices": indices,
+        "seq_scans": seq_scans,
+    }
+
+
+if __name__ == "__main__":
+    from app.config.database import engine
+
+    parser = argparse.ArgumentParser(description='Popula o banco com dados sintéticos para benchmarks')
+    parser.add_argument('--escolas', type=int, default=3)
+    parser.add_argument('--unidades', type=int, default=20, help='Unidades por escola')
+    parser.add_argument('--formularios', type=int, default=6, help='Formulários por escola')
+    parser.add_argument('--especificacoes', type=int, default=3, help='Especificações por formulário')
+    parser.add_argument('--produtos', type=int, default=12)
+    parser.add_argument(
+        '--confirmar',
+        action='store_true',
+        help='Confirma que o banco configurado é descartável'
+    )
+    args = parser.parse_args()
+
+    if not args.confirmar:
+        print("❌ Use --confirmar para popular o banco (apenas em bancos descartáveis).")
+        sys.exit(1)
+
+    with engine.begin() as conn:
+        existente = obter_existente(conn)
+        if existente:
+            print(f"Dados sintéticos já existentes: {len(existente['escola_ids'])} escola(s)")
+        else:
+            ids = popular(
+                conn,
+                escolas=args.escolas,
+                unidades_por_escola=args.unidades,
+                formularios_por_escola=args.formularios,
+                especificacoes_por_formulario=args.especificacoes,
+                produtos=args.produtos
+            )
+            print(f"✅ Dados sintéticos criados: {len(ids['escola_ids'])} escola(s)")
@@ -0,0 +1,83 @@
+"""
+Gravação de arquivos de orçamento fora do event loop
+
+Enquanto um arquivo grande é salvo com salvar_orcamento_async, GET /healthz
+(chamado pela aplicação ASGI, no mesmo event loop) deve continuar respondendo
+com a latência de um servidor ocioso.
+"""
+import json
+import time
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+
+from main import app
+from app.services.arquivo_orcamento_service import ArquivoOrcamentoService
+
+UNIDADES = 10000
+ITENS = 40
+
+# Latência máxima aceita para /healthz durante a gravação
+LIMITE_LATENCIA_SEGUNDOS = 0.05
+
+
+def gerar_orcamentos(unidades: int, itens: int) -> List[str]:
+    """Orçamentos fictícios já serializados (como no modo JSON do controller)"""
+    return [
+        json.dumps({
+            "url": "https://exemplo.invalido/api/orcamento",
+            "identifier": "TESTE",
+            "data": {
+                "cliente": f"UNIDADE {unidade:05d}",
+                "itens": [
+                    {
+                        "produto": f"PRODUTO-{item:04d}",
+                        "quantidade": (unidade * 7 + item * 13) % 500 + 1,
+                        "distribuicao_material_ids": [unidade * itens + item],
+                    }
+                    for item in range(itens)
+                ],
+            },
+        }, ensure_ascii=False)
+        for unidade in range(unidades)
+    ]
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(ArquivoOrcamentoService, "TEMP_DIR", tmp_path)
+    return tmp_path
+
+
+@pytest.mark.anyio
+async def test_salvar_orcamento_async_nao_trava_outras_requisicoes(temp_dir):
+    orcamentos = gerar_orcamentos(UNIDADES, ITENS)
+
+    # Referência: a mesma gravação feita de forma síncrona precisa demorar mais
+    # que o limite, senão o teste não distingue o loop travado do livre
+    inicio = time.perf_counter()
+    ArquivoOrcamentoService.salvar_orcamento(orcamentos, 1, [1], json_bruto=True)
+    duracao_sincrona = time.perf_counter() - inicio
+    assert duracao_sincrona > LIMITE_LATENCIA_SEGUNDOS * 4
+
+    latencias: List[float] = []
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://teste") as cliente:
+        assert (await cliente.get("/healthz")).status_code == 200
+
+        gravacao = asyncio.create_task(
+            ArquivoOrcamentoService.salvar_orcamento_async(orcamentos, 1, [1], json_bruto=True)
+        )
+        while not gravacao.done():
+            inicio = time.perf_counter()
+            resposta = await cliente.get("/healthz")
+            latencias.append(time.perf_counter() - inicio)
+            assert resposta.status_code == 200
+            await asyncio.sleep(0.005)
+        nome_arquivo = await gravacao
+
+    assert len(latencias) >= 5
+    assert max(latencias) < LIMITE_LATENCIA_SEGUNDOS
+    assert ArquivoOrcamentoService.obter_conteudo(nome_arquivo)["total_unidades"] == UNIDADES